@@ -0,0 +1,102 @@
+# batch.py
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException, Request
+
+import crud
+from settings import BATCH_MAX_ITEMS
+
+
+async def read_batch_items(request: Request) -> List[Any]:
+    """요청 본문에서 알림 목록 읽기
+
+    `application/x-ndjson` 요청은 한 줄에 알림 하나씩, 그 외에는 JSON 배열
+    (또는 `{"notifications": [...]}`)로 해석한다. NDJSON의 잘못된 줄은 None으로
+    남겨서 항목별 오류로 보고한다.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+
+    if "ndjson" in content_type:
+        items = []
+        for line in body.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError:
+                items.append(None)
+    else:
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+        if isinstance(payload, dict):
+            payload = payload.get("notifications")
+        if not isinstance(payload, list):
+            raise HTTPException(status_code=400, detail="Expected an array of notifications")
+        items = payload
+
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {BATCH_MAX_ITEMS} items)")
+    return items
+
+
+def validate_batch_item(item: Any) -> Optional[str]:
+    """항목 오류 메시지 반환 (정상이면 None)"""
+    if not isinstance(item, dict):
+        return "Invalid notification object"
+    if not item.get("user_id"):
+        return "user_id is required"
+    return None
+
+
+def batch_error(index: int, detail: str) -> dict:
+    return {"index": index, "status": "error", "detail": detail}
+
+
+def batch_success(index: int, user_id: Any, notification_id: int) -> dict:
+    return {"index": index, "status": "success", "user_id": user_id, "notification_id": notification_id}
+
+
+def batch_queued(index: int, user_id: Any) -> dict:
+    """병합 대상으로 접수된 항목 (알림 ID는 모아서 저장할 때 발급)"""
+    return {"index": index, "status": "queued", "user_id": user_id, "notification_id": None}
+
+
+async def read_bulk_read_filters(request: Request) -> Dict[str, Any]:
+    """일괄 읽음 처리 요청 본문을 crud.mark_read_bulk 인자로 변환
+
+    `{"ids": [...], "category": ..., "before": ISO 시각, "max_priority": N}` 중 하나 이상이 필요하다
+    (조건 없이 전체를 읽음 처리하려면 read-all 사용).
+    """
+    try:
+        data = json.loads(await request.body())
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Expected a JSON object")
+
+    filters: Dict[str, Any] = {}
+    try:
+        if data.get("ids") is not None:
+            if not isinstance(data["ids"], list):
+                raise ValueError("ids must be an array")
+            if len(data["ids"]) > BATCH_MAX_ITEMS:
+                raise HTTPException(status_code=413, detail=f"Too many ids (max {BATCH_MAX_ITEMS})")
+            filters["ids"] = [crud.parse_notification_id(str(value)) for value in data["ids"]]
+        if data.get("category") is not None:
+            filters["category"] = str(data["category"])
+        if data.get("before") is not None:
+            filters["before"] = datetime.fromisoformat(str(data["before"]))
+        if data.get("max_priority") is not None:
+            filters["max_priority"] = int(data["max_priority"])
+    except (TypeError, ValueError) as error:
+        raise HTTPException(status_code=400, detail=f"Invalid filter: {error}")
+
+    if not filters:
+        raise HTTPException(status_code=400, detail="ids or at least one filter (category, before, max_priority) is required")
+    return filters
@@ -0,0 +1,195 @@
+# broadcast_stream.py
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException, Request
+from redis.asyncio import Redis
+
+from settings import BROADCAST_CHUNK_CONCURRENCY, BROADCAST_CHUNK_SIZE, BROADCAST_JOB_TTL
+
+# 사용자 ID 한 줄의 최대 길이 (줄바꿈 없이 계속 들어오는 본문이 메모리를 점유하지 않도록 제한)
+MAX_LINE_BYTES = 64 * 1024
+
+
+async def iter_lines(request: Request) -> AsyncIterator[bytes]:
+    """요청 본문을 받는 대로 줄 단위로 나눠서 반환 (빈 줄 제외)"""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield line
+        if len(buffer) > MAX_LINE_BYTES:
+            raise HTTPException(status_code=400, detail="Line too long")
+    buffer = buffer.strip()
+    if buffer:
+        yield buffer
+
+
+async def read_stream_header(lines: AsyncIterator[bytes]) -> Dict[str, Any]:
+    """첫 줄의 브로드캐스트 내용(JSON 객체) 읽기"""
+    try:
+        header = json.loads(await anext(lines))
+    except (StopAsyncIteration, json.JSONDecodeError):
+        header = None
+    if not isinstance(header, dict):
+        raise HTTPException(status_code=400, detail="First line must be a JSON object with the notification")
+    return header
+
+
+def parse_user_id(line: bytes) -> Optional[str]:
+    """사용자 ID 한 줄 해석 - 일반 텍스트, JSON 문자열/숫자, {"user_id": ...} 모두 허용"""
+    if line[:1] in (b"{", b'"') or line.isdigit():
+        try:
+            value = json.loads(line)
+        except json.JSONDecodeError:
+            return None
+        if isinstance(value, dict):
+            value = value.get("user_id")
+        return str(value) if value not in (None, "") else None
+    try:
+        return line.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+class BroadcastJob:
+    """스트리밍 브로드캐스트 진행 상태"""
+
+    def __init__(self, job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.status = "running"
+        self.received = 0
+        self.processed = 0
+        self.invalid = 0
+        self.chunks = 0
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "received": self.received,
+            "processed": self.processed,
+            "invalid": self.invalid,
+            "chunks": self.chunks,
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class BroadcastJobs:
+    """프로세스 내 작업 상태 저장소 (최근 max_jobs개만 보관)"""
+
+    def __init__(self, max_jobs: int = 1000):
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._max_jobs = max_jobs
+
+    async def save(self, job: BroadcastJob):
+        self._jobs[job.id] = job.to_dict()
+        self._jobs.move_to_end(job.id)
+        while len(self._jobs) > self._max_jobs:
+            self._jobs.popitem(last=False)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+
+class RedisBroadcastJobs(BroadcastJobs):
+    """Redis에 저장되는 작업 상태 (다른 워커에서도 조회 가능)"""
+
+    def __init__(self, redis: Redis, ttl: int = BROADCAST_JOB_TTL):
+        self._redis = redis
+        self._ttl = ttl
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"broadcast:job:{job_id}"
+
+    async def save(self, job: BroadcastJob):
+        await self._redis.set(self._key(job.id), json.dumps(job.to_dict()), ex=self._ttl)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        value = await self._redis.get(self._key(job_id))
+        return json.loads(value) if value else None
+
+
+async def stream_broadcast(
+    lines: AsyncIterator[bytes],
+    process_chunk: Callable[[List[str]], Awaitable[Any]],
+    jobs: BroadcastJobs,
+    job_id: Optional[str] = None,
+    chunk_size: int = BROADCAST_CHUNK_SIZE,
+    concurrency: int = BROADCAST_CHUNK_CONCURRENCY
+) -> BroadcastJob:
+    """사용자 ID 스트림을 chunk_size개씩 나눠서 process_chunk로 처리
+
+    본문을 읽는 동안 최대 concurrency개의 청크를 동시에 처리하고, 그보다 많이 밀리면
+    본문 읽기를 멈추므로 수신자 수와 관계없이 메모리 사용량이 일정하다.
+    """
+    job = BroadcastJob(job_id)
+    await jobs.save(job)
+    slots = asyncio.Semaphore(concurrency)
+    pending = set()
+    errors = []
+
+    async def run(chunk: List[str]):
+        try:
+            await process_chunk(chunk)
+            job.processed += len(chunk)
+            job.chunks += 1
+            await jobs.save(job)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            slots.release()
+
+    async def submit(chunk: List[str]):
+        await slots.acquire()
+        # 이미 실패한 청크가 있으면 더 읽지 않고 중단
+        if errors:
+            slots.release()
+            raise errors[0]
+        task = asyncio.create_task(run(chunk))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    try:
+        chunk = []
+        async for line in lines:
+            user_id = parse_user_id(line)
+            if user_id is None:
+                job.invalid += 1
+                continue
+            job.received += 1
+            chunk.append(user_id)
+            if len(chunk) >= chunk_size:
+                await submit(chunk)
+                chunk = []
+        if chunk:
+            await submit(chunk)
+        await asyncio.gather(*pending)
+        if errors:
+            raise errors[0]
+    except BaseException as error:
+        for task in list(pending):
+            task.cancel()
+        job.status = "failed"
+        job.error = str(error) or type(error).__name__
+        job.finished_at = time.time()
+        await jobs.save(job)
+        raise
+
+    job.status = "completed"
+    job.finished_at = time.time()
+    await jobs.save(job)
+    return job
@@ -0,0 +1,137 @@
+# broker.py
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+from broadcast_stream import BroadcastJobs
+from envelope import event_type
+from hub import LocalHub, Subscription
+from presence import Owners, PresenceRegistry
+from recent_cache import RecentNotificationsCache
+from replay import MemoryReplayBuffer, ReplayResult
+from settings import BROKER, PRESENCE_SKIP_OFFLINE
+from unread import UnreadCounter, unread_message
+
+BROKERS = ("redis", "redis-streams", "rabbitmq", "memory")
+
+
+class Broker(ABC):
+    """메시지 브로커 백엔드 공통 인터페이스
+
+    앱은 아웃박스 이벤트 발행(publish), 안읽은 알림 수 전달(publish_unread), SSE 연결 등록
+    (subscribe/unsubscribe), 재연결 재전송(replay)만 이 인터페이스로 호출한다. 백엔드에 맞는
+    안읽은 알림 카운터, 최근 알림 캐시, 브로드캐스트 작업 상태 저장소, 접속 현황도 함께 제공한다.
+    """
+
+    name = ""
+    # 일시적인 전송 실패로 보고 무시해도 되는 예외 (재시도하지 않는 best-effort 전송용)
+    errors: Tuple[Type[BaseException], ...] = ()
+
+    hub: LocalHub
+    unread_counter: UnreadCounter
+    recent_cache: RecentNotificationsCache
+    broadcast_jobs: BroadcastJobs
+    presence: PresenceRegistry
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def subscribe(self, user_id: str) -> Subscription:
+        """연결 하나에 대한 로컬 전송 버퍼 등록"""
+        return self.hub.subscribe(user_id)
+
+    async def unsubscribe(self, user_id: str, subscription: Subscription):
+        self.hub.unsubscribe(user_id, subscription)
+
+    def accepts(self, user_id: str) -> bool:
+        """이 워커가 사용자의 실시간 이벤트를 받을 수 있는지 (샤드를 나눠 읽는 백엔드용)"""
+        return True
+
+    @abstractmethod
+    async def replay(self, user_id: str, last_event_id: str) -> ReplayResult:
+        """last_event_id 이후에 발행된 이벤트 (None이면 버퍼 만료)"""
+
+    @abstractmethod
+    async def current_event_id(self) -> str:
+        """재연결 기준점 - 이미 발행한 이벤트 ID 이상이고 이후 발행하는 이벤트 ID보다 작은 ID (DB 대체 전송 후 알림용)"""
+
+    @abstractmethod
+    async def publish(self, events: List[Dict[str, Any]]):
+        """아웃박스 이벤트 발행 - 이벤트 ID를 발급해서 재전송 버퍼에 기록 (실패하면 예외)"""
+
+    @abstractmethod
+    async def publish_unread(self, counts: Dict[Any, Optional[int]]):
+        """사용자별 안읽은 알림 수를 SSE 스트림으로 전달 (None인 사용자는 건너뜀)"""
+
+    async def online_workers(self, user_ids: Iterable[Any]) -> Owners:
+        """발행 대상 사용자별 연결 워커 (접속 현황으로 거르지 않거나 확인할 수 없으면 None)"""
+        if not PRESENCE_SKIP_OFFLINE or not self.presence.shared:
+            return None
+        return await self.presence.lookup({str(user_id) for user_id in user_ids if user_id is not None})
+
+    @staticmethod
+    def is_offline(user_id: Optional[Any], owners: Owners) -> bool:
+        return owners is not None and user_id is not None and owners.get(str(user_id)) == []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "broker": self.name,
+            "connections": self.hub.connection_count,
+            "dropped": self.hub.dropped,
+            "disconnected": self.hub.disconnected
+        }
+
+
+class MemoryBroker(Broker):
+    """프로세스 내 asyncio 백엔드
+
+    발행한 이벤트를 네트워크 왕복 없이 이 워커의 전송 버퍼로 바로 넣는다. 외부 서비스 없이
+    단일 노드 배포, 벤치마크, 테스트에 사용하며, 워커가 여러 개면 이벤트를 발행한 워커에
+    연결된 사용자만 실시간으로 받는다 (나머지는 히스토리 조회로 확인).
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self.hub = LocalHub()
+        self.replay_buffer = MemoryReplayBuffer()
+        self.unread_counter = UnreadCounter()
+        self.recent_cache = RecentNotificationsCache()
+        self.broadcast_jobs = BroadcastJobs()
+        # 연결이 모두 이 프로세스에 있으므로 허브가 곧 접속 현황 (접속 중이 아닌 사용자는 전달할 버퍼가 없음)
+        self.presence = PresenceRegistry(self.hub)
+
+    async def replay(self, user_id: str, last_event_id: str) -> ReplayResult:
+        return self.replay_buffer.replay(user_id, last_event_id)
+
+    async def current_event_id(self) -> str:
+        return self.replay_buffer.current_id()
+
+    async def publish(self, events: List[Dict[str, Any]]):
+        for event in events:
+            name = event_type(event["payload"])
+            event_id = self.replay_buffer.append(event["user_id"], event["payload"], name)
+            self.hub.deliver(event["user_id"], event_id, event["priority"], name, event["payload"])
+
+    async def publish_unread(self, counts: Dict[Any, Optional[int]]):
+        for user_id, count in counts.items():
+            if count is not None:
+                self.hub.deliver(str(user_id), None, 0, "unread", unread_message(count))
+
+
+def create_broker(name: str = BROKER) -> Broker:
+    """이름으로 브로커 백엔드 생성 (선택한 백엔드 모듈만 불러옴)"""
+    if name == "memory":
+        return MemoryBroker()
+    if name == "redis":
+        from redis_broker import RedisBroker
+        return RedisBroker()
+    if name == "redis-streams":
+        from redis_broker import RedisStreamsBroker
+        return RedisStreamsBroker()
+    if name == "rabbitmq":
+        from rabbit_broker import RabbitBroker
+        return RabbitBroker()
+    raise ValueError(f"Unknown broker: {name} (expected one of {', '.join(BROKERS)})")
@@ -0,0 +1,231 @@
+# coalesce.py
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from metrics import NOTIFICATIONS_COALESCED, NOTIFICATIONS_COALESCE_DROPPED
+from settings import COALESCE_CATEGORIES, COALESCE_MAX_ATTEMPTS, COALESCE_MAX_ITEMS, COALESCE_MAX_PENDING, COALESCE_WINDOW
+
+logger = logging.getLogger(__name__)
+
+# 병합 대상 하나 - (저장할 알림 행, 발행 메시지)
+Item = Tuple[Dict[str, Any], Dict[str, Any]]
+# (user_id, category)별로 모은 항목 목록을 저장/발행하는 함수 - 예외가 나면 다음 주기에 다시 시도
+Flush = Callable[[List[List[Item]]], Awaitable[None]]
+
+
+def wants_coalesce(data: Dict[str, Any]) -> bool:
+    """요청이 병합 대상인지 - 요청의 coalesce 값이 우선이고, 없으면 COALESCE_CATEGORIES로 판단
+
+    카테고리가 병합 키이므로 카테고리 없는 알림은 병합하지 않는다.
+    """
+    if not data.get("category"):
+        return False
+    if data.get("coalesce") is not None:
+        return bool(data["coalesce"])
+    return "*" in COALESCE_CATEGORIES or str(data["category"]) in COALESCE_CATEGORIES
+
+
+class Coalescer:
+    """짧은 시간 창 동안 같은 (user_id, category) 알림을 모아 한 번에 저장/발행하는 백그라운드 작업
+
+    빌드 상태처럼 초당 수십 개씩 들어오는 알림을 요청마다 INSERT/발행하지 않고 window초마다 모아서
+    전체 행을 한 번에 INSERT하고, 키마다 개수와 마지막 내용을 담은 이벤트 하나만 발행한다 (히스토리에는
+    모든 알림이 남음). 한 키에 max_items개가 쌓이면 창이 끝나기 전에 바로 내보낸다.
+    모인 항목은 워커 메모리에만 있으므로 비정상 종료하면 마지막 창의 알림은 저장되지 않는다.
+
+    전체가 max_pending개를 넘으면 더 받지 않으므로 (호출 쪽은 바로 저장하는 경로를 사용) 저장이 계속
+    실패해도 메모리가 무한정 늘지 않는다. 한 번에 저장하다 실패하면 키별로 나눠 다시 시도하고,
+    다른 키는 저장되는데 같은 키만 max_attempts번 실패하면 그 키의 항목은 병합하지 않고 하나씩 저장한다.
+    이미 202로 응답한 알림이므로 혼자서도 저장되지 않는 항목만 로그를 남기고 버린다
+    (모든 키가 실패하면 DB 장애로 보고 버리지 않고 다음 주기에 다시 시도).
+    """
+
+    def __init__(
+        self,
+        flush: Flush,
+        window: float = COALESCE_WINDOW,
+        max_items: int = COALESCE_MAX_ITEMS,
+        max_pending: int = COALESCE_MAX_PENDING,
+        max_attempts: int = COALESCE_MAX_ATTEMPTS
+    ):
+        self._flush = flush
+        self._window = window
+        self._max_items = max_items
+        self._max_pending = max_pending
+        self._max_attempts = max_attempts
+        self._pending: Dict[Tuple[str, str], List[Item]] = {}
+        # 저장에 실패한 항목 수 (pending 계산용)와 키별 연속 실패 횟수
+        self._size = 0
+        self._failures: Dict[Tuple[str, str], int] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.accepted = 0
+        self.flushed = 0
+        self.rejected = 0
+        self.dropped = 0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # 종료 전에 남은 항목 저장
+        try:
+            await self.flush_once()
+        except Exception:
+            logger.exception("coalesced notifications lost on shutdown")
+
+    @property
+    def pending(self) -> int:
+        return self._size
+
+    def add(self, user_id: str, category: str, row: Dict[str, Any], message: Dict[str, Any]) -> Optional[int]:
+        """항목을 모으고 같은 키에 모인 개수 반환 (모인 항목이 max_pending개면 받지 않고 None)"""
+        if self._max_pending and self._size >= self._max_pending:
+            self.rejected += 1
+            return None
+        items = self._pending.setdefault((str(user_id), str(category)), [])
+        items.append((row, message))
+        self._size += 1
+        self.accepted += 1
+        if len(items) >= self._max_items:
+            self._wakeup.set()
+        return len(items)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._window)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush_once()
+            except Exception:
+                logger.exception("coalesce flush failed")
+
+    async def flush_once(self) -> int:
+        """모인 항목을 모두 내보내고 저장한 알림 수 반환 (실패한 키는 다음 주기에 다시 시도)"""
+        if not self._pending:
+            return 0
+        # 저장하는 동안 들어오는 항목은 다음 창에 모임 (pending 수에는 계속 포함)
+        pending, self._pending = self._pending, {}
+        try:
+            await self._flush(list(pending.values()))
+            saved = list(pending)
+        except asyncio.CancelledError:
+            self._requeue(pending)
+            raise
+        except Exception:
+            if len(pending) == 1:
+                self._requeue(pending)
+                raise
+            logger.warning("coalesce flush failed, retrying %d groups separately", len(pending), exc_info=True)
+            saved = await self._flush_each(pending)
+
+        failed = {key: items for key, items in pending.items() if key not in saved}
+        exhausted = self._requeue(failed, count_failures=len(failed) < len(pending)) if failed else {}
+        for key in saved:
+            self._failures.pop(key, None)
+
+        count = sum(len(pending[key]) for key in saved)
+        self._size -= count
+        NOTIFICATIONS_COALESCED.inc(count - len(saved))
+        if exhausted:
+            count += await self._flush_rows(exhausted)
+        self.flushed += count
+        if failed and not saved:
+            raise RuntimeError(f"failed to save {len(failed)} coalesced groups")
+        return count
+
+    async def _flush_each(self, pending: Dict[Tuple[str, str], List[Item]]) -> List[Tuple[str, str]]:
+        saved = []
+        for key, items in pending.items():
+            try:
+                await self._flush([items])
+            except asyncio.CancelledError:
+                self._requeue({key: items for key, items in pending.items() if key not in saved})
+                self._size -= sum(len(pending[key]) for key in saved)
+                raise
+            except Exception:
+                logger.warning("coalesce flush failed for %s", key, exc_info=True)
+            else:
+                saved.append(key)
+        return saved
+
+    async def _flush_rows(self, exhausted: Dict[Tuple[str, str], List[Item]]) -> int:
+        """max_attempts번 실패한 키의 항목을 하나씩 저장하고 저장한 수 반환 (혼자서도 실패하는 항목만 버림)"""
+        saved, keys = 0, list(exhausted)
+        for position, key in enumerate(keys):
+            items = exhausted[key]
+            logger.warning(
+                "saving %d coalesced notifications for %s one by one after %d failed saves",
+                len(items), key, self._max_attempts
+            )
+            for index, item in enumerate(items):
+                try:
+                    await self._flush([[item]])
+                except asyncio.CancelledError:
+                    # 아직 저장하지 않은 항목은 다음 주기에 다시 시도
+                    remaining = {key: items[index:]}
+                    remaining.update((other, exhausted[other]) for other in keys[position + 1:])
+                    self._requeue(remaining)
+                    raise
+                except Exception:
+                    self.dropped += 1
+                    NOTIFICATIONS_COALESCE_DROPPED.inc()
+                    logger.exception("dropping coalesced notification for %s that failed to save on its own: %s", key, item[0])
+                else:
+                    saved += 1
+                self._size -= 1
+        return saved
+
+    def _requeue(
+        self,
+        failed: Dict[Tuple[str, str], List[Item]],
+        count_failures: bool = False
+    ) -> Dict[Tuple[str, str], List[Item]]:
+        """실패한 항목을 그 사이 들어온 항목 앞에 되돌림 (키별 순서 유지)
+
+        count_failures면 다른 키는 저장된 경우이므로 키별 실패 횟수를 세고, max_attempts번 실패한 키는
+        되돌리지 않고 따로 반환한다 (호출 쪽에서 하나씩 저장).
+        """
+        exhausted = {}
+        for key, items in failed.items():
+            if count_failures:
+                self._failures[key] = self._failures.get(key, 0) + 1
+                if self._failures[key] >= self._max_attempts:
+                    del self._failures[key]
+                    exhausted[key] = items
+                    continue
+            self._pending[key] = items + self._pending.get(key, [])
+        return exhausted
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window": self._window,
+            "pending": self.pending,
+            "max_pending": self._max_pending,
+            "accepted": self.accepted,
+            "flushed": self.flushed,
+            "rejected": self.rejected,
+            "dropped": self.dropped
+        }
+
+
+def merge_messages(items: List[Item]) -> Dict[str, Any]:
+    """한 키에 모인 발행 메시지를 하나로 합침 - 마지막 내용에 개수와 가장 높은 우선순위를 반영"""
+    latest = items[-1][1]
+    return {
+        **latest,
+        "priority": max(message.get("priority", 0) for _, message in items),
+        "category": items[-1][0].get("category"),
+        "count": len(items)
+    }
@@ -0,0 +1,635 @@
+# crud.py
+# 동기 DB 함수 모음 - 핸들러에서는 database.run_db()로 감싸서 호출한다
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, and_, delete, exists, func, insert, literal, or_, select, text, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+
+from envelope import dumps
+from models import ArchivedNotification, BroadcastMessage, BroadcastReceipt, Notification, OutboxEvent
+
+# 브로드캐스트 알림 ID 접두사 - 히스토리에서 개별 알림 ID와 구분 (예: "b12")
+BROADCAST_ID_PREFIX = "b"
+
+
+def notification_to_dict(notification: Notification) -> Dict[str, Any]:
+    return {
+        "id": notification.id,
+        "title": notification.title,
+        "message": notification.message,
+        "icon": notification.icon,
+        "is_read": notification.is_read,
+        "created_at": notification.created_at.isoformat(),
+        "read_at": notification.read_at.isoformat() if notification.read_at else None,
+        "category": notification.category,
+        "priority": notification.priority
+    }
+
+
+def broadcast_to_dict(broadcast: BroadcastMessage, read_at: Optional[datetime]) -> Dict[str, Any]:
+    """브로드캐스트를 개별 알림과 같은 형식으로 변환 (사용자별 읽음 상태 반영)"""
+    return {
+        "id": f"{BROADCAST_ID_PREFIX}{broadcast.id}",
+        "title": broadcast.title,
+        "message": broadcast.message,
+        "icon": broadcast.icon,
+        "is_read": read_at is not None,
+        "created_at": broadcast.created_at.isoformat(),
+        "read_at": read_at.isoformat() if read_at else None,
+        "category": broadcast.category,
+        "priority": broadcast.priority
+    }
+
+
+def parse_notification_id(value: str) -> Tuple[bool, int]:
+    """히스토리 알림 ID를 (브로드캐스트 여부, 숫자 ID)로 해석 (형식이 잘못되면 ValueError)"""
+    if value.startswith(BROADCAST_ID_PREFIX):
+        return True, int(value[len(BROADCAST_ID_PREFIX):])
+    return False, int(value)
+
+
+def outbox_row(user_id: Optional[Any], message: Dict[str, Any], unread: bool = True) -> Dict[str, Any]:
+    """아웃박스에 기록할 행 (user_id가 None이면 전체 브로드캐스트)"""
+    return {
+        "user_id": None if user_id is None else str(user_id),
+        "payload": dumps(message),
+        "priority": message.get("priority", 0),
+        "unread": unread
+    }
+
+
+def create_notification(db: Session, row: Dict[str, Any], message: Optional[Dict[str, Any]] = None) -> int:
+    """알림 저장 - message가 주어지면 저장된 ID를 채워서 같은 트랜잭션에서 아웃박스에 기록"""
+    notification_id = db.execute(insert(Notification).returning(Notification.id), row).scalar_one()
+    if message is not None:
+        db.execute(insert(OutboxEvent), outbox_row(row["user_id"], {**message, "id": notification_id}))
+    db.commit()
+    return notification_id
+
+
+def create_notifications(
+    db: Session,
+    rows: List[Dict[str, Any]],
+    messages: Optional[List[Dict[str, Any]]] = None
+) -> List[int]:
+    """한 트랜잭션에서 일괄 INSERT 후 생성된 ID를 입력 순서대로 반환
+
+    messages가 주어지면 rows와 같은 순서의 발행 메시지로 보고 아웃박스에 함께 기록한다.
+    """
+    notification_ids = db.execute(
+        insert(Notification).returning(Notification.id, sort_by_parameter_order=True),
+        rows
+    ).scalars().all()
+    if messages is not None:
+        db.execute(insert(OutboxEvent), [
+            outbox_row(row["user_id"], {**message, "id": notification_id})
+            for row, message, notification_id in zip(rows, messages, notification_ids)
+        ])
+    db.commit()
+    return list(notification_ids)
+
+
+def create_coalesced(
+    db: Session,
+    groups: List[List[Tuple[Dict[str, Any], Dict[str, Any]]]],
+    merge: Callable[[List[Tuple[Dict[str, Any], Dict[str, Any]]]], Dict[str, Any]]
+) -> List[List[int]]:
+    """병합한 알림 저장 - 모든 그룹의 행을 한 번에 INSERT하고 그룹마다 아웃박스 이벤트 하나만 기록
+
+    groups는 같은 사용자/카테고리의 (행, 발행 메시지) 목록이며, merge로 합친 메시지에 그룹의 마지막
+    알림 ID를 채워서 발행한다. 그룹별 알림 ID 목록을 입력 순서대로 반환한다.
+    """
+    rows = [row for items in groups for row, _ in items]
+    notification_ids = db.execute(
+        insert(Notification).returning(Notification.id, sort_by_parameter_order=True),
+        rows
+    ).scalars().all()
+
+    ids, outbox, start = [], [], 0
+    for items in groups:
+        group_ids = list(notification_ids[start:start + len(items)])
+        start += len(items)
+        ids.append(group_ids)
+        outbox.append(outbox_row(items[-1][0]["user_id"], {**merge(items), "id": group_ids[-1]}))
+    db.execute(insert(OutboxEvent), outbox)
+    db.commit()
+    return ids
+
+
+def create_broadcast(
+    db: Session,
+    row: Dict[str, Any],
+    users: Optional[List[Any]] = None,
+    message: Optional[Dict[str, Any]] = None
+) -> int:
+    """브로드캐스트 내용을 한 번만 저장하고 ID 반환
+
+    users가 None이면 모든 사용자에게 보이는 브로드캐스트로 저장하고 (읽음 상태는 사용자가 읽을 때 기록),
+    목록이면 수신자별 상태 행만 추가한다. message가 주어지면 같은 트랜잭션에서 아웃박스에 기록한다.
+    """
+    broadcast_id = db.execute(
+        insert(BroadcastMessage).returning(BroadcastMessage.id),
+        {**row, "all_users": users is None}
+    ).scalar_one()
+
+    if users is not None:
+        _add_broadcast_recipients(db, broadcast_id, users, message)
+    elif message is not None:
+        db.execute(insert(OutboxEvent), outbox_row(None, {**message, "id": f"{BROADCAST_ID_PREFIX}{broadcast_id}"}))
+
+    db.commit()
+    return broadcast_id
+
+
+def add_broadcast_recipients(
+    db: Session,
+    broadcast_id: int,
+    users: List[Any],
+    message: Optional[Dict[str, Any]] = None
+) -> int:
+    """지정 사용자 브로드캐스트에 수신자 추가 (이미 추가된 사용자는 건너뛰고 추가한 수 반환)"""
+    added = _add_broadcast_recipients(db, broadcast_id, users, message)
+    db.commit()
+    return added
+
+
+def _add_broadcast_recipients(
+    db: Session,
+    broadcast_id: int,
+    users: List[Any],
+    message: Optional[Dict[str, Any]]
+) -> int:
+    recipients = list(dict.fromkeys(str(user_id) for user_id in users))
+    if not recipients:
+        return 0
+    existing = set(db.execute(
+        select(BroadcastReceipt.user_id)
+        .where(BroadcastReceipt.broadcast_id == broadcast_id, BroadcastReceipt.user_id.in_(recipients))
+    ).scalars())
+    recipients = [user_id for user_id in recipients if user_id not in existing]
+    if not recipients:
+        return 0
+
+    db.execute(insert(BroadcastReceipt), [
+        {"broadcast_id": broadcast_id, "user_id": user_id} for user_id in recipients
+    ])
+    if message is not None:
+        message = {**message, "id": f"{BROADCAST_ID_PREFIX}{broadcast_id}"}
+        db.execute(insert(OutboxEvent), [outbox_row(user_id, message) for user_id in recipients])
+    return len(recipients)
+
+
+def enqueue_outbox(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """DB에 저장하지 않는 알림을 아웃박스에만 기록"""
+    db.execute(insert(OutboxEvent), rows)
+    db.commit()
+    return len(rows)
+
+
+def claim_outbox(db: Session, limit: int, lease: int) -> List[Dict[str, Any]]:
+    """전달할 아웃박스 이벤트를 오래된 순으로 최대 limit개 점유
+
+    점유 조건을 UPDATE에 다시 걸어서 여러 워커의 릴레이가 같은 이벤트를 동시에 가져가지 않게 한다.
+    점유한 뒤 lease초 안에 삭제(전달 완료)되지 않으면 다른 릴레이가 다시 가져갈 수 있다.
+    """
+    now = datetime.utcnow()
+    available = and_(
+        OutboxEvent.available_at <= now,
+        or_(OutboxEvent.claimed_until == None, OutboxEvent.claimed_until < now)
+    )
+    candidates = select(OutboxEvent.id).where(available).order_by(OutboxEvent.available_at, OutboxEvent.id).limit(limit)
+    claimed = db.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id.in_(candidates.scalar_subquery()), available)
+        .values(claimed_until=now + timedelta(seconds=lease))
+        .returning(
+            OutboxEvent.id,
+            OutboxEvent.user_id,
+            OutboxEvent.payload,
+            OutboxEvent.priority,
+            OutboxEvent.unread,
+            OutboxEvent.attempts
+        )
+    ).mappings().all()
+    db.commit()
+    return sorted((dict(row) for row in claimed), key=lambda row: row["id"])
+
+
+def delete_outbox(db: Session, ids: List[int]) -> int:
+    result = db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(ids)))
+    db.commit()
+    return result.rowcount
+
+
+def retry_outbox(db: Session, ids: List[int], delay: float) -> int:
+    """전달에 실패한 이벤트의 점유를 풀고 delay초 뒤에 다시 시도하도록 표시"""
+    result = db.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id.in_(ids))
+        .values(
+            attempts=OutboxEvent.attempts + 1,
+            available_at=datetime.utcnow() + timedelta(seconds=delay),
+            claimed_until=None
+        )
+    )
+    db.commit()
+    return result.rowcount
+
+
+def count_outbox(db: Session) -> int:
+    return db.execute(select(func.count()).select_from(OutboxEvent)).scalar_one()
+
+
+def parse_cursor(cursor: str) -> Tuple[datetime, bool, int]:
+    """`<created_at>,<id>` 형식의 페이지 커서 해석 (형식이 잘못되면 ValueError)"""
+    created_at, _, notification_id = cursor.rpartition(",")
+    return (datetime.fromisoformat(created_at), *parse_notification_id(notification_id))
+
+
+def make_cursor(item: Dict[str, Any]) -> str:
+    return f"{item['created_at']},{item['id']}"
+
+
+def _visible_broadcasts(user_id: Any, *conditions, unread_only: bool = False, limit: Optional[int] = None):
+    """사용자에게 보이는 브로드캐스트와 읽은 시각 서브쿼리 (BroadcastMessage 컬럼 + read_at)
+
+    사용자의 상태 행은 (user_id, broadcast_id) 인덱스에서 시작해서 메시지를 조인하고, 상태 행이 없는
+    (안읽은) 전체 브로드캐스트는 (all_users, created_at) 인덱스로 찾아서 UNION ALL로 합친다.
+    conditions는 BroadcastMessage 조건이며, limit이 주어지면 각 쿼리에서 최신순으로 limit개만 가져온다.
+    """
+    user_id = str(user_id)
+    receipts = (
+        select(BroadcastMessage, BroadcastReceipt.read_at)
+        .select_from(BroadcastReceipt)
+        .join(BroadcastMessage, BroadcastMessage.id == BroadcastReceipt.broadcast_id)
+        .where(BroadcastReceipt.user_id == user_id, *conditions)
+    )
+    if unread_only:
+        receipts = receipts.where(BroadcastReceipt.read_at == None)
+    everyone = (
+        select(BroadcastMessage, literal(None, DateTime).label("read_at"))
+        .where(
+            BroadcastMessage.all_users == True,
+            ~exists().where(
+                BroadcastReceipt.broadcast_id == BroadcastMessage.id,
+                BroadcastReceipt.user_id == user_id
+            ),
+            *conditions
+        )
+    )
+    if limit is not None:
+        order = (BroadcastMessage.created_at.desc(), BroadcastMessage.id.desc())
+        receipts, everyone = (select(query.order_by(*order).limit(limit).subquery()) for query in (receipts, everyone))
+    return union_all(receipts, everyone).subquery()
+
+
+def _before(created_column, id_column, is_broadcast: bool, cursor: Tuple[datetime, bool, int]):
+    """(created_at, 브로드캐스트 여부, id) 내림차순에서 커서보다 뒤에 오는 행 조건"""
+    created_at, cursor_is_broadcast, cursor_id = cursor
+    if is_broadcast == cursor_is_broadcast:
+        return or_(created_column < created_at, and_(created_column == created_at, id_column < cursor_id))
+    if is_broadcast:
+        return created_column < created_at
+    return created_column <= created_at
+
+
+def list_notifications(
+    db: Session,
+    user_id: str,
+    limit: int,
+    offset: int,
+    unread_only: bool,
+    before: Optional[Tuple[datetime, bool, int]] = None
+) -> List[Dict[str, Any]]:
+    """사용자 알림 최신순 조회 (개별 알림과 브로드캐스트를 합쳐서 정렬)
+
+    before 커서가 주어지면 OFFSET 대신 (created_at, id) 키셋 조건으로 다음 페이지를 찾는다.
+    두 테이블에서 각각 필요한 만큼만 가져와서 합치며, 생성 시각이 같으면 브로드캐스트가 먼저 온다.
+    """
+    fetch = limit if before else offset + limit
+    query = select(Notification).where(Notification.user_id == user_id)
+    broadcast_conditions = []
+
+    if unread_only:
+        query = query.where(Notification.is_read == False)
+
+    if before:
+        query = query.where(_before(Notification.created_at, Notification.id, False, before))
+        broadcast_conditions.append(_before(BroadcastMessage.created_at, BroadcastMessage.id, True, before))
+
+    query = query.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(fetch)
+    visible = _visible_broadcasts(user_id, *broadcast_conditions, unread_only=unread_only, limit=fetch)
+    broadcast = aliased(BroadcastMessage, visible)
+    broadcasts = (
+        select(broadcast, visible.c.read_at)
+        .order_by(broadcast.created_at.desc(), broadcast.id.desc())
+        .limit(fetch)
+    )
+
+    items = [
+        (notification.created_at, False, notification.id, notification_to_dict(notification))
+        for notification in db.execute(query).scalars()
+    ]
+    items.extend(
+        (broadcast.created_at, True, broadcast.id, broadcast_to_dict(broadcast, read_at))
+        for broadcast, read_at in db.execute(broadcasts)
+    )
+    items.sort(key=lambda item: item[:3], reverse=True)
+    if not before:
+        items = items[offset:]
+    return [item[3] for item in items[:limit]]
+
+
+def count_unread(db: Session, user_id: str) -> int:
+    notifications = db.execute(
+        select(func.count())
+        .select_from(Notification)
+        .where(Notification.user_id == user_id, Notification.is_read == False)
+    ).scalar_one()
+    broadcasts = db.execute(
+        select(func.count()).select_from(_visible_broadcasts(user_id, unread_only=True))
+    ).scalar_one()
+    return notifications + broadcasts
+
+
+def count_unread_many(db: Session, user_ids: List[str]) -> Dict[str, int]:
+    """사용자별 안읽은 알림 수 (카운터가 없는 사용자를 DB 호출 한 번으로 다시 계산)"""
+    return {user_id: count_unread(db, user_id) for user_id in user_ids}
+
+
+def mark_notification_read(db: Session, notification_id: int) -> Tuple[bool, Optional[Any]]:
+    """알림 하나를 읽음 처리
+
+    (알림 존재 여부, 안읽음 -> 읽음으로 바뀐 경우 해당 사용자 ID)를 반환한다.
+    """
+    user_id = db.execute(
+        update(Notification)
+        .where(Notification.id == notification_id, Notification.is_read == False)
+        .values(is_read=True, read_at=datetime.utcnow())
+        .returning(Notification.user_id)
+    ).scalar_one_or_none()
+    db.commit()
+    if user_id is not None:
+        return True, user_id
+
+    exists = db.execute(select(Notification.id).where(Notification.id == notification_id)).first() is not None
+    return exists, None
+
+
+def mark_broadcast_read(db: Session, broadcast_id: int, user_id: str) -> Tuple[bool, Optional[Any]]:
+    """사용자 한 명의 브로드캐스트 읽음 처리 (반환값은 mark_notification_read와 같음)
+
+    전체 브로드캐스트는 읽을 때 처음으로 사용자 상태 행을 만든다.
+    """
+    row = db.execute(
+        select(BroadcastMessage.all_users, BroadcastReceipt.user_id, BroadcastReceipt.read_at)
+        .outerjoin(BroadcastReceipt, and_(
+            BroadcastReceipt.broadcast_id == BroadcastMessage.id,
+            BroadcastReceipt.user_id == str(user_id)
+        ))
+        .where(BroadcastMessage.id == broadcast_id)
+    ).first()
+    if row is None or not (row.all_users or row.user_id is not None):
+        return False, None
+    if row.read_at is not None:
+        return True, None
+
+    now = datetime.utcnow()
+    if row.user_id is None:
+        try:
+            db.execute(insert(BroadcastReceipt), {"broadcast_id": broadcast_id, "user_id": str(user_id), "read_at": now})
+            db.commit()
+        except IntegrityError:
+            # 같은 사용자의 다른 요청이 먼저 기록함
+            db.rollback()
+            return True, None
+        return True, user_id
+
+    changed = db.execute(
+        update(BroadcastReceipt)
+        .where(
+            BroadcastReceipt.broadcast_id == broadcast_id,
+            BroadcastReceipt.user_id == str(user_id),
+            BroadcastReceipt.read_at == None
+        )
+        .values(read_at=now)
+    ).rowcount
+    db.commit()
+    return True, user_id if changed else None
+
+
+def mark_read_bulk(
+    db: Session,
+    user_id: str,
+    ids: Optional[List[Tuple[bool, int]]] = None,
+    category: Optional[str] = None,
+    before: Optional[datetime] = None,
+    max_priority: Optional[int] = None
+) -> int:
+    """조건에 맞는 사용자 알림을 한 번에 읽음 처리하고 안읽음 -> 읽음으로 바뀐 수 반환
+
+    ids(parse_notification_id로 해석한 ID)와 필터는 모두 AND 조건이며, 아무 조건이 없으면 전체를
+    읽음 처리한다. 개별 알림과 브로드캐스트 상태 행을 각각 UPDATE 한 번으로 갱신하고, 상태 행이 없는
+    전체 브로드캐스트는 INSERT ... SELECT로 읽음 상태 행을 추가한다.
+    """
+    notification_conditions = [Notification.user_id == user_id, Notification.is_read == False]
+    broadcast_conditions = []
+    if ids is not None:
+        notification_conditions.append(Notification.id.in_([item_id for is_broadcast, item_id in ids if not is_broadcast]))
+        broadcast_conditions.append(BroadcastMessage.id.in_([item_id for is_broadcast, item_id in ids if is_broadcast]))
+    if category is not None:
+        notification_conditions.append(Notification.category == category)
+        broadcast_conditions.append(BroadcastMessage.category == category)
+    if before is not None:
+        notification_conditions.append(Notification.created_at < before)
+        broadcast_conditions.append(BroadcastMessage.created_at < before)
+    if max_priority is not None:
+        notification_conditions.append(Notification.priority <= max_priority)
+        broadcast_conditions.append(BroadcastMessage.priority <= max_priority)
+
+    now = datetime.utcnow()
+    result = db.execute(
+        update(Notification)
+        .where(*notification_conditions)
+        .values(is_read=True, read_at=now)
+    )
+    receipt_conditions = [BroadcastReceipt.user_id == str(user_id), BroadcastReceipt.read_at == None]
+    if broadcast_conditions:
+        receipt_conditions.append(BroadcastReceipt.broadcast_id.in_(select(BroadcastMessage.id).where(*broadcast_conditions)))
+    receipts = db.execute(
+        update(BroadcastReceipt)
+        .where(*receipt_conditions)
+        .values(read_at=now)
+    )
+    # 아직 상태 행이 없는 전체 브로드캐스트는 읽음 상태로 행을 추가
+    unread_broadcasts = select(BroadcastMessage.id, literal(str(user_id)), literal(now)).where(
+        BroadcastMessage.all_users == True,
+        ~exists().where(
+            BroadcastReceipt.broadcast_id == BroadcastMessage.id,
+            BroadcastReceipt.user_id == str(user_id)
+        ),
+        *broadcast_conditions
+    )
+    created = db.execute(
+        insert(BroadcastReceipt).from_select(["broadcast_id", "user_id", "read_at"], unread_broadcasts)
+    )
+    db.commit()
+    return result.rowcount + receipts.rowcount + created.rowcount
+
+
+def mark_all_read(db: Session, user_id: str) -> int:
+    return mark_read_bulk(db, user_id)
+
+
+def expired_condition(now: datetime, default_days: int, category_days: Dict[str, int], model=Notification):
+    """보관 기간이 지난 알림(model이 BroadcastMessage면 브로드캐스트) 조건
+
+    카테고리별 기간이 없으면 기본 기간, 0일은 무기한 보관 - 조건이 없으면 None
+    """
+    conditions = [
+        and_(model.category == category, model.created_at < now - timedelta(days=days))
+        for category, days in category_days.items() if days > 0
+    ]
+    if default_days > 0:
+        other = model.category == None
+        if category_days:
+            other = or_(other, model.category.notin_(list(category_days)))
+        conditions.append(and_(other, model.created_at < now - timedelta(days=default_days)))
+    return or_(*conditions) if conditions else None
+
+
+def expired_broadcast_condition(now: datetime, default_days: int, category_days: Dict[str, int]):
+    return expired_condition(now, default_days, category_days, BroadcastMessage)
+
+
+def archivable_condition(now: datetime, days: int):
+    """읽음 처리되고 생성된 지 days일이 지난 알림 조건"""
+    return and_(Notification.is_read == True, Notification.created_at < now - timedelta(days=days))
+
+
+def select_notifications(db: Session, condition, limit: int) -> List[Dict[str, Any]]:
+    """조건에 맞는 알림을 오래된 순으로 최대 limit개 조회 (사용자 ID 포함, 보관 파일 기록용)"""
+    notifications = db.execute(
+        select(Notification).where(condition).order_by(Notification.created_at, Notification.id).limit(limit)
+    ).scalars()
+    return [{"user_id": notification.user_id, **notification_to_dict(notification)} for notification in notifications]
+
+
+def select_notification_ids(db: Session, condition, limit: int) -> List[int]:
+    return list(db.execute(
+        select(Notification.id).where(condition).order_by(Notification.created_at, Notification.id).limit(limit)
+    ).scalars())
+
+
+def delete_notifications(db: Session, ids: List[int], archive: bool = False) -> List[Tuple[Any, bool]]:
+    """알림 삭제 후 지운 행의 (사용자 ID, 읽음 여부) 반환 (archive가 True면 같은 트랜잭션에서 notifications_archive로 옮김)"""
+    if not ids:
+        return []
+    if archive:
+        columns = ["user_id", "title", "message", "icon", "is_read", "created_at", "read_at", "category", "priority"]
+        db.execute(insert(ArchivedNotification).from_select(
+            ["notification_id", *columns],
+            select(Notification.id, *(getattr(Notification, column) for column in columns)).where(Notification.id.in_(ids))
+        ))
+    removed = db.execute(
+        delete(Notification).where(Notification.id.in_(ids)).returning(Notification.user_id, Notification.is_read)
+    ).all()
+    db.commit()
+    return [(user_id, bool(is_read)) for user_id, is_read in removed]
+
+
+def select_broadcasts(db: Session, condition, limit: int) -> List[Tuple[int, bool]]:
+    """조건에 맞는 브로드캐스트의 (ID, 전체 브로드캐스트 여부)를 오래된 순으로 최대 limit개 조회"""
+    return [
+        (broadcast_id, bool(all_users))
+        for broadcast_id, all_users in db.execute(
+            select(BroadcastMessage.id, BroadcastMessage.all_users)
+            .where(condition)
+            .order_by(BroadcastMessage.created_at, BroadcastMessage.id)
+            .limit(limit)
+        )
+    ]
+
+
+def delete_broadcast_receipts(db: Session, broadcast_id: int, limit: int) -> List[Tuple[str, bool]]:
+    """브로드캐스트의 수신자 상태 행을 최대 limit개 삭제 후 지운 행의 (사용자 ID, 읽음 여부) 반환"""
+    user_ids = select(BroadcastReceipt.user_id).where(BroadcastReceipt.broadcast_id == broadcast_id).limit(limit)
+    removed = db.execute(
+        delete(BroadcastReceipt)
+        .where(BroadcastReceipt.broadcast_id == broadcast_id, BroadcastReceipt.user_id.in_(user_ids.scalar_subquery()))
+        .returning(BroadcastReceipt.user_id, BroadcastReceipt.read_at)
+    ).all()
+    db.commit()
+    return [(user_id, read_at is not None) for user_id, read_at in removed]
+
+
+def delete_broadcast(db: Session, broadcast_id: int, all_users: bool) -> bool:
+    """브로드캐스트 내용 삭제 - 지웠으면 True
+
+    지정 사용자 브로드캐스트는 수신자 상태 행이 모두 지워진 뒤에만 지운다. 전체 브로드캐스트는 상태 행이
+    없으면 안읽음으로 보이므로 내용부터 지워서 바로 숨기고, 남은 (읽은 사용자의) 상태 행은 호출하는 쪽에서
+    delete_broadcast_receipts로 배치 단위로 지운다. 내용이 없는 상태 행은 조회되지 않는다.
+    """
+    condition = BroadcastMessage.id == broadcast_id
+    if not all_users:
+        condition = and_(condition, ~exists().where(BroadcastReceipt.broadcast_id == broadcast_id))
+    deleted = db.execute(delete(BroadcastMessage).where(condition)).rowcount
+    db.commit()
+    return bool(deleted)
+
+
+def retention_report(db: Session) -> Dict[str, Any]:
+    """알림/브로드캐스트 테이블 행 수(전체/안읽음/카테고리별), 가장 오래된 알림, 보관 테이블 행 수와 DB 크기"""
+    rows, unread, oldest = db.execute(
+        select(func.count(), func.count().filter(Notification.is_read == False), func.min(Notification.created_at))
+    ).one()
+    categories = {
+        category or "": count
+        for category, count in db.execute(select(Notification.category, func.count()).group_by(Notification.category))
+    }
+    archived = db.execute(select(func.count()).select_from(ArchivedNotification)).scalar_one()
+    broadcasts, all_users, broadcast_oldest = db.execute(
+        select(func.count(), func.count().filter(BroadcastMessage.all_users == True), func.min(BroadcastMessage.created_at))
+    ).one()
+    broadcast_categories = {
+        category or "": count
+        for category, count in db.execute(select(BroadcastMessage.category, func.count()).group_by(BroadcastMessage.category))
+    }
+    receipts, receipts_unread = db.execute(
+        select(func.count(), func.count().filter(BroadcastReceipt.read_at == None)).select_from(BroadcastReceipt)
+    ).one()
+
+    # SQLite는 지운 페이지를 파일에 남겨 두고 재사용하므로 빈 페이지 크기(free_bytes)도 함께 보여줌 (줄이려면 VACUUM)
+    size: Dict[str, Any] = {}
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        page_size = db.execute(text("PRAGMA page_size")).scalar_one()
+        size["bytes"] = db.execute(text("PRAGMA page_count")).scalar_one() * page_size
+        size["free_bytes"] = db.execute(text("PRAGMA freelist_count")).scalar_one() * page_size
+    elif dialect == "postgresql":
+        size["notifications_bytes"] = db.execute(text("SELECT pg_total_relation_size('notifications')")).scalar_one()
+        size["archive_bytes"] = db.execute(text("SELECT pg_total_relation_size('notifications_archive')")).scalar_one()
+        size["broadcast_bytes"] = db.execute(
+            text("SELECT pg_total_relation_size('broadcast_messages') + pg_total_relation_size('broadcast_receipts')")
+        ).scalar_one()
+
+    return {
+        "notifications": {
+            "rows": rows,
+            "unread": unread,
+            "oldest": oldest.isoformat() if oldest else None,
+            "categories": categories
+        },
+        "broadcasts": {
+            "rows": broadcasts,
+            "all_users": all_users,
+            "oldest": broadcast_oldest.isoformat() if broadcast_oldest else None,
+            "categories": broadcast_categories,
+            "receipts": receipts,
+            "receipts_unread": receipts_unread
+        },
+        "archive_rows": archived,
+        "database": size
+    }
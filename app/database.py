@@ -0,0 +1,62 @@
+# database.py
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from metrics import DB_CALL_LATENCY
+from models import Base
+from settings import DATABASE_URL, DB_POOL_SIZE
+
+connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+# 커넥션 수 제한은 QueuePool에만 적용 (메모리 SQLite 등은 pool_size를 받지 않는 풀을 사용)
+_url = make_url(DATABASE_URL)
+pool_args = {}
+if issubclass(_url.get_dialect().get_pool_class(_url), QueuePool):
+    pool_args = {"pool_size": DB_POOL_SIZE, "max_overflow": 0}
+engine = create_engine(
+    DATABASE_URL,
+    connect_args=connect_args,
+    **pool_args
+)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+_db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="db")
+
+
+def init_db():
+    Base.metadata.create_all(bind=engine, checkfirst=True)
+    # create_all은 이미 존재하는 테이블에 새로 추가된 인덱스를 만들지 않으므로 따로 확인
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def shutdown_db():
+    _db_executor.shutdown(wait=True)
+    engine.dispose()
+
+
+def _call_with_session(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    with SessionLocal() as db:
+        return fn(db, *args, **kwargs)
+
+
+async def run_db(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """동기 DB 함수 fn(db, ...)을 전용 스레드 풀에서 실행
+
+    SQLAlchemy 세션 호출(특히 SQLite commit)이 이벤트 루프를 막아
+    같은 워커의 모든 SSE 스트림이 멈추는 것을 방지한다.
+    """
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        return await loop.run_in_executor(_db_executor, partial(_call_with_session, fn, *args, **kwargs))
+    finally:
+        DB_CALL_LATENCY.labels(fn.__name__).observe(time.perf_counter() - started)
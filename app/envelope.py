@@ -0,0 +1,74 @@
+# envelope.py
+# 발행 메시지 봉투: "<event_id> <priority> <event>\n<json>"
+# 이벤트 ID, 우선순위, 이벤트 종류를 JSON 본문 밖에 둬서 본문을 파싱하지 않고 꺼낼 수 있게 한다
+from typing import Any, Optional, Tuple, Union
+
+import orjson
+
+# Notification.priority 범위 (0: 일반, 1: 중요, 2: 긴급)
+MAX_PRIORITY = 2
+
+
+def clamp_priority(value: Any) -> int:
+    try:
+        return min(max(int(value), 0), MAX_PRIORITY)
+    except (TypeError, ValueError):
+        return 0
+
+
+def dumps(value: Any) -> str:
+    """JSON 직렬화 (orjson - 공백 없이, 비ASCII 문자는 그대로)"""
+    return orjson.dumps(value).decode()
+
+
+def event_type(data: Union[str, bytes]) -> str:
+    """JSON 본문의 event 필드 - 봉투에 이벤트 종류가 없을 때만 사용 (발행 시 한 번)"""
+    try:
+        value = orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return "message"
+    event = value.get("event") if isinstance(value, dict) else None
+    return event if isinstance(event, str) and event else "message"
+
+
+def pack(data: str, event_id: Optional[str] = None, priority: int = 0, event: str = "message") -> str:
+    return f"{event_id or ''} {priority} {event}\n{data}"
+
+
+def unpack(raw: str) -> Tuple[Optional[str], int, str, str]:
+    """(이벤트 ID, 우선순위, 이벤트 종류, JSON 본문) 반환
+
+    봉투 없이 발행된 메시지는 ID 없이 일반 우선순위로, 이벤트 종류가 없는 이전 형식의 봉투는
+    본문에서 이벤트 종류를 읽어서 반환한다.
+    """
+    header, sep, data = raw.partition("\n")
+    if not sep:
+        return None, 0, event_type(raw), raw
+    event_id, _, rest = header.partition(" ")
+    priority, _, event = rest.partition(" ")
+    return event_id or None, clamp_priority(priority), event or event_type(data), data
+
+
+def frame(data: Union[str, bytes], event: str = "message", event_id: Optional[str] = None) -> bytes:
+    """SSE 이벤트 바이트 (sse-starlette ServerSentEvent.encode()와 같은 형식)
+
+    허브에서 메시지마다 한 번만 만들고, 같은 바이트를 모든 수신 연결이 그대로 쓴다.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    parts = []
+    if event_id:
+        parts.append(b"id: " + event_id.encode() + b"\r\n")
+    parts.append(b"event: " + event.encode() + b"\r\n")
+    if b"\n" in data or b"\r" in data:
+        parts.extend(b"data: " + line + b"\r\n" for line in data.splitlines())
+    else:
+        parts.append(b"data: " + data + b"\r\n")
+    parts.append(b"\r\n")
+    return b"".join(parts)
+
+
+def parse_event_id(event_id: str) -> Tuple[int, int]:
+    """`<ms>-<seq>` 형식의 이벤트 ID를 비교 가능한 튜플로 변환 (형식이 잘못되면 ValueError)"""
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq)
@@ -0,0 +1,444 @@
+# hub.py
+import asyncio
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError, ResponseError
+
+from envelope import MAX_PRIORITY, dumps, frame, parse_event_id, unpack
+from settings import (
+    DELIVERY_BATCH_SIZE,
+    REDIS_STREAM_BLOCK_MS,
+    REDIS_STREAM_READ_COUNT,
+    SUBSCRIBER_OVERFLOW_POLICY,
+    SUBSCRIBER_QUEUE_SIZE,
+)
+
+
+# 전송 버퍼가 가득 찼을 때의 처리 방식 (settings.SUBSCRIBER_OVERFLOW_POLICY 참고)
+OVERFLOW_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+
+def missed_message(count: int) -> str:
+    """버퍼가 넘쳐서 전달하지 못한 알림 수 요약 이벤트 (coalesce 정책)"""
+    return dumps({"event": "missed", "count": count})
+
+
+class Subscription:
+    """SSE 연결 하나의 우선순위별 전송 버퍼
+
+    꺼낼 때는 높은 우선순위부터 최대 batch_size개씩 꺼내므로, 일반 알림이 많이 쌓여
+    있어도 긴급 알림은 다음 쓰기에서 바로 전송된다. maxsize가 0이면 크기 제한이 없다.
+    가득 찼을 때는 policy에 따라 오래된 메시지를 버리거나(drop_oldest), 버린 수를 모아두거나(coalesce),
+    버퍼를 비우고 닫는다(disconnect). 어느 경우에도 연결 하나가 maxsize보다 많은 메시지를 붙잡지 않는다.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        batch_size: int = DELIVERY_BATCH_SIZE,
+        policy: str = SUBSCRIBER_OVERFLOW_POLICY
+    ):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self._queues = [deque() for _ in range(MAX_PRIORITY + 1)]
+        self._maxsize = maxsize
+        self._batch_size = batch_size
+        self._policy = policy
+        self._size = 0
+        self._ready = asyncio.Event()
+        # coalesce 정책에서 버려져 아직 요약으로 전달하지 않은 메시지 수
+        self._missed = 0
+        # disconnect 정책으로 닫힌 버퍼 (이후 메시지는 받지 않음)
+        self.closed = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    def put(self, item: Any, priority: int = 0) -> int:
+        """메시지 추가 - 버퍼가 가득 차서 버려진 메시지 수 반환
+
+        가장 낮은 우선순위의 가장 오래된 메시지를 버린다. 새 메시지가 그보다 더 낮은
+        우선순위면 새 메시지를 버린다. disconnect 정책이면 남은 메시지를 모두 버리고 버퍼를 닫는다.
+        """
+        if self.closed:
+            return 0
+
+        dropped = 0
+        if self._maxsize and self._size >= self._maxsize:
+            if self._policy == "disconnect":
+                dropped = self._size + 1
+                self.drain()
+                self.closed = True
+                self._ready.set()
+                return dropped
+
+            dropped = 1
+            if self._policy == "coalesce":
+                self._missed += 1
+            lowest = next(level for level, queue in enumerate(self._queues) if queue)
+            if priority < lowest:
+                return dropped
+            self._queues[lowest].popleft()
+            self._size -= 1
+
+        self._queues[priority].append(item)
+        self._size += 1
+        self._ready.set()
+        return dropped
+
+    async def get_batch(self) -> List[Any]:
+        """메시지가 들어올 때까지 기다렸다가 높은 우선순위부터 최대 batch_size개 반환 (닫히면 빈 목록)"""
+        while not self._size and not self.closed:
+            self._ready.clear()
+            await self._ready.wait()
+
+        batch = []
+        for queue in reversed(self._queues):
+            while queue and len(batch) < self._batch_size:
+                batch.append(queue.popleft())
+        self._size -= len(batch)
+        return batch
+
+    def lowest_event_id(self) -> Optional[Tuple[int, int]]:
+        """버퍼에 남은 (이벤트 ID, ...) 항목 중 가장 낮은 이벤트 ID (없으면 None)
+
+        우선순위별 버퍼 안에서는 도착 순서(= ID 순서)로 쌓이므로 버퍼마다 앞쪽만 확인한다.
+        """
+        lowest = None
+        for queue in self._queues:
+            event_id = next((item[0] for item in queue if item[0]), None)
+            if event_id:
+                parsed = parse_event_id(event_id)
+                if lowest is None or parsed < lowest:
+                    lowest = parsed
+        return lowest
+
+    def take_missed(self) -> int:
+        """지난 전송 이후 버려진 메시지 수를 꺼내고 초기화 (coalesce 정책)"""
+        missed, self._missed = self._missed, 0
+        return missed
+
+    def drain(self) -> List[Any]:
+        """남은 메시지를 모두 꺼냄 (연결 종료 시 정리용)"""
+        items = [item for queue in reversed(self._queues) for item in queue]
+        for queue in self._queues:
+            queue.clear()
+        self._size = 0
+        return items
+
+
+def _strip_event_id(payload: bytes) -> bytes:
+    if payload.startswith(b"id: "):
+        return payload[payload.index(b"\r\n") + 2:]
+    return payload
+
+
+class ResumeTracker:
+    """SSE 연결 하나에서 클라이언트에 보낸 `id:`가 항상 증가하도록 관리
+
+    우선순위 순으로 꺼내면 ID가 높은 긴급 알림이 버퍼에 남은 ID가 낮은 일반 알림보다 먼저 나간다.
+    이때 긴급 알림의 ID를 그대로 보내면 Last-Event-ID로 재연결할 때 아직 못 받은 알림을 건너뛰므로,
+    아직 전송되지 않은 가장 낮은 ID보다 작은 ID만 프레임에 남기고 나머지는 `id:`를 뺀다.
+    ID를 뺀 알림은 그보다 낮은 알림이 모두 전송된 뒤 ID만 있는 블록(`id: X`)으로 알린다 -
+    SSE 클라이언트는 데이터가 없는 블록을 이벤트로 발생시키지 않고 마지막 이벤트 ID만 갱신한다.
+    """
+
+    def __init__(self, last_id: Optional[Tuple[int, int]] = None):
+        # 클라이언트에 마지막으로 알린 ID와, 전송했지만 아직 알리지 못한 ID 목록
+        self.last_id = last_id
+        self._held: Dict[Tuple[int, int], str] = {}
+
+    def hold(self, event_id: str):
+        """전송한 것으로 보고 재연결 지점 후보에 추가 (버퍼에 남은 더 낮은 ID가 모두 전송되면 알림)"""
+        parsed = parse_event_id(event_id)
+        if self.last_id is None or parsed > self.last_id:
+            self._held[parsed] = event_id
+
+    def frames(self, batch: List[Tuple[Optional[str], bytes]], pending: Optional[Tuple[int, int]]) -> List[bytes]:
+        """(이벤트 ID, SSE 바이트) 목록을 보낼 프레임으로 변환
+
+        pending은 버퍼에 남은 가장 낮은 이벤트 ID (Subscription.lowest_event_id).
+        """
+        ids = [parse_event_id(event_id) if event_id else None for event_id, _ in batch]
+        # 각 프레임 뒤에 아직 보내지 않은 가장 낮은 ID (같은 배치의 뒤쪽 프레임 포함)
+        floors, floor = [], pending
+        for parsed in reversed(ids):
+            floors.append(floor)
+            if parsed and (floor is None or parsed < floor):
+                floor = parsed
+        floors.reverse()
+
+        frames = []
+        for (event_id, payload), parsed, floor in zip(batch, ids, floors):
+            if parsed is None:
+                frames.append(payload)
+            elif (self.last_id is None or parsed > self.last_id) and (floor is None or parsed < floor):
+                frames.append(payload)
+                self.last_id = parsed
+            else:
+                frames.append(_strip_event_id(payload))
+                self.hold(event_id)
+
+        # 보류한 ID 중 그보다 낮은 미전송 알림이 없는 가장 높은 ID를 알림
+        released = [parsed for parsed in self._held if pending is None or parsed < pending]
+        if released:
+            resume = max(released)
+            if self.last_id is None or resume > self.last_id:
+                frames.append(b"id: " + self._held[resume].encode() + b"\r\n\r\n")
+                self.last_id = resume
+        if self._held and self.last_id is not None:
+            self._held = {parsed: event_id for parsed, event_id in self._held.items() if parsed > self.last_id}
+        return frames
+
+
+class LocalHub:
+    """워커 내 사용자별 전송 버퍼(Subscription) 목록과 분배
+
+    한 사용자가 여러 탭을 열면 탭마다 별도의 버퍼가 등록된다. 메시지는 받는 연결이 있을 때만
+    SSE 이벤트 바이트로 한 번 만들고, 같은 바이트를 모든 수신 연결의 버퍼에 넣는다.
+    버퍼가 가득 찬 느린 소비자는 넘침 정책에 따라 처리해서 분배가 멈추지 않도록 한다.
+    """
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self._queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        # 큐가 가득 차서 버려진 메시지 수와 disconnect 정책으로 닫힌 연결 수
+        self.dropped = 0
+        self.disconnected = 0
+
+    def subscribe(self, user_id: str) -> Subscription:
+        """연결 하나에 대한 로컬 전송 버퍼 등록"""
+        subscription = Subscription(maxsize=self._queue_size)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id: str, subscription: Subscription):
+        subscriptions = self._subscribers.get(user_id)
+        if not subscriptions:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscribers[user_id]
+
+    def is_connected(self, user_id: str) -> bool:
+        return user_id in self._subscribers
+
+    def users(self) -> List[str]:
+        """이 워커에 연결이 있는 사용자 ID 목록"""
+        return list(self._subscribers)
+
+    @property
+    def connection_count(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscribers.values())
+
+    def queue_depths(self) -> Iterable[int]:
+        """연결별 전송 버퍼에 쌓인 메시지 수"""
+        return (len(subscription) for subscriptions in self._subscribers.values() for subscription in subscriptions)
+
+    def deliver(
+        self,
+        user_id: Optional[str],
+        event_id: Optional[str],
+        priority: int,
+        event: str,
+        data: Union[str, bytes]
+    ):
+        """사용자의 모든 연결에 메시지 전달 (user_id가 None이면 이 워커의 모든 연결)
+
+        버퍼 항목은 (이벤트 ID, SSE 이벤트 바이트)이다.
+        """
+        if user_id is None:
+            targets = [subscription for subscriptions in self._subscribers.values() for subscription in subscriptions]
+        else:
+            targets = self._subscribers.get(user_id)
+        if not targets:
+            return
+        item = (event_id, frame(data, event, event_id))
+        for subscription in targets:
+            dropped = subscription.put(item, priority)
+            if dropped:
+                self.dropped += dropped
+                if subscription.closed:
+                    self.disconnected += 1
+
+
+class NotificationHub(LocalHub):
+    """워커 단위 Redis PubSub 팬아웃 허브
+
+    SSE 연결마다 Redis 구독을 만드는 대신, 워커당 하나의 패턴 구독(`channel:*`)으로
+    메시지를 읽어 사용자 ID별 전송 버퍼로 분배한다. 전체 브로드캐스트 채널(`broadcast`)로
+    들어온 메시지는 이 워커에 연결된 모든 스트림으로 전달한다.
+    worker를 지정하면 이 워커 전용 채널(`worker:{worker}:{user_id}`)도 구독해서, 접속 현황으로
+    연결 위치를 아는 발행자가 이 워커에만 보낸 메시지를 받는다.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        pattern: str = "channel:*",
+        broadcast_channel: str = "broadcast",
+        queue_size: int = SUBSCRIBER_QUEUE_SIZE,
+        worker: Optional[str] = None
+    ):
+        super().__init__(queue_size)
+        self._redis = redis
+        self._patterns = [pattern]
+        self._broadcast_channel = broadcast_channel
+        self._prefix = pattern.rstrip("*")
+        self._worker_prefix = None
+        if worker:
+            self._worker_prefix = f"worker:{worker}:"
+            self._patterns.append(f"{self._worker_prefix}*")
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.psubscribe(*self._patterns)
+        await self._pubsub.subscribe(self._broadcast_channel)
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def stop(self):
+        if self._reader:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        if self._pubsub:
+            await self._pubsub.punsubscribe(*self._patterns)
+            await self._pubsub.unsubscribe(self._broadcast_channel)
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+    def dispatch(self, channel: str, raw: str):
+        """채널로 받은 봉투 메시지를 해당 사용자(broadcast 채널이면 모든 연결)에게 전달"""
+        if channel == self._broadcast_channel:
+            user_id = None
+        elif self._worker_prefix and channel.startswith(self._worker_prefix):
+            user_id = channel[len(self._worker_prefix):]
+        else:
+            user_id = channel[len(self._prefix):]
+        event_id, priority, event, data = unpack(raw)
+        self.deliver(user_id, event_id, priority, event, data)
+
+    async def _read_loop(self):
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message["type"] not in ("message", "pmessage"):
+                        continue
+                    channel = message["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode("utf-8")
+                    data = message["data"]
+                    if isinstance(data, bytes):
+                        data = data.decode("utf-8")
+                    self.dispatch(channel, data)
+                return
+            except RedisConnectionError:
+                # 재연결 시 redis-py가 패턴 구독을 복구한다
+                await asyncio.sleep(1)
+
+
+class StreamHub(NotificationHub):
+    """Redis Streams 컨슈머 그룹 기반 팬아웃 허브
+
+    사용자 샤드별 전달 스트림(StreamShards)을 워커 전용 컨슈머 그룹으로 XREADGROUP해서 읽고,
+    읽은 항목은 로컬 전송 버퍼에 넣은 뒤 스트림별로 한 번에 XACK한다. 그룹은 워커가 꺼져 있는
+    동안 쌓인 항목과 읽었지만 확인하지 못한 항목(PEL)을 보존하므로, 같은 그룹 이름(WORKER_ID)으로
+    재시작한 워커는 PEL부터 처리한 뒤 새 항목을 이어서 읽는다.
+    스트림 항목은 PubSub과 같은 채널 이름(`channel`)과 봉투 메시지(`data`)로 구성된다.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        streams: List[str],
+        group: str,
+        consumer: str,
+        count: int = REDIS_STREAM_READ_COUNT,
+        block: int = REDIS_STREAM_BLOCK_MS,
+        queue_size: int = SUBSCRIBER_QUEUE_SIZE
+    ):
+        super().__init__(redis, queue_size=queue_size)
+        self._streams = streams
+        self._group = group
+        self._consumer = consumer
+        self._count = count
+        self._block = block
+        # 분배했지만 아직 확인하지 못한 항목 (XACK가 실패하면 다음 확인 때 함께 보냄)
+        self._unacked: Dict[str, List[str]] = {}
+        # 읽은 항목 수와 처리 완료(XACK)한 항목 수
+        self.read = 0
+        self.acked = 0
+
+    @property
+    def group(self) -> str:
+        return self._group
+
+    async def start(self):
+        await self._create_groups()
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def destroy_groups(self):
+        """이 워커의 컨슈머 그룹 삭제 (재시작 후 이어 읽을 필요가 없는 임시 워커의 종료 시 정리)"""
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for stream in self._streams:
+                pipe.xgroup_destroy(stream, self._group)
+            await pipe.execute()
+
+    async def _create_groups(self):
+        # 새 그룹은 생성 시점 이후 항목부터 읽음 (그 전 이벤트는 Last-Event-ID 재전송이 담당)
+        for stream in self._streams:
+            try:
+                await self._redis.xgroup_create(stream, self._group, id="$", mkstream=True)
+            except ResponseError as e:
+                # 이미 있는 그룹은 마지막으로 전달한 위치를 유지
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+    async def _read_loop(self):
+        # 재시작 직후에는 이전에 받았지만 확인하지 못한 항목(ID "0")부터 처리
+        pending = True
+        while True:
+            try:
+                response = await self._redis.xreadgroup(
+                    self._group,
+                    self._consumer,
+                    {stream: "0" if pending else ">" for stream in self._streams},
+                    count=self._count,
+                    block=None if pending else self._block
+                )
+                if pending and not any(entries for _, entries in response or ()):
+                    pending = False
+                    continue
+                await self._process(response or ())
+            except RedisConnectionError:
+                await asyncio.sleep(1)
+            except ResponseError as e:
+                # 스트림이 삭제되어 그룹이 사라진 경우 다시 생성
+                if "NOGROUP" not in str(e):
+                    raise
+                await self._create_groups()
+
+    async def _process(self, response):
+        """읽은 항목을 분배하고 스트림별로 한 번에 확인"""
+        for stream, entries in response:
+            for entry_id, fields in entries:
+                # PEL 항목 중 트리밍으로 본문이 사라진 항목은 확인만 함
+                if fields:
+                    self.dispatch(fields["channel"], fields["data"])
+                self._unacked.setdefault(stream, []).append(entry_id)
+                self.read += 1
+        if not self._unacked:
+            return
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for stream, ids in self._unacked.items():
+                pipe.xack(stream, self._group, *ids)
+            await pipe.execute()
+        self.acked += sum(len(ids) for ids in self._unacked.values())
+        self._unacked = {}
@@ -1,25 +1,28 @@
-from fastapi import FastAPI, Request, Depends, HTTPException
+from fastapi import FastAPI, Request, Response, Depends, HTTPException, Header, Query
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from sse_starlette.sse import EventSourceResponse
-from redis.asyncio import Redis
 import json
-import os
 import asyncio
 from dotenv import load_dotenv
-from typing import Optional, AsyncGenerator
-from sqlalchemy.orm import Session
-from sqlalchemy.future import select
-from models import User, Notification
+from typing import Optional, AsyncGenerator, Dict, Any, Iterable, List, Set
 from datetime import datetime
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from models import Base
-from icecream import ic
+from database import init_db, shutdown_db, run_db
+import crud
+from batch import read_batch_items, read_bulk_read_filters, validate_batch_item, batch_error, batch_queued, batch_success
+from broker import Broker, create_broker
+from hub import ResumeTracker, missed_message
+from unread import unread_message
+from replay import notification_event
+from outbox import OutboxRelay
+from coalesce import Coalescer, merge_messages, wants_coalesce
+from retention import RetentionJob
+from broadcast_stream import iter_lines, read_stream_header, stream_broadcast
+from envelope import frame, parse_event_id, clamp_priority
+from settings import BATCH_MAX_ITEMS, REPLAY_MAX_ENTRIES, SSE_HEARTBEAT_INTERVAL, SSE_SEND_TIMEOUT
+import metrics
 import re
-ic.configureOutput(includeContext=True)
 
 load_dotenv()
 
@@ -29,98 +32,222 @@ app = FastAPI()
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
-# Redis 연결 설정
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
-REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
-
-# Redis 클라이언트 설정
-redis_client = None
-
-DATABASE_URL = "sqlite:///./notifications.db"  # 또는 다른 데이터베이스 URL
-
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 메시지 브로커 백엔드 (BROKER 환경 변수 - redis, redis-streams, rabbitmq, memory)
+broker = create_broker()
+# 사용자별 안읽은 알림 카운터
+unread_counter = broker.unread_counter
+# 사용자별 최근 알림 페이지 캐시
+recent_cache = broker.recent_cache
+# 스트리밍 브로드캐스트 작업 상태
+broadcast_jobs = broker.broadcast_jobs
+# 아웃박스에 커밋된 알림을 브로커로 전달하는 릴레이
+outbox_relay: Optional[OutboxRelay] = None
+# 같은 사용자/카테고리의 연속 알림을 모아서 저장/발행하는 작업
+coalescer: Optional[Coalescer] = None
+# 보관 기간이 지난 알림 정리 작업
+retention_job: Optional[RetentionJob] = None
+# 이벤트 루프 지연 측정 작업
+loop_monitor: Optional[asyncio.Task] = None
 
 @app.on_event("startup")
 async def startup_db_client():
-    global redis_client
-    redis_client = Redis(
-        host=REDIS_HOST,
-        port=REDIS_PORT,
-        decode_responses=True
-    )
-    Base.metadata.create_all(bind=engine, checkfirst=True)
+    global outbox_relay, coalescer, retention_job, loop_monitor
+    await broker.start()
+    metrics.bind_hub(broker.hub)
+    init_db()
+    outbox_relay = OutboxRelay(deliver_outbox)
+    outbox_relay.start()
+    coalescer = Coalescer(flush_coalesced)
+    coalescer.start()
+    retention_job = RetentionJob(on_retention_removed)
+    retention_job.start()
+    loop_monitor = asyncio.create_task(metrics.monitor_event_loop())
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    if redis_client:
-        await redis_client.close()
+    if loop_monitor:
+        loop_monitor.cancel()
+    if retention_job:
+        await retention_job.stop()
+    # 모아 둔 알림을 저장한 뒤 릴레이 종료
+    if coalescer:
+        await coalescer.stop()
+    if outbox_relay:
+        await outbox_relay.stop()
+    await broker.stop()
+    shutdown_db()
+
+async def get_broker() -> Broker:
+    return broker
+
+async def deliver_outbox(events: List[Dict[str, Any]]):
+    """아웃박스 이벤트를 브로커로 한 번에 발행한 뒤 받는 사용자의 안읽은 알림 수 전달
+
+    카운터는 알림을 커밋할 때 이미 무효화했으므로 여기서는 현재 값을 읽어서 전달만 한다
+    (발행 시점에 증가시키면 그 사이 DB에서 다시 계산한 값에 한 번 더 더해짐).
+    """
+    await broker.publish(events)
+    
+    # 알림은 이미 발행되었으므로 전달이 실패해도 재시도하지 않음 (다음 조회나 변경 때 다시 전달)
+    try:
+        user_ids = {str(event["user_id"]) for event in events if event["unread"] and event["user_id"] is not None}
+        if user_ids:
+            await broker.publish_unread(await unread_counter.get_many(user_ids))
+    except Exception:
+        pass
+
+async def flush_coalesced(groups: List[List[Any]]):
+    """병합한 알림을 한 번에 저장하고 그룹마다 이벤트 하나만 발행"""
+    await run_db(crud.create_coalesced, groups, merge_messages)
+    outbox_relay.wake()
+    # 이미 저장되었으므로 여기서 실패해도 다시 저장하지 않음
+    await invalidate_users({str(items[-1][0]["user_id"]) for items in groups})
+
+async def on_retention_removed(user_ids: Optional[Set[str]], unread: Dict[str, int]):
+    """정리 작업이 지운 사용자의 최근 알림 캐시를 비우고, 안읽은 알림을 지웠으면 카운터를 줄여서 전달
 
-async def get_redis() -> Redis:
-    return redis_client
+    user_ids가 None이면 전체 브로드캐스트가 지워진 것이므로 모든 사용자의 캐시와 카운터를 무효화한다.
+    """
+    try:
+        if user_ids is None:
+            await recent_cache.invalidate_all()
+            await unread_counter.invalidate_all()
+            return
+        await recent_cache.invalidate_many(user_ids)
+        if unread:
+            await broker.publish_unread(await unread_counter.incr_many({user_id: -count for user_id, count in unread.items()}))
+    except broker.errors:
+        pass
+
+async def invalidate_users(user_ids: Optional[Iterable[Any]] = None):
+    """새 알림을 커밋한 사용자의 최근 알림 캐시와 안읽은 알림 카운터 무효화 (None이면 전체 사용자)
+
+    카운터는 다음 조회 때 DB에서 다시 계산한다. DB는 이미 커밋되었으므로 저장소 장애는 무시한다.
+    """
+    user_ids = None if user_ids is None else list(user_ids)
+    await invalidate_recent(user_ids)
+    try:
+        if user_ids is None:
+            await unread_counter.invalidate_all()
+        else:
+            await unread_counter.invalidate_many(user_ids)
+    except broker.errors:
+        pass
+
+async def invalidate_recent(user_ids: Optional[Iterable[Any]] = None):
+    """최근 알림 캐시 무효화 (None이면 전체 사용자)
+
+    DB는 이미 커밋되었으므로 캐시 저장소 장애로 요청을 실패시키지 않는다 (남은 값은 캐시 TTL로 만료).
+    """
+    try:
+        if user_ids is None:
+            await recent_cache.invalidate_all()
+        else:
+            await recent_cache.invalidate_many(user_ids)
+    except broker.errors:
+        pass
+
+async def update_unread(user_id: str, amount: Optional[int] = None, recount: bool = False) -> Optional[int]:
+    """읽음 처리 후 안읽은 알림 수 갱신/전달 (amount가 None이면 0으로 초기화)
+
+    캐시된 카운터가 없으면 recount일 때만 다시 계산한다. DB는 이미 커밋되었으므로 카운터 저장소
+    장애는 무시하고 None 반환 (카운터는 TTL 만료 후 DB에서 재계산).
+    """
+    try:
+        count = await unread_counter.reset(user_id) if amount is None else await unread_counter.incr(user_id, amount)
+        if count is None and recount:
+            count = await unread_counter.get(user_id)
+        await broker.publish_unread({user_id: count})
+        return count
+    except broker.errors:
+        return None
 
 @app.get("/", response_class=HTMLResponse)
 async def get_homepage(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
-async def event_generator(user_id: str) -> AsyncGenerator:
+async def event_generator(user_id: str, last_event_id: Optional[str] = None) -> AsyncGenerator:
     """사용자별 이벤트 생성기"""
-    channel_name = f"channel:{user_id}"
-    subscription = redis_client.pubsub()
-    await subscription.subscribe(channel_name)
+    # 연결마다 브로커 구독을 만드는 대신 워커 허브의 로컬 전송 버퍼에 등록
+    # (재전송 중 도착하는 이벤트를 놓치지 않도록 재전송보다 먼저 등록)
+    subscription = await broker.subscribe(user_id)
+    # 접속 현황에 이 워커의 연결로 기록 (이후 갱신은 워커 단위로 주기적으로 처리)
+    await broker.presence.connect(user_id)
     
     try:
         # 초기 연결 메시지
         yield {
             "event": "connect",
-            "data": json.dumps({"status": "connected", "channel": channel_name})
+            "data": json.dumps({"status": "connected", "channel": user_id, "broker": broker.name})
         }
         
-        # 이벤트 리스닝 루프
+        # 현재 안읽은 알림 수 (이후 변경분은 발행 쪽에서 unread 이벤트로 전달)
+        yield {
+            "event": "unread",
+            "data": unread_message(await unread_counter.get(user_id))
+        }
+        
+        # 재연결이면 마지막으로 받은 이벤트 이후에 놓친 이벤트를 재전송
+        replayed_until = None
+        resume = ResumeTracker()
+        if last_event_id:
+            missed = await broker.replay(user_id, last_event_id)
+            if missed is None:
+                # 버퍼가 만료되어 정확히 이어받을 수 없으면 DB의 안읽은 알림으로 대체하고,
+                # 다음 재연결은 지금 이후 발행된 이벤트부터 이어받도록 새 기준점을 알림
+                # (기준점은 DB 조회 전에 받아서 그 사이 발행된 알림이 DB와 전송 버퍼 양쪽에서 빠지지 않게 함)
+                marker = await broker.current_event_id()
+                rows = await run_db(crud.list_notifications, user_id, REPLAY_MAX_ENTRIES, 0, True)
+                frames = [frame(notification_event(row), "notification") for row in reversed(rows)]
+                resume.hold(marker)
+                frames.extend(resume.frames([], subscription.lowest_event_id()))
+                if frames:
+                    yield b"".join(frames)
+            elif missed:
+                yield b"".join(frame(data, event, event_id) for event_id, event, data in missed)
+                replayed_until = parse_event_id(missed[-1][0])
+                resume.last_id = replayed_until
+            else:
+                resume.last_id = parse_event_id(last_event_id)
+        
+        # 메시지가 도착하는 즉시 전송하고, 그 사이 쌓인 메시지는 우선순위 순으로 모아서 전송
+        # 연결 유지는 EventSourceResponse의 하트비트(ping)가 담당
         while True:
-            message = await subscription.get_message(ignore_subscribe_messages=True, timeout=1.0)
-            ic(message)
-            if message and message["type"] == "message":
-                data = message["data"]
-                if isinstance(data, bytes):
-                    data = data.decode("utf-8")
-                
-                try:
-                    parsed_data = json.loads(data)
-                    event_type = parsed_data.get("event", "message")
-                    
-                    yield {
-                        "event": event_type,
-                        "data": data
-                    }
-                except json.JSONDecodeError:
-                    yield {
-                        "event": "message",
-                        "data": data
-                    }
-            
-            # 연결 유지를 위한 주기적인 핑
-            await asyncio.sleep(1)
-    except asyncio.CancelledError:
-        await subscription.unsubscribe(channel_name)
-        await subscription.close()
+            batch = await subscription.get_batch()
+            if subscription.closed:
+                # 버퍼가 넘친 느린 소비자 (disconnect 정책) - 연결을 끊고 재연결 시 Last-Event-ID로 이어받게 함
+                break
+            frames = []
+            # coalesce 정책으로 버려진 메시지가 있으면 요약 이벤트를 먼저 전송
+            missed = subscription.take_missed()
+            if missed:
+                frames.append(frame(missed_message(missed), "missed"))
+            # 재전송으로 이미 보낸 이벤트는 건너뜀
+            if replayed_until:
+                batch = [item for item in batch if not item[0] or parse_event_id(item[0]) > replayed_until]
+            # 버퍼 항목은 허브에서 미리 만든 SSE 바이트이므로 그대로 이어 붙이되,
+            # 우선순위 때문에 ID 순서가 뒤바뀐 프레임은 `id:`를 빼서 재연결 지점이 앞서 나가지 않게 함
+            frames.extend(resume.frames(batch, subscription.lowest_event_id()))
+            event_ids = [event_id for event_id, _ in batch]
+            if frames:
+                yield b"".join(frames)
+                metrics.record_delivery(event_ids)
     finally:
-        await subscription.unsubscribe(channel_name)
-        await subscription.close()
+        await broker.unsubscribe(user_id, subscription)
+        await broker.presence.disconnect(user_id)
 
 @app.get("/events/{user_id}")
-async def sse_endpoint(user_id: str):
-    """SSE 이벤트 엔드포인트"""
-    return EventSourceResponse(event_generator(user_id))
-
-# 데이터베이스 의존성
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+async def sse_endpoint(user_id: str, last_event_id: Optional[str] = Header(None)):
+    """SSE 이벤트 엔드포인트 (재연결 시 Last-Event-ID 이후 이벤트 재전송)"""
+    # 사용자 샤드를 읽지 않는 워커로 잘못 라우팅된 연결은 실시간 이벤트를 받을 수 없으므로 거절
+    if not broker.accepts(user_id):
+        raise HTTPException(status_code=421, detail="User is not served by this worker")
+    return EventSourceResponse(
+        event_generator(user_id, last_event_id),
+        ping=SSE_HEARTBEAT_INTERVAL,
+        # 읽지 않는 클라이언트에 대한 쓰기가 무한정 멈춰 있지 않도록 제한
+        send_timeout=SSE_SEND_TIMEOUT
+    )
 
 # ISO 형식 날짜 문자열 처리 개선
 def parse_iso_datetime(iso_string):
@@ -136,16 +263,74 @@ def parse_iso_datetime(iso_string):
         # 파싱 실패 시 현재 시간 반환
         return datetime.now()
 
+# 알림 일괄 발송 및 저장 (/notify/{user_id}보다 먼저 등록해야 함)
+@app.post("/notify/batch")
+async def send_notification_batch(
+    request: Request,
+    broker: Broker = Depends(get_broker)
+):
+    items = await read_batch_items(request)
+    results = [None] * len(items)
+    rows, messages, indexes = [], [], []
+    queued = 0
+    
+    for index, data in enumerate(items):
+        error = validate_batch_item(data)
+        if error:
+            results[index] = batch_error(index, error)
+            continue
+        
+        message = {
+            "event": "notification",
+            "title": data.get("title", "알림"),
+            "message": data.get("message", "새로운 알림이 있습니다."),
+            "icon": data.get("icon", "/static/notification-icon.png"),
+            "timestamp": data.get("timestamp", datetime.now().isoformat()),
+            "priority": clamp_priority(data.get("priority", 0)),
+            "id": None
+        }
+        row = {
+            "user_id": data["user_id"],
+            "title": message["title"],
+            "message": message["message"],
+            "icon": message["icon"],
+            "created_at": parse_iso_datetime(message["timestamp"]),
+            "category": data.get("category"),
+            "priority": message["priority"]
+        }
+        # 병합 대상은 모아서 저장/발행 (ID는 저장 시점에 발급, 모인 항목이 너무 많으면 바로 저장)
+        if wants_coalesce(data) and coalescer.add(data["user_id"], data["category"], row, message) is not None:
+            results[index] = batch_queued(index, data["user_id"])
+            queued += 1
+            continue
+        rows.append(row)
+        messages.append((data["user_id"], message))
+        indexes.append(index)
+    
+    if not rows:
+        if queued:
+            return {"status": "success", "sent": 0, "queued": queued, "failed": len(items) - queued, "results": results}
+        return {"status": "error", "sent": 0, "failed": len(items), "results": results}
+    
+    # 한 트랜잭션에서 알림과 아웃박스를 일괄 INSERT 후 생성된 ID를 입력 순서대로 받음 (발행은 릴레이가 담당)
+    notification_ids = await run_db(crud.create_notifications, rows, [message for _, message in messages])
+    outbox_relay.wake()
+    await invalidate_users({row["user_id"] for row in rows})
+    
+    for index, (user_id, _), notification_id in zip(indexes, messages, notification_ids):
+        results[index] = batch_success(index, user_id, notification_id)
+    
+    return {"status": "success", "sent": len(rows), "queued": queued, "failed": len(items) - len(rows) - queued, "results": results}
+
 # 알림 발송 및 저장
 @app.post("/notify/{user_id}")
 async def send_notification(
     user_id: str,
     request: Request,
-    db: Session = Depends(get_db),
-    redis: Redis = Depends(get_redis)
+    response: Response,
+    broker: Broker = Depends(get_broker)
 ):
     data = await request.json()
-    channel_name = f"channel:{user_id}"
     
     # 메시지 생성
     message = {
@@ -153,102 +338,139 @@ async def send_notification(
         "title": data.get("title", "알림"),
         "message": data.get("message", "새로운 알림이 있습니다."),
         "icon": data.get("icon", "/static/notification-icon.png"),
-        "timestamp": data.get("timestamp", datetime.now()),
+        "timestamp": data.get("timestamp", datetime.now().isoformat()),
+        "priority": clamp_priority(data.get("priority", 0)),
         "id": None  # 저장 후 업데이트
     }
-    ic(message['timestamp'])
-    
-    # 데이터베이스에 알림 저장
-    new_notification = Notification(
-        user_id=user_id,
-        title=message["title"],
-        message=message["message"],
-        icon=message["icon"],
-        created_at=parse_iso_datetime(message["timestamp"]),
-        category=data.get("category"),
-        priority=data.get("priority", 0)
-    )
     
-    db.add(new_notification)
-    db.commit()
-    db.refresh(new_notification)
+    row = {
+        "user_id": user_id,
+        "title": message["title"],
+        "message": message["message"],
+        "icon": message["icon"],
+        "created_at": parse_iso_datetime(message["timestamp"]),
+        "category": data.get("category"),
+        "priority": message["priority"]
+    }
     
-    # 저장된 알림 ID를 메시지에 추가
-    message["id"] = new_notification.id
+    # 병합 대상이면 시간 창이 끝날 때 같은 카테고리 알림과 함께 저장하고 이벤트 하나로 발행
+    # (저장이 밀려서 모인 항목이 COALESCE_MAX_PENDING개를 넘으면 병합하지 않고 바로 저장)
+    pending = coalescer.add(user_id, data["category"], row, message) if wants_coalesce(data) else None
+    if pending is not None:
+        response.status_code = 202
+        return {"status": "queued", "message": f"Notification queued for {user_id}", "notification_id": None, "pending": pending}
     
-    # 실시간 알림 발송
-    await redis.publish(channel_name, json.dumps(message))
+    # 데이터베이스에 알림과 발행할 메시지를 한 트랜잭션으로 저장 (실시간 발송은 아웃박스 릴레이가 담당)
+    notification_id = await run_db(crud.create_notification, row, message)
+    outbox_relay.wake()
+    await invalidate_users([user_id])
     
-    return {"status": "success", "message": f"Notification sent to {user_id}", "notification_id": new_notification.id}
+    return {"status": "success", "message": f"Notification sent to {user_id}", "notification_id": notification_id}
 
-# 알림 목록 조회
+# 알림 목록 조회 (offset 페이징 또는 before 커서 기반 키셋 페이징)
 @app.get("/notifications/{user_id}")
 async def get_notifications(
     user_id: str,
-    limit: int = 20,
+    response: Response,
+    limit: int = Query(20, ge=1),
     offset: int = 0,
     unread_only: bool = False,
-    db: Session = Depends(get_db)
+    before: Optional[str] = None,
 ):
-    query = select(Notification).where(Notification.user_id == user_id)
-    
-    if unread_only:
-        query = query.where(Notification.is_read == False)
-    
-    query = query.order_by(Notification.created_at.desc()).limit(limit).offset(offset)
-    results = db.execute(query).scalars().all()
-    
-    return [
-        {
-            "id": notification.id,
-            "title": notification.title,
-            "message": notification.message,
-            "icon": notification.icon,
-            "is_read": notification.is_read,
-            "created_at": notification.created_at.isoformat(),
-            "read_at": notification.read_at.isoformat() if notification.read_at else None,
-            "category": notification.category,
-            "priority": notification.priority
-        }
-        for notification in results
-    ]
+    try:
+        cursor = crud.parse_cursor(before) if before else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor (expected <created_at>,<id>)")
+    
+    notifications = None
+    if cursor is None and not unread_only and recent_cache.covers(limit, offset):
+        # 가장 많이 호출되는 최근 페이지는 캐시에서 반환 (캐시 저장소 장애 시 DB에서 조회)
+        try:
+            notifications = await recent_cache.get_page(user_id, limit, offset)
+        except broker.errors:
+            pass
+    if notifications is None:
+        notifications = await run_db(crud.list_notifications, user_id, limit, offset, unread_only, cursor)
+    
+    # 다음 페이지 커서는 헤더로 전달 (응답 본문 형식은 기존과 동일하게 유지)
+    if notifications and len(notifications) == limit:
+        response.headers["X-Next-Cursor"] = crud.make_cursor(notifications[-1])
+    return notifications
+
+# 안읽은 알림 수 조회 (캐시된 카운터, 없으면 DB에서 재계산)
+@app.get("/notifications/{user_id}/unread-count")
+async def get_unread_count(user_id: str):
+    return {"user_id": user_id, "unread": await unread_counter.get(user_id)}
 
 # 알림 읽음 상태 변경
 @app.put("/notifications/{notification_id}/read")
 async def mark_notification_as_read(
-    notification_id: int,
-    db: Session = Depends(get_db)
+    notification_id: str,
+    user_id: Optional[str] = None,
+    broker: Broker = Depends(get_broker)
 ):
-    notification = db.query(Notification).filter(Notification.id == notification_id).first()
+    try:
+        is_broadcast, item_id = crud.parse_notification_id(notification_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Notification not found")
     
-    if not notification:
+    # 브로드캐스트(`b<id>`)는 사용자별로 읽음 상태를 기록하므로 user_id가 필요
+    if is_broadcast:
+        if not user_id:
+            raise HTTPException(status_code=400, detail="user_id is required for broadcast notifications")
+        found, changed_user_id = await run_db(crud.mark_broadcast_read, item_id, user_id)
+    else:
+        found, changed_user_id = await run_db(crud.mark_notification_read, item_id)
+    if not found:
         raise HTTPException(status_code=404, detail="Notification not found")
     
-    notification.is_read = True
-    notification.read_at = datetime.utcnow()
-    db.commit()
+    # 안읽음 -> 읽음으로 바뀐 경우에만 카운터 감소
+    if changed_user_id is not None:
+        await invalidate_recent([changed_user_id])
+        await update_unread(changed_user_id, -1)
     
     return {"status": "success", "message": "Notification marked as read"}
 
+# 여러 알림을 한 번에 읽음 처리 (ID 목록 또는 category / before / max_priority 조건)
+@app.put("/notifications/{user_id}/read-bulk")
+async def mark_notifications_as_read_bulk(
+    user_id: str,
+    request: Request,
+    broker: Broker = Depends(get_broker)
+):
+    filters = await read_bulk_read_filters(request)
+    updated = await run_db(crud.mark_read_bulk, user_id, **filters)
+    unread_count = None
+    if updated:
+        await invalidate_recent([user_id])
+        unread_count = await update_unread(user_id, -updated, recount=True)
+    else:
+        try:
+            unread_count = await unread_counter.get(user_id)
+        except broker.errors:
+            pass
+    # 카운터 저장소 장애 시 DB에서 직접 계산
+    if unread_count is None:
+        unread_count = await run_db(crud.count_unread, user_id)
+    
+    return {"status": "success", "updated": updated, "unread": unread_count}
+
 # 모든 알림 읽음 상태로 변경
 @app.put("/notifications/{user_id}/read-all")
 async def mark_all_notifications_as_read(
     user_id: str,
-    db: Session = Depends(get_db)
+    broker: Broker = Depends(get_broker)
 ):
-    db.query(Notification).filter(
-        Notification.user_id == user_id,
-        Notification.is_read == False
-    ).update({"is_read": True, "read_at": datetime.utcnow()})
-    
-    db.commit()
+    await run_db(crud.mark_all_read, user_id)
+    await invalidate_recent([user_id])
+    await update_unread(user_id)
     
     return {"status": "success", "message": "All notifications marked as read"}
 
 @app.post("/broadcast")
 async def broadcast_notification(
     request: Request,
-    redis: Redis = Depends(get_redis)
+    broker: Broker = Depends(get_broker)
 ):
     """모든 사용자에게 브로드캐스트 알림 전송"""
     data = await request.json()
@@ -259,25 +481,113 @@ async def broadcast_notification(
         "title": data.get("title", "알림"),
         "message": data.get("message", "새로운 알림이 있습니다."),
         "icon": data.get("icon", "/static/notification-icon.png"),
-        "timestamp": data.get("timestamp", None)
+        "timestamp": data.get("timestamp", datetime.now().isoformat()),
+        "priority": clamp_priority(data.get("priority", 0))
+    }
+    
+    row = {
+        "title": message["title"],
+        "message": message["message"],
+        "icon": message["icon"],
+        "created_at": parse_iso_datetime(message["timestamp"]),
+        "category": data.get("category"),
+        "priority": message["priority"]
     }
     
-    message_json = json.dumps(message)
+    # 알림 내용은 한 번만 저장하고 사용자별로는 수신/읽음 상태만 기록
+    # (전체 브로드캐스트는 사용자가 읽을 때 상태 행을 만들고, 발행 메시지도 한 번만 기록)
+    broadcast_id = await run_db(crud.create_broadcast, row, users or None, message)
+    outbox_relay.wake()
+    await invalidate_users(users or None)
     
     # 특정 사용자 목록이 제공된 경우
     if users:
-        for user_id in users:
-            channel_name = f"channel:{user_id}"
-            await redis.publish(channel_name, message_json)
-        return {"status": "success", "message": f"Notification sent to {len(users)} users"}
+        return {"status": "success", "message": f"Notification sent to {len(users)} users", "broadcast_id": f"b{broadcast_id}"}
     else:
-        # 모든 채널 패턴 가져오기 (사용자 목록이 제공되지 않은 경우)
-        channels = await redis.keys("channel:*")
-        for channel in channels:
-            if isinstance(channel, bytes):
-                channel = channel.decode("utf-8")
-            await redis.publish(channel, message_json)
-        return {"status": "success", "message": f"Notification broadcasted to all users ({len(channels)} channels)"}
+        return {"status": "success", "message": "Notification broadcasted to all users", "broadcast_id": f"b{broadcast_id}"}
+
+# 대량 지정 사용자 브로드캐스트 (첫 줄은 알림 내용 JSON, 이후 한 줄에 사용자 ID 하나씩)
+@app.post("/broadcast/stream")
+async def broadcast_notification_stream(request: Request, job_id: Optional[str] = None):
+    lines = iter_lines(request)
+    data = await read_stream_header(lines)
+    
+    message = {
+        "event": "notification",
+        "title": data.get("title", "알림"),
+        "message": data.get("message", "새로운 알림이 있습니다."),
+        "icon": data.get("icon", "/static/notification-icon.png"),
+        "timestamp": data.get("timestamp", datetime.now().isoformat()),
+        "priority": clamp_priority(data.get("priority", 0))
+    }
+    
+    row = {
+        "title": message["title"],
+        "message": message["message"],
+        "icon": message["icon"],
+        "created_at": parse_iso_datetime(message["timestamp"]),
+        "category": data.get("category"),
+        "priority": message["priority"]
+    }
+    
+    # 내용은 한 번만 저장하고, 청크마다 수신자 상태 행과 발행 메시지를 한 트랜잭션으로 추가
+    broadcast_id = await run_db(crud.create_broadcast, row, [])
+    
+    async def process_chunk(users):
+        await run_db(crud.add_broadcast_recipients, broadcast_id, users, message)
+        outbox_relay.wake()
+        await invalidate_users(users)
+    
+    job = await stream_broadcast(lines, process_chunk, broadcast_jobs, job_id or data.get("job_id"))
+    return {"status": "success", "broadcast_id": f"b{broadcast_id}", "job": job.to_dict()}
+
+# 스트리밍 브로드캐스트 진행 상태
+@app.get("/broadcast/jobs/{job_id}")
+async def get_broadcast_job(job_id: str):
+    job = await broadcast_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# 브로커 상태 (백엔드 종류, 연결 수, 버려진 메시지 수와 백엔드별 값)
+@app.get("/broker/stats")
+async def get_broker_stats(broker: Broker = Depends(get_broker)):
+    return broker.stats()
+
+# 여러 사용자의 접속 여부와 연결된 워커 조회 (?users=a&users=b 또는 ?users=a,b)
+@app.get("/presence")
+async def get_presence(users: List[str] = Query(...), broker: Broker = Depends(get_broker)):
+    user_ids = list(dict.fromkeys(user_id for value in users for user_id in value.split(",") if user_id))
+    if len(user_ids) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Too many users (max {BATCH_MAX_ITEMS})")
+    
+    owners = await broker.presence.lookup(user_ids)
+    if owners is None:
+        raise HTTPException(status_code=503, detail="Presence registry unavailable")
+    
+    return {
+        # worker면 이 워커의 연결만 확인한 결과 (접속 현황을 공유하지 않는 백엔드)
+        "scope": "cluster" if broker.presence.shared else "worker",
+        "users": {user_id: {"online": bool(owners[user_id]), "workers": owners[user_id]} for user_id in user_ids}
+    }
+
+# 보관 기간 정리 설정과 누적 결과, 알림 테이블 행 수/DB 크기
+@app.get("/retention/stats")
+async def get_retention_stats():
+    return {"job": retention_job.stats(), **await run_db(crud.retention_report)}
+
+# 보관 기간 정리 즉시 실행 (주기 실행 중이면 끝날 때까지 기다린 뒤 실행)
+@app.post("/retention/run")
+async def run_retention():
+    if not retention_job.enabled:
+        raise HTTPException(status_code=400, detail="Retention is not configured (RETENTION_DAYS, RETENTION_CATEGORY_DAYS or RETENTION_ARCHIVE_READ_DAYS)")
+    result = await retention_job.run_once()
+    return {"status": "success", **result, **await run_db(crud.retention_report)}
+
+# 프로메테우스 형식 메트릭 (이 워커의 값)
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 if __name__ == "__main__":
     import uvicorn
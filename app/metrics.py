@@ -0,0 +1,152 @@
+# metrics.py
+# Prometheus 텍스트 형식 메트릭 (외부 라이브러리 없이 워커 프로세스 내에서 집계)
+# 기록은 이벤트 루프 스레드에서만 하므로 잠금 없이 정수/실수 덧셈만 한다.
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry: List[Any] = []
+
+# 지연 시간 히스토그램 구간(초)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+class Counter:
+    """증가만 하는 값 - callback을 주면 수집 시점에 그 값을 읽는다"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, callback: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.value = 0
+        _registry.append(self)
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield f"{self.name} {self.callback() if self.callback else self.value}"
+
+
+class Gauge(Counter):
+    """현재 값 - 보통 수집 시점에 callback으로 계산"""
+    kind = "gauge"
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _Series:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self._buckets, value)] += 1
+        self.sum += value
+
+
+class Histogram:
+    """고정 구간 히스토그램 (관측 한 번에 이진 탐색 한 번) - label을 주면 값별로 따로 집계"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, label: Optional[str] = None, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self._label = label
+        self._buckets = buckets
+        self._series: Dict[Tuple[Tuple[str, str], ...], _Series] = {}
+        if label is None:
+            self._default = self._series[()] = _Series(buckets)
+        _registry.append(self)
+
+    def labels(self, value: str) -> _Series:
+        key = ((self._label, value),)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(self._buckets)
+        return series
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self._buckets, series.counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(labels + (('le', repr(bound)),))} {cumulative}"
+            cumulative += series.counts[-1]
+            yield f"{self.name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {series.sum!r}"
+            yield f"{self.name}_count{_format_labels(labels)} {cumulative}"
+
+
+def render() -> str:
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+SSE_CONNECTIONS = Gauge("sse_connections", "Open SSE connections on this worker")
+SSE_QUEUED_MESSAGES = Gauge("sse_queued_messages", "Messages waiting in per-connection buffers")
+SSE_QUEUE_DEPTH_MAX = Gauge("sse_queue_depth_max", "Largest per-connection buffer depth")
+SSE_DROPPED = Counter("sse_dropped_messages_total", "Messages dropped because a connection buffer was full")
+SSE_DISCONNECTED = Counter("sse_slow_consumer_disconnects_total", "Connections closed because their buffer overflowed")
+NOTIFICATIONS_PUBLISHED = Counter("notifications_published_total", "Outbox events published to the broker")
+NOTIFICATIONS_DELIVERED = Counter("notifications_delivered_total", "Events written to SSE connections")
+DELIVERY_LATENCY = Histogram(
+    "notification_delivery_latency_seconds",
+    "Time from broker publish (event id timestamp) to SSE write"
+)
+DB_CALL_LATENCY = Histogram("db_call_duration_seconds", "Duration of database calls including commit", label="fn")
+BROKER_LATENCY = Histogram("broker_publish_duration_seconds", "Round trip of one outbox batch publish to the broker")
+RECENT_CACHE_HITS = Counter("recent_cache_hits_total", "Notification history pages served from the recent cache")
+RECENT_CACHE_MISSES = Counter("recent_cache_misses_total", "Recent cache lookups that fell back to the database")
+NOTIFICATIONS_COALESCED = Counter("notifications_coalesced_total", "Notifications merged into another event instead of being published")
+NOTIFICATIONS_COALESCE_DROPPED = Counter("notifications_coalesce_dropped_total", "Coalesced notifications dropped after failing to save on their own")
+NOTIFICATIONS_EXPIRED = Counter("notifications_expired_total", "Notifications deleted by the retention job after their TTL")
+NOTIFICATIONS_ARCHIVED = Counter("notifications_archived_total", "Read notifications moved to the archive by the retention job")
+PRESENCE_SKIPPED = Counter("presence_skipped_total", "Real-time deliveries skipped because the user had no open stream")
+OUTBOX_FAILURES = Counter("outbox_delivery_failures_total", "Outbox batches that failed and were scheduled for retry")
+EVENT_LOOP_LAG = Histogram("event_loop_lag_seconds", "Delay of a periodic event loop wakeup beyond its schedule")
+
+
+def bind_hub(hub: Any):
+    """허브의 연결 수, 버퍼 적체, 버린 메시지/끊은 연결 수를 수집 시점에 읽도록 연결"""
+    SSE_CONNECTIONS.callback = lambda: hub.connection_count
+    SSE_QUEUED_MESSAGES.callback = lambda: sum(hub.queue_depths())
+    SSE_QUEUE_DEPTH_MAX.callback = lambda: max(hub.queue_depths(), default=0)
+    SSE_DROPPED.callback = lambda: hub.dropped
+    SSE_DISCONNECTED.callback = lambda: hub.disconnected
+
+
+def record_delivery(event_ids: List[Optional[str]]):
+    """SSE로 내보낸 이벤트 수와 발행 후 전송까지의 지연 기록 (이벤트 ID 앞부분이 발행 시각 ms)"""
+    now_ms = time.time() * 1000
+    for event_id in event_ids:
+        if event_id:
+            DELIVERY_LATENCY.observe(max(now_ms - int(event_id.partition("-")[0]), 0) / 1000)
+    NOTIFICATIONS_DELIVERED.inc(len(event_ids))
+
+
+async def monitor_event_loop(interval: float = 0.5):
+    """주기적으로 깨어나서 예정보다 늦어진 시간을 이벤트 루프 지연으로 기록"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(loop.time() - started - interval, 0))
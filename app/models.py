@@ -1,5 +1,5 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -15,6 +15,13 @@ class User(Base):
     
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # 사용자별 최신순 조회 / 안읽은 알림 조회용 (created_at 정렬까지 인덱스로 처리)
+        Index("ix_notifications_user_created", "user_id", "created_at"),
+        Index("ix_notifications_user_read_created", "user_id", "is_read", "created_at"),
+        # 보관 기간이 지난 알림을 오래된 순으로 찾을 때 사용
+        Index("ix_notifications_created", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -25,4 +32,77 @@ class Notification(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     read_at = Column(DateTime, nullable=True)
     category = Column(String(50), nullable=True)
-    priority = Column(Integer, default=0)  # 0: 일반, 1: 중요, 2: 긴급
\ No newline at end of file
+    priority = Column(Integer, default=0)  # 0: 일반, 1: 중요, 2: 긴급
+
+class ArchivedNotification(Base):
+    """보관 기간 정리 작업이 옮긴 읽은 알림 (RETENTION_ARCHIVE=table, 컬럼은 notifications와 같음)"""
+    __tablename__ = "notifications_archive"
+    __table_args__ = (
+        Index("ix_notifications_archive_user_created", "user_id", "created_at"),
+    )
+    
+    archive_id = Column(Integer, primary_key=True)
+    notification_id = Column(Integer, nullable=False)  # 원래 알림 ID
+    user_id = Column(Integer, nullable=False)
+    title = Column(String(100), nullable=False)
+    message = Column(Text, nullable=False)
+    icon = Column(String(200), nullable=True)
+    is_read = Column(Boolean, default=True)
+    created_at = Column(DateTime, nullable=False)
+    read_at = Column(DateTime, nullable=True)
+    category = Column(String(50), nullable=True)
+    priority = Column(Integer, default=0)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+class OutboxEvent(Base):
+    """발행 대기 이벤트 (알림 저장과 같은 트랜잭션에서 기록하고 릴레이가 브로커로 전달)"""
+    __tablename__ = "outbox"
+    __table_args__ = (
+        # 릴레이가 전달 가능한 이벤트를 오래된 순으로 가져올 때 사용
+        Index("ix_outbox_available", "available_at", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String(100), nullable=True)  # None이면 전체 브로드캐스트
+    payload = Column(Text, nullable=False)  # SSE로 전달할 JSON 본문
+    priority = Column(Integer, default=0)
+    unread = Column(Boolean, default=True)  # 발행 후 받는 사용자에게 안읽은 알림 수를 전달할지 여부
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    available_at = Column(DateTime, default=datetime.utcnow)  # 재시도 대기 중이면 다음 시도 시각
+    claimed_until = Column(DateTime, nullable=True)  # 릴레이가 가져간 이벤트의 점유 만료 시각
+
+
+class BroadcastMessage(Base):
+    """여러 사용자에게 보낸 알림 내용 (사용자 수와 관계없이 한 번만 저장)"""
+    __tablename__ = "broadcast_messages"
+    __table_args__ = (
+        Index("ix_broadcast_messages_all_created", "all_users", "created_at"),
+        # 정리 작업이 내용을 지운 뒤 상태 행을 나눠서 지우는 동안 같은 ID가 새 브로드캐스트에 재사용되지 않도록 함
+        {"sqlite_autoincrement": True},
+    )
+    
+    id = Column(Integer, primary_key=True)
+    title = Column(String(100), nullable=False)
+    message = Column(Text, nullable=False)
+    icon = Column(String(200), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    category = Column(String(50), nullable=True)
+    priority = Column(Integer, default=0)
+    all_users = Column(Boolean, default=False)  # True면 모든 사용자에게 보이며 수신자 행을 만들지 않음
+
+
+class BroadcastReceipt(Base):
+    """브로드캐스트의 사용자별 수신/읽음 상태
+
+    지정 사용자 브로드캐스트는 발송 시 수신자마다 행을 만들고, 전체 브로드캐스트는
+    사용자가 읽었을 때만 행을 만든다 (행이 없으면 안읽음).
+    """
+    __tablename__ = "broadcast_receipts"
+    __table_args__ = (
+        Index("ix_broadcast_receipts_user", "user_id", "broadcast_id"),
+    )
+    
+    broadcast_id = Column(Integer, ForeignKey("broadcast_messages.id"), primary_key=True)
+    user_id = Column(String(100), primary_key=True)
+    read_at = Column(DateTime, nullable=True)
@@ -0,0 +1,108 @@
+# outbox.py
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import crud
+from database import run_db
+from metrics import BROKER_LATENCY, NOTIFICATIONS_PUBLISHED, OUTBOX_FAILURES
+from settings import (
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_CLAIM_LEASE,
+    OUTBOX_POLL_INTERVAL,
+    OUTBOX_RETRY_BASE,
+    OUTBOX_RETRY_MAX,
+)
+
+logger = logging.getLogger(__name__)
+
+# 아웃박스 이벤트 목록을 브로커로 전달하는 함수 - 예외가 나면 목록 전체를 다시 시도
+Deliver = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+
+class OutboxRelay:
+    """아웃박스 테이블을 배치 단위로 읽어 브로커로 전달하는 백그라운드 작업
+
+    쓰기 요청은 알림과 아웃박스를 한 번에 커밋한 뒤 wake()로 릴레이를 깨우기만 하므로,
+    브로커가 멈추면 요청 지연 대신 아웃박스 적체가 늘어난다. 전달에 실패한 배치는 지수 백오프로
+    재시도하며, 한 이벤트가 두 번 이상 전달될 수는 있어도 유실되지는 않는다 (at-least-once).
+    """
+
+    def __init__(
+        self,
+        deliver: Deliver,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+        lease: int = OUTBOX_CLAIM_LEASE,
+        retry_base: float = OUTBOX_RETRY_BASE,
+        retry_max: float = OUTBOX_RETRY_MAX
+    ):
+        self._deliver = deliver
+        self._batch_size = batch_size
+        self._poll_interval = poll_interval
+        self._lease = lease
+        self._retry_base = retry_base
+        self._retry_max = retry_max
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.delivered = 0
+        self.failures = 0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self):
+        """새 이벤트가 커밋되었음을 알림 (다른 워커가 기록한 이벤트는 poll_interval마다 확인)"""
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                delivered = await self.relay_once()
+            except Exception:
+                # DB 오류 등 - 잠시 뒤 다시 시도
+                logger.exception("outbox relay failed")
+                delivered = 0
+
+            # 배치가 가득 찼으면 남은 이벤트가 있을 수 있으므로 바로 이어서 처리
+            if delivered < self._batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self._poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def relay_once(self) -> int:
+        """점유한 배치 하나를 전달하고 처리한 이벤트 수 반환"""
+        events = await run_db(crud.claim_outbox, self._batch_size, self._lease)
+        if not events:
+            return 0
+
+        ids = [event["id"] for event in events]
+        started = time.perf_counter()
+        try:
+            await self._deliver(events)
+        except Exception:
+            self.failures += 1
+            OUTBOX_FAILURES.inc()
+            attempts = max(event["attempts"] for event in events)
+            delay = min(self._retry_base * 2 ** attempts, self._retry_max)
+            logger.warning("outbox delivery failed (%d events, retry in %.1fs)", len(events), delay, exc_info=True)
+            await run_db(crud.retry_outbox, ids, delay)
+            return 0
+
+        BROKER_LATENCY.observe(time.perf_counter() - started)
+        NOTIFICATIONS_PUBLISHED.inc(len(events))
+        await run_db(crud.delete_outbox, ids)
+        self.delivered += len(events)
+        return len(events)
@@ -0,0 +1,146 @@
+# presence.py
+import asyncio
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from hub import LocalHub
+from settings import PRESENCE_REFRESH_INTERVAL, PRESENCE_TTL, WORKER_NAME
+
+# 사용자별 연결을 가진 워커 목록 {사용자 ID: [워커 이름]} - 빈 목록이면 접속 중이 아님, None이면 확인 불가
+Owners = Optional[Dict[str, List[str]]]
+
+
+class PresenceRegistry:
+    """워커 내 접속 현황
+
+    허브에 등록된 로컬 연결을 그대로 조회한다. shared가 False면 다른 워커의 연결은 알 수 없으므로
+    발행 쪽에서는 접속 현황으로 대상을 거르지 않는다 (memory 백엔드처럼 프로세스가 하나일 때만 True).
+    """
+
+    def __init__(self, hub: LocalHub, worker: str = WORKER_NAME, shared: bool = True):
+        self._hub = hub
+        self.worker = worker
+        self.shared = shared
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def connect(self, user_id: str):
+        """SSE 연결 등록 후 호출"""
+        pass
+
+    async def disconnect(self, user_id: str):
+        """SSE 연결 해제 후 호출 (이 워커에 남은 연결이 없을 때만 접속 종료로 기록)"""
+        pass
+
+    async def lookup(self, user_ids: Iterable[Any]) -> Owners:
+        return {str(user_id): [self.worker] if self._hub.is_connected(str(user_id)) else [] for user_id in user_ids}
+
+
+class RedisPresenceRegistry(PresenceRegistry):
+    """Redis 기반 접속 현황 (워커 간 공유)
+
+    사용자마다 해시 `presence:{user_id}`에 연결을 가진 워커 이름과 만료 시각(ms)을 기록한다.
+    워커는 연결/해제 시 자기 필드만 쓰고 지우며, refresh_interval마다 로컬에 연결된 사용자 전체의
+    만료 시각을 파이프라인으로 한 번에 갱신한다. 비정상 종료한 워커의 필드는 ttl이 지나면 무시된다.
+    Redis 오류는 전달을 막지 않도록 무시하고, 조회가 실패하면 None(확인 불가)을 반환한다.
+    """
+
+    CHUNK_SIZE = 1000
+
+    def __init__(
+        self,
+        redis: Redis,
+        hub: LocalHub,
+        worker: str = WORKER_NAME,
+        ttl: int = PRESENCE_TTL,
+        refresh_interval: float = PRESENCE_REFRESH_INTERVAL
+    ):
+        super().__init__(hub, worker)
+        self._redis = redis
+        self._ttl_ms = ttl * 1000
+        self._refresh_interval = refresh_interval
+        self._refresher: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _key(user_id: Any) -> str:
+        return f"presence:{user_id}"
+
+    async def start(self):
+        self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresher:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+        # 정상 종료 시에는 만료를 기다리지 않고 이 워커의 기록을 지움
+        try:
+            for users in self._chunks(self._hub.users()):
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    for user_id in users:
+                        pipe.hdel(self._key(user_id), self.worker)
+                    await pipe.execute()
+        except RedisError:
+            pass
+
+    async def connect(self, user_id: str):
+        try:
+            await self._touch([user_id])
+        except RedisError:
+            # 다음 갱신 주기에 다시 기록됨
+            pass
+
+    async def disconnect(self, user_id: str):
+        if self._hub.is_connected(user_id):
+            return
+        try:
+            await self._redis.hdel(self._key(user_id), self.worker)
+        except RedisError:
+            pass
+
+    async def lookup(self, user_ids: Iterable[Any]) -> Owners:
+        now_ms = time.time() * 1000
+        owners = {}
+        try:
+            for users in self._chunks([str(user_id) for user_id in user_ids]):
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    for user_id in users:
+                        pipe.hgetall(self._key(user_id))
+                    results = await pipe.execute()
+                for user_id, workers in zip(users, results):
+                    owners[user_id] = [worker for worker, expires in workers.items() if int(expires) > now_ms]
+        except RedisError:
+            return None
+        return owners
+
+    async def _touch(self, user_ids: List[str]):
+        expires = int(time.time() * 1000 + self._ttl_ms)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                key = self._key(user_id)
+                pipe.hset(key, self.worker, expires)
+                pipe.pexpire(key, self._ttl_ms)
+            await pipe.execute()
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self._refresh_interval)
+            try:
+                for users in self._chunks(self._hub.users()):
+                    await self._touch(users)
+            except RedisError:
+                pass
+
+    def _chunks(self, items: List[str]) -> Iterable[List[str]]:
+        for start in range(0, len(items), self.CHUNK_SIZE):
+            yield items[start:start + self.CHUNK_SIZE]
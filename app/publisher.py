@@ -0,0 +1,104 @@
+# publisher.py
+import asyncio
+import itertools
+import time
+from collections import deque
+from typing import Iterable, List, Optional, Tuple
+
+import aio_pika
+from aio_pika.abc import AbstractConnection, AbstractExchange, AbstractMessage
+
+from settings import RABBITMQ_MAX_IN_FLIGHT, RABBITMQ_PUBLISH_CHANNELS
+
+
+def _percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(int(len(ordered) * q), len(ordered) - 1)], 3)
+
+
+class RabbitPublisher:
+    """채널 풀 기반 RabbitMQ 발행기
+
+    publisher confirm을 켠 채널 여러 개에 발행을 번갈아 보내고, 확인 응답을 하나씩 기다리지 않고
+    여러 발행을 동시에 흘려보낸 뒤 함께 기다린다 (브로커는 여러 건을 multiple confirm으로 한 번에 확인).
+    확인을 기다리는 메시지 수는 max_in_flight로 제한하고, 초과분은 자리가 날 때까지 대기한다.
+    """
+
+    def __init__(
+        self,
+        connection: AbstractConnection,
+        exchange_name: str = "notifications",
+        pool_size: int = RABBITMQ_PUBLISH_CHANNELS,
+        max_in_flight: int = RABBITMQ_MAX_IN_FLIGHT,
+        latency_samples: int = 1000
+    ):
+        self._connection = connection
+        self._exchange_name = exchange_name
+        self._pool_size = max(1, pool_size)
+        self._slots = asyncio.Semaphore(max(1, max_in_flight))
+        self._exchanges: List[AbstractExchange] = []
+        self._next = itertools.cycle(())
+        # 최근 확인 응답 지연(ms)
+        self._latencies: deque = deque(maxlen=latency_samples)
+        self.in_flight = 0
+        self.backlog = 0
+        self.published = 0
+        self.failed = 0
+
+    async def start(self):
+        for _ in range(self._pool_size):
+            channel = await self._connection.channel(publisher_confirms=True)
+            self._exchanges.append(await channel.declare_exchange(
+                self._exchange_name,
+                aio_pika.ExchangeType.TOPIC,
+                durable=True
+            ))
+        self._next = itertools.cycle(self._exchanges)
+
+    async def stop(self):
+        for exchange in self._exchanges:
+            await exchange.channel.close()
+        self._exchanges = []
+        self._next = itertools.cycle(())
+
+    async def publish(self, message: AbstractMessage, routing_key: str):
+        """메시지 하나를 발행하고 브로커 확인 응답까지 대기 (nack이면 예외)"""
+        self.backlog += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.backlog -= 1
+
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await next(self._next).publish(message, routing_key=routing_key)
+        except Exception:
+            self.failed += 1
+            raise
+        else:
+            self.published += 1
+            self._latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def publish_many(self, messages: Iterable[Tuple[AbstractMessage, str]]):
+        """여러 메시지를 동시에 발행하고 모든 확인 응답을 함께 대기"""
+        await asyncio.gather(*(self.publish(message, routing_key) for message, routing_key in messages))
+
+    def stats(self) -> dict:
+        ordered = sorted(self._latencies)
+        return {
+            "channels": len(self._exchanges),
+            "in_flight": self.in_flight,
+            "backlog": self.backlog,
+            "published": self.published,
+            "failed": self.failed,
+            "confirm_latency_ms": {
+                "p50": _percentile(ordered, 0.50),
+                "p99": _percentile(ordered, 0.99),
+                "max": round(ordered[-1], 3) if ordered else None
+            }
+        }
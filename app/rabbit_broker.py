@@ -0,0 +1,165 @@
+# rabbit_broker.py
+from typing import Any, Dict, List, Optional, Union
+
+import aio_pika
+from aio_pika.abc import AbstractConnection
+from aio_pika.exceptions import AMQPError
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+import metrics
+from broadcast_stream import BroadcastJobs
+from broker import Broker
+from envelope import event_type
+from hub import Subscription
+from presence import PresenceRegistry, RedisPresenceRegistry
+from publisher import RabbitPublisher
+from rabbit_hub import RabbitHub
+from recent_cache import RecentNotificationsCache
+from replay import MemoryReplayBuffer, RedisReplayBuffer, ReplayResult
+from settings import PRESENCE_REDIS_URL, RABBITMQ_HOST, RABBITMQ_PASS, RABBITMQ_PORT, RABBITMQ_USER, RABBITMQ_VHOST
+from unread import RedisUnreadCounter, UnreadCounter, unread_message
+
+
+class RabbitBroker(Broker):
+    """RabbitMQ 백엔드
+
+    워커 전용 큐에 접속 중인 사용자의 라우팅 키만 바인딩해서 받고(RabbitHub), 발행은 confirm 채널
+    풀(RabbitPublisher)로 한다. 최근 알림 캐시와 작업 상태는 워커 프로세스 내에 둔다.
+
+    PRESENCE_REDIS_URL을 지정하면 접속 현황, 재전송 버퍼, 안읽은 알림 카운터를 Redis로 공유하고, 바인딩된 큐가 없어
+    브로커에서 버려질 접속 중이 아닌 사용자의 메시지는 발행하지 않는다. 지정하지 않으면 아웃박스
+    이벤트를 어느 워커가 발행할지 정해져 있지 않아 워커의 재전송 버퍼에는 일부 이벤트만 남으므로,
+    재연결은 항상 DB 대체 전송으로 처리한다.
+    """
+
+    name = "rabbitmq"
+    errors = (AMQPError, RedisError)
+
+    def __init__(self):
+        self.connection: Optional[AbstractConnection] = None
+        self.hub: Optional[RabbitHub] = None
+        self.publisher: Optional[RabbitPublisher] = None
+        self.presence: Optional[PresenceRegistry] = None
+        # 워커 간 공유 저장소 (접속 현황, 재전송 버퍼, 안읽은 알림 카운터)
+        self.redis: Optional[Redis] = Redis.from_url(PRESENCE_REDIS_URL, decode_responses=True) if PRESENCE_REDIS_URL else None
+        self.replay_buffer: Union[RedisReplayBuffer, MemoryReplayBuffer] = (
+            RedisReplayBuffer(self.redis) if self.redis else MemoryReplayBuffer(complete=False)
+        )
+        # 공유 저장소가 없으면 다른 워커의 변경이 보이지 않으므로 짧게 보관하는 프로세스 내 카운터
+        self.unread_counter = RedisUnreadCounter(self.redis) if self.redis else UnreadCounter()
+        self.recent_cache = RecentNotificationsCache()
+        self.broadcast_jobs = BroadcastJobs()
+
+    async def start(self):
+        self.connection = await aio_pika.connect_robust(
+            host=RABBITMQ_HOST,
+            port=RABBITMQ_PORT,
+            login=RABBITMQ_USER,
+            password=RABBITMQ_PASS,
+            virtualhost=RABBITMQ_VHOST
+        )
+        # 소비는 prefetch를 설정한 별도 채널에서 처리
+        self.hub = RabbitHub(self.connection)
+        await self.hub.start()
+        # 발행은 confirm 모드 채널 풀에서 파이프라이닝
+        self.publisher = RabbitPublisher(self.connection)
+        await self.publisher.start()
+        # 공유 저장소가 없으면 다른 워커의 연결을 알 수 없으므로 이 워커의 연결만 보여주고 발행은 거르지 않음
+        if self.redis:
+            self.presence = RedisPresenceRegistry(self.redis, self.hub)
+        else:
+            self.presence = PresenceRegistry(self.hub, shared=False)
+        await self.presence.start()
+
+    async def stop(self):
+        if self.presence:
+            await self.presence.stop()
+        if self.redis:
+            await self.redis.close()
+        if self.hub:
+            await self.hub.stop()
+        if self.publisher:
+            await self.publisher.stop()
+        if self.connection:
+            await self.connection.close()
+
+    async def subscribe(self, user_id: str) -> Subscription:
+        """로컬 전송 버퍼 등록 후, 이 워커에서 사용자의 첫 연결이면 라우팅 키 바인딩"""
+        subscription = self.hub.subscribe(user_id)
+        try:
+            await self.hub.bind(user_id)
+        except BaseException:
+            self.hub.unsubscribe(user_id, subscription)
+            raise
+        return subscription
+
+    async def unsubscribe(self, user_id: str, subscription: Subscription):
+        self.hub.unsubscribe(user_id, subscription)
+        await self.hub.unbind(user_id)
+
+    async def replay(self, user_id: str, last_event_id: str) -> ReplayResult:
+        if self.redis:
+            return await self.replay_buffer.replay(user_id, last_event_id)
+        return self.replay_buffer.replay(user_id, last_event_id)
+
+    async def current_event_id(self) -> str:
+        if self.redis:
+            return await self.replay_buffer.current_id()
+        return self.replay_buffer.current_id()
+
+    async def _record(self, events: List[Dict[str, Any]], names: List[str]) -> List[str]:
+        """재전송 버퍼에 기록하고 발급한 이벤트 ID 목록 반환 (공유 버퍼는 파이프라인으로 한 번에 기록)"""
+        if not self.redis:
+            return [self.replay_buffer.append(event["user_id"], event["payload"], name) for event, name in zip(events, names)]
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for event, name in zip(events, names):
+                # 전달은 RabbitMQ로 하므로 버퍼에만 기록
+                await self.replay_buffer.publish(
+                    event["user_id"], event["payload"], event["priority"], name, client=pipe, channels=[]
+                )
+            return await pipe.execute()
+
+    async def publish(self, events: List[Dict[str, Any]]):
+        """아웃박스 이벤트를 한 번에 발행하고 확인 응답을 함께 대기"""
+        owners = await self.online_workers(event["user_id"] for event in events)
+        # 이벤트 종류는 type 속성으로 보내서 구독 쪽에서는 본문을 파싱하지 않도록 함
+        names = [event_type(event["payload"]) for event in events]
+        # 재연결 시 이어받을 수 있도록 재전송 버퍼에 기록한 ID를 메시지 ID로 사용
+        event_ids = await self._record(events, names)
+        messages = []
+        for event, name, event_id in zip(events, names, event_ids):
+            if self.is_offline(event["user_id"], owners):
+                metrics.PRESENCE_SKIPPED.inc()
+                continue
+            messages.append((
+                aio_pika.Message(
+                    body=event["payload"].encode(),
+                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                    priority=event["priority"],
+                    type=name,
+                    message_id=event_id
+                ),
+                "broadcast" if event["user_id"] is None else f"user.{event['user_id']}"
+            ))
+        await self.publisher.publish_many(messages)
+
+    async def publish_unread(self, counts: Dict[Any, Optional[int]]):
+        """캐시된 안읽은 알림 수 전달 (일시적인 값이므로 비영속 메시지)"""
+        counts = {user_id: count for user_id, count in counts.items() if count is not None}
+        if not counts:
+            return
+        owners = await self.online_workers(counts)
+        await self.publisher.publish_many(
+            (aio_pika.Message(body=unread_message(count).encode(), type="unread"), f"user.{user_id}")
+            for user_id, count in counts.items()
+            if not self.is_offline(user_id, owners)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "queue": self.hub.queue_name,
+            "bound_users": self.hub.bound_users,
+            "publisher": self.publisher.stats()
+        }
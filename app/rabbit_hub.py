@@ -0,0 +1,151 @@
+# rabbit_hub.py
+import asyncio
+import os
+import socket
+import uuid
+from typing import Optional, Set
+
+import aio_pika
+from aio_pika.exceptions import AMQPError, ChannelInvalidStateError
+from aio_pika.abc import AbstractChannel, AbstractConnection, AbstractExchange, AbstractIncomingMessage, AbstractQueue
+
+from envelope import MAX_PRIORITY, clamp_priority, event_type
+from hub import LocalHub
+from settings import RABBITMQ_ACK_BATCH, RABBITMQ_ACK_INTERVAL, RABBITMQ_PREFETCH, SUBSCRIBER_QUEUE_SIZE
+
+
+class RabbitHub(LocalHub):
+    """워커 단위 RabbitMQ 팬아웃 허브
+
+    SSE 연결마다 사용자 큐를 선언/바인딩하는 대신, 워커마다 전용(exclusive) 큐 하나를 두고
+    이 워커에 연결된 사용자의 라우팅 키(`user.{user_id}`)만 바인딩한다. 사용자의 첫 연결에서
+    바인딩(bind)하고 마지막 연결이 끊기면 해제(unbind)하며, 받은 메시지는 연결별 전송 버퍼로 분배한다.
+
+    메시지는 로컬 버퍼에 넣는 즉시 처리된 것으로 보고 ack_batch개마다(또는 ack_interval초마다)
+    multiple ack로 한 번에 확인한다. 끊긴 연결이 놓친 메시지는 재전송 버퍼가 담당한다.
+    """
+
+    def __init__(
+        self,
+        connection: AbstractConnection,
+        exchange_name: str = "notifications",
+        broadcast_key: str = "broadcast",
+        prefetch: int = RABBITMQ_PREFETCH,
+        ack_batch: int = RABBITMQ_ACK_BATCH,
+        ack_interval: float = RABBITMQ_ACK_INTERVAL,
+        queue_size: int = SUBSCRIBER_QUEUE_SIZE
+    ):
+        super().__init__(queue_size)
+        self._connection = connection
+        self._exchange_name = exchange_name
+        self._broadcast_key = broadcast_key
+        self._prefetch = prefetch
+        # prefetch 한도에 걸려 전달이 멈추지 않도록 prefetch보다 작게 유지
+        self._ack_batch = max(1, min(ack_batch, prefetch // 2 or 1))
+        self._ack_interval = ack_interval
+        self._bound: Set[str] = set()
+        # 같은 사용자의 바인딩/해제가 엇갈리지 않도록 사용자 ID 해시로 나눈 잠금
+        self._locks = [asyncio.Lock() for _ in range(64)]
+        self._channel: Optional[AbstractChannel] = None
+        self._exchange: Optional[AbstractExchange] = None
+        self._queue: Optional[AbstractQueue] = None
+        self._consumer_tag: Optional[str] = None
+        self._unacked: Optional[AbstractIncomingMessage] = None
+        self._unacked_count = 0
+        self._flusher: Optional[asyncio.Task] = None
+
+    @property
+    def queue_name(self) -> str:
+        return self._queue.name if self._queue else ""
+
+    async def start(self):
+        self._channel = await self._connection.channel()
+        await self._channel.set_qos(prefetch_count=self._prefetch)
+        self._exchange = await self._channel.declare_exchange(
+            self._exchange_name,
+            aio_pika.ExchangeType.TOPIC,
+            durable=True
+        )
+        self._queue = await self._channel.declare_queue(
+            f"notifications.worker.{socket.gethostname()}.{os.getpid()}.{uuid.uuid4().hex[:8]}",
+            exclusive=True,
+            auto_delete=True,
+            # 긴급 알림이 쌓인 일반 알림보다 먼저 전달되도록 우선순위 큐로 선언
+            arguments={"x-max-priority": MAX_PRIORITY}
+        )
+        await self._queue.bind(self._exchange, routing_key=self._broadcast_key)
+        self._consumer_tag = await self._queue.consume(self._on_message)
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        if self._queue and self._consumer_tag:
+            await self._queue.cancel(self._consumer_tag)
+            self._consumer_tag = None
+        await self._flush_acks()
+        if self._channel:
+            # 전용 큐는 채널이 닫히면 브로커가 삭제한다
+            await self._channel.close()
+            self._channel = None
+        self._queue = None
+        self._bound.clear()
+
+    async def bind(self, user_id: str):
+        """이 워커에서 사용자의 첫 연결이면 라우팅 키 바인딩 (subscribe 후 호출)"""
+        async with self._lock(user_id):
+            if self.is_connected(user_id) and user_id not in self._bound:
+                await self._queue.bind(self._exchange, routing_key=f"user.{user_id}")
+                self._bound.add(user_id)
+
+    async def unbind(self, user_id: str):
+        """사용자의 마지막 연결이 끊겼으면 라우팅 키 바인딩 해제 (unsubscribe 후 호출)"""
+        async with self._lock(user_id):
+            if not self.is_connected(user_id) and user_id in self._bound and self._queue:
+                await self._queue.unbind(self._exchange, routing_key=f"user.{user_id}")
+                self._bound.discard(user_id)
+
+    @property
+    def bound_users(self) -> int:
+        return len(self._bound)
+
+    def _lock(self, user_id: str) -> asyncio.Lock:
+        return self._locks[hash(user_id) % len(self._locks)]
+
+    async def _on_message(self, message: AbstractIncomingMessage):
+        routing_key = message.routing_key or ""
+        user_id = None if routing_key == self._broadcast_key else routing_key[len("user."):]
+        # 이벤트 종류는 메시지 type 속성으로 전달되므로 본문은 디코딩/파싱 없이 SSE 바이트로 감쌈
+        self.deliver(
+            user_id,
+            message.message_id,
+            clamp_priority(message.priority or 0),
+            message.type or event_type(message.body),
+            message.body
+        )
+
+        self._unacked = message
+        self._unacked_count += 1
+        if self._unacked_count >= self._ack_batch:
+            await self._flush_acks()
+
+    async def _flush_acks(self):
+        """마지막으로 받은 메시지까지 multiple ack로 한 번에 확인"""
+        message, self._unacked, self._unacked_count = self._unacked, None, 0
+        if message is not None:
+            await message.ack(multiple=True)
+
+    async def _flush_loop(self):
+        # 트래픽이 적을 때 배치가 차지 않아 ack가 늦어지지 않도록 주기적으로 확인
+        while True:
+            await asyncio.sleep(self._ack_interval)
+            try:
+                await self._flush_acks()
+            except (AMQPError, ChannelInvalidStateError):
+                # 채널이 재연결되면 이전 delivery tag는 무효이므로 버림
+                pass
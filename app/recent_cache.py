@@ -0,0 +1,119 @@
+# recent_cache.py
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+from redis.asyncio import Redis
+
+import crud
+from database import run_db
+from envelope import dumps
+from metrics import RECENT_CACHE_HITS, RECENT_CACHE_MISSES
+from settings import RECENT_CACHE_MAX_USERS, RECENT_CACHE_SIZE, RECENT_CACHE_TTL
+
+
+class RecentNotificationsCache:
+    """프로세스 내 사용자별 최근 알림 캐시 (LRU)
+
+    사용자의 최신 size개 알림을 조회 결과 그대로 보관해서, 그 범위 안의 첫 페이지 조회는 DB를 거치지
+    않는다. 알림 생성/읽음 처리 시 해당 사용자 항목을 지우고 다음 조회 때 다시 읽는다. 다른 워커에서의
+    변경은 보이지 않으므로 ttl초가 지나면 만료된다.
+    """
+
+    def __init__(self, size: int = RECENT_CACHE_SIZE, ttl: int = RECENT_CACHE_TTL, max_users: int = RECENT_CACHE_MAX_USERS):
+        self.size = size
+        self._ttl = ttl
+        self._max_users = max_users
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        # 무효화 횟수 - 조회 도중 무효화된 결과를 캐시에 넣지 않도록 비교
+        self._version = 0
+
+    def covers(self, limit: int, offset: int) -> bool:
+        return 0 < limit and 0 <= offset and offset + limit <= self.size
+
+    async def get_page(self, user_id: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+        """최신순 알림 중 offset부터 limit개 반환 (covers()가 참인 범위만)"""
+        items, token = await self._load(user_id)
+        if items is None:
+            RECENT_CACHE_MISSES.inc()
+            items = await run_db(crud.list_notifications, user_id, self.size, 0, False)
+            await self._store(user_id, token, items)
+        else:
+            RECENT_CACHE_HITS.inc()
+        return items[offset:offset + limit]
+
+    async def invalidate(self, user_id: Any):
+        await self.invalidate_many([user_id])
+
+    async def invalidate_many(self, user_ids: Iterable[Any]):
+        self._version += 1
+        for user_id in user_ids:
+            self._entries.pop(str(user_id), None)
+
+    async def invalidate_all(self):
+        self._version += 1
+        self._entries.clear()
+
+    async def _load(self, user_id: str) -> Tuple[Optional[List[Dict[str, Any]]], Any]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            return None, self._version
+        self._entries.move_to_end(user_id)
+        return entry[1], self._version
+
+    async def _store(self, user_id: str, token: Any, items: List[Dict[str, Any]]):
+        if token != self._version:
+            return
+        self._entries[user_id] = (time.monotonic() + self._ttl, items)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self._max_users:
+            self._entries.popitem(last=False)
+
+
+class RedisRecentNotificationsCache(RecentNotificationsCache):
+    """Redis에 저장되는 사용자별 최근 알림 캐시 (워커 간 공유)
+
+    값 앞에 저장 시점의 전체/사용자 버전을 붙여 두고, 무효화는 버전만 올린다. 조회 도중 무효화된
+    결과가 늦게 저장되어도 버전이 달라서 사용되지 않는다.
+    """
+
+    GENERATION_KEY = "recent:generation"
+
+    def __init__(self, redis: Redis, size: int = RECENT_CACHE_SIZE, ttl: int = RECENT_CACHE_TTL):
+        super().__init__(size, ttl)
+        self._redis = redis
+
+    @staticmethod
+    def _key(user_id: Any) -> str:
+        return f"recent:{user_id}"
+
+    @staticmethod
+    def _version_key(user_id: Any) -> str:
+        return f"recent:version:{user_id}"
+
+    async def invalidate_many(self, user_ids: Iterable[Any]):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.incr(self._version_key(user_id))
+                # 늦게 저장된 이전 버전 값보다 먼저 만료되지 않도록 값보다 길게 유지
+                pipe.expire(self._version_key(user_id), self._ttl * 2)
+            await pipe.execute()
+
+    async def invalidate_all(self):
+        # 전체 키를 스캔하지 않고 공통 버전을 올려서 기존 값을 모두 무효화
+        await self._redis.incr(self.GENERATION_KEY)
+
+    async def _load(self, user_id: str) -> Tuple[Optional[List[Dict[str, Any]]], Any]:
+        generation, version, value = await self._redis.mget(
+            self.GENERATION_KEY, self._version_key(user_id), self._key(user_id)
+        )
+        token = f"{generation or 0}:{version or 0}"
+        if value:
+            stored, _, body = value.partition("\n")
+            if stored == token:
+                return orjson.loads(body), token
+        return None, token
+
+    async def _store(self, user_id: str, token: Any, items: List[Dict[str, Any]]):
+        await self._redis.set(self._key(user_id), f"{token}\n{dumps(items)}", ex=self._ttl)
@@ -0,0 +1,180 @@
+# redis_broker.py
+from typing import Any, Dict, List, Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+import metrics
+from broadcast_stream import RedisBroadcastJobs
+from broker import Broker
+from envelope import event_type
+from hub import NotificationHub, StreamHub
+from presence import Owners, RedisPresenceRegistry
+from recent_cache import RedisRecentNotificationsCache
+from replay import RedisReplayBuffer, ReplayResult
+from settings import (
+    REDIS_HOST,
+    REDIS_PASSWORD,
+    REDIS_PORT,
+    REDIS_STREAM_CONSUMER_SHARDS,
+    REDIS_STREAM_MAXLEN,
+    WORKER_ID,
+    WORKER_NAME,
+)
+from shards import StreamShards, parse_shards
+from unread import RedisUnreadCounter, unread_envelope
+
+
+class RedisBroker(Broker):
+    """Redis PubSub 백엔드
+
+    이벤트는 재전송 스트림 기록과 PUBLISH를 한 스크립트로 처리하고, 워커마다 패턴 구독 하나로
+    받아서 로컬 연결로 분배한다. 안읽은 알림 수, 최근 알림 캐시, 작업 상태, 접속 현황은 Redis에
+    저장해서 워커 간에 공유한다.
+
+    접속 현황으로 연결 위치를 알 수 있는 사용자에게는 그 워커의 전용 채널(`worker:{worker}:{user_id}`)로만
+    발행하고, 접속 중이 아닌 사용자는 재전송 버퍼에만 기록한다. 현황을 조회할 수 없으면 모든 워커가
+    받는 `channel:{user_id}`로 발행한다.
+    """
+
+    name = "redis"
+    errors = (RedisError,)
+
+    def __init__(self, host: str = REDIS_HOST, port: int = REDIS_PORT, password: Optional[str] = REDIS_PASSWORD):
+        self.redis = Redis(host=host, port=port, password=password, decode_responses=True)
+        self.hub = self._create_hub()
+        self.replay_buffer = self._create_replay_buffer()
+        self.unread_counter = RedisUnreadCounter(self.redis)
+        self.recent_cache = RedisRecentNotificationsCache(self.redis)
+        self.broadcast_jobs = RedisBroadcastJobs(self.redis)
+        self.presence = RedisPresenceRegistry(self.redis, self.hub)
+
+    def _create_hub(self) -> NotificationHub:
+        return NotificationHub(self.redis, worker=WORKER_NAME)
+
+    def _create_replay_buffer(self) -> RedisReplayBuffer:
+        return RedisReplayBuffer(self.redis)
+
+    async def start(self):
+        await self.hub.start()
+        await self.presence.start()
+
+    async def stop(self):
+        await self.presence.stop()
+        await self.hub.stop()
+        await self.redis.close()
+
+    async def replay(self, user_id: str, last_event_id: str) -> ReplayResult:
+        return await self.replay_buffer.replay(user_id, last_event_id)
+
+    async def current_event_id(self) -> str:
+        return await self.replay_buffer.current_id()
+
+    async def publish(self, events: List[Dict[str, Any]]):
+        """아웃박스 이벤트를 파이프라인으로 한 번에 발행"""
+        owners = await self.online_workers(event["user_id"] for event in events)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for event in events:
+                channels = self._channels(event["user_id"], owners)
+                if not channels:
+                    metrics.PRESENCE_SKIPPED.inc()
+                # 이벤트 종류를 봉투에 실어서 구독 쪽에서는 본문을 파싱하지 않도록 함
+                await self.replay_buffer.publish(
+                    event["user_id"],
+                    event["payload"],
+                    event["priority"],
+                    event_type(event["payload"]),
+                    client=pipe,
+                    channels=channels
+                )
+            await pipe.execute()
+
+    async def publish_unread(self, counts: Dict[Any, Optional[int]]):
+        counts = {user_id: count for user_id, count in counts.items() if count is not None}
+        if not counts:
+            return
+        owners = await self.online_workers(counts)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for user_id, count in counts.items():
+                for channel in self._channels(user_id, owners):
+                    self._send(pipe, user_id, channel, unread_envelope(count))
+            await pipe.execute()
+
+    def _channels(self, user_id: Optional[Any], owners: Owners) -> List[str]:
+        """발행 채널 목록 (빈 목록이면 접속 중이 아니므로 발행하지 않음)"""
+        if user_id is None:
+            return ["broadcast"]
+        if owners is None or str(user_id) not in owners:
+            return [f"channel:{user_id}"]
+        return [f"worker:{worker}:{user_id}" for worker in owners[str(user_id)]]
+
+    def _send(self, pipe, user_id: Any, channel: str, raw: str):
+        pipe.publish(channel, raw)
+
+
+class RedisStreamsBroker(RedisBroker):
+    """Redis Streams 컨슈머 그룹 백엔드
+
+    PUBLISH 대신 사용자 샤드별 전달 스트림(`events:delivery:{n}`, 전체 브로드캐스트는
+    `events:delivery:broadcast`)에 MAXLEN으로 길이를 제한해서 기록한다. 워커마다 컨슈머 그룹을
+    두고 XREADGROUP으로 읽으므로, WORKER_ID를 지정한 워커는 재시작 중에 기록된 항목과 처리하지
+    못한 항목을 잃지 않는다. WORKER_ID가 없으면 프로세스별 임시 그룹을 만들고 종료 시 삭제한다.
+
+    REDIS_STREAM_CONSUMER_SHARDS로 읽을 샤드를 지정하면 워커는 그 샤드의 사용자 연결만 받으며
+    (accepts), 로드 밸런서가 같은 규칙(StreamShards.shard)으로 라우팅하면 워커를 늘려 부하를 나눌 수 있다.
+    """
+
+    name = "redis-streams"
+
+    def __init__(self, *args, worker_id: Optional[str] = WORKER_ID, consumer_shards: str = REDIS_STREAM_CONSUMER_SHARDS, **kwargs):
+        self.shards = StreamShards()
+        self.owned_shards = parse_shards(consumer_shards, self.shards.count)
+        self.worker_id = worker_id or WORKER_NAME
+        # 임시 그룹은 재시작 후 다시 쓰이지 않으므로 종료 시 삭제
+        self.ephemeral = worker_id is None
+        super().__init__(*args, **kwargs)
+
+    def _create_hub(self) -> StreamHub:
+        return StreamHub(
+            self.redis,
+            self.shards.keys(self.owned_shards),
+            group=f"sse:{self.worker_id}",
+            consumer=self.worker_id
+        )
+
+    def _create_replay_buffer(self) -> RedisReplayBuffer:
+        return RedisReplayBuffer(self.redis, delivery_shards=self.shards)
+
+    async def stop(self):
+        await self.presence.stop()
+        await self.hub.stop()
+        if self.ephemeral:
+            try:
+                await self.hub.destroy_groups()
+            except RedisError:
+                pass
+        await self.redis.close()
+
+    def accepts(self, user_id: str) -> bool:
+        return self.owned_shards is None or self.shards.shard(user_id) in self.owned_shards
+
+    def _channels(self, user_id: Optional[Any], owners: Owners) -> List[str]:
+        # 샤드 스트림은 해당 샤드를 읽는 모든 워커가 받으므로 워커 전용 채널 대신 접속 여부만 반영
+        if user_id is None:
+            return ["broadcast"]
+        if self.is_offline(user_id, owners):
+            return []
+        return [f"channel:{user_id}"]
+
+    def _send(self, pipe, user_id: Any, channel: str, raw: str):
+        pipe.xadd(self.shards.key(user_id), {"channel": channel, "data": raw}, maxlen=REDIS_STREAM_MAXLEN, approximate=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "group": self.hub.group,
+            "shards": self.shards.count,
+            "owned_shards": sorted(self.owned_shards) if self.owned_shards is not None else "all",
+            "read": self.hub.read,
+            "acked": self.hub.acked
+        }
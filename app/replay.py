@@ -0,0 +1,245 @@
+# replay.py
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from redis.asyncio import Redis
+
+from envelope import dumps, event_type, parse_event_id
+from settings import REDIS_STREAM_MAXLEN, REPLAY_MAX_AGE, REPLAY_MAX_ENTRIES
+from shards import StreamShards
+
+# 재전송할 이벤트 목록 [(이벤트 ID, 이벤트 종류, JSON 본문)] - None이면 버퍼가 만료되어 정확한 재전송이 불가능
+ReplayResult = Optional[List[Tuple[str, str, str]]]
+
+
+def notification_event(item: Dict[str, Any]) -> str:
+    """DB 알림 행을 실시간 알림과 같은 형식의 이벤트 본문으로 변환 (버퍼 만료 시 대체 전송용)"""
+    return dumps({
+        "event": "notification",
+        "title": item["title"],
+        "message": item["message"],
+        "icon": item["icon"],
+        "timestamp": item["created_at"],
+        "id": item["id"]
+    })
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class MemoryReplayBuffer:
+    """프로세스 내 사용자별 링 버퍼
+
+    이 워커에서 발행한 이벤트만 보관하므로, 워커가 재시작되기 전의 이벤트 ID로
+    재연결하면 만료된 것으로 보고 DB 대체 전송을 하게 한다.
+    complete가 False면 다른 프로세스도 이벤트를 발행해서 이 버퍼에는 일부만 있으므로,
+    재전송하지 않고 항상 DB 대체 전송을 하게 한다 (ID 발급에만 사용).
+    """
+
+    def __init__(self, max_entries: int = REPLAY_MAX_ENTRIES, max_age: int = REPLAY_MAX_AGE, complete: bool = True):
+        self._max_entries = max_entries
+        self._max_age_ms = max_age * 1000
+        self.complete = complete
+        self._buffers: Dict[str, deque] = {}
+        self._broadcast: deque = deque(maxlen=max_entries)
+        self._seq = 0
+        self._last_ms = 0
+        self._started_ms = _now_ms()
+        self._appends = 0
+
+    def next_id(self) -> str:
+        # 시계가 뒤로 가더라도 ID가 감소하지 않도록 보정
+        self._last_ms = max(_now_ms(), self._last_ms)
+        self._seq += 1
+        return f"{self._last_ms}-{self._seq}"
+
+    def current_id(self) -> str:
+        """재연결 기준점 - 지금까지 발급한 ID 이상이고 이후 발급하는 ID보다 작은 ID"""
+        self._last_ms = max(_now_ms(), self._last_ms)
+        return f"{self._last_ms}-{self._seq}"
+
+    def append(self, user_id: Optional[Any], data: str, event: str = "message") -> str:
+        """이벤트를 기록하고 새 이벤트 ID 반환 (user_id가 None이면 전체 브로드캐스트)"""
+        event_id = self.next_id()
+        if user_id is None:
+            buffer = self._broadcast
+        else:
+            buffer = self._buffers.get(str(user_id))
+            if buffer is None:
+                buffer = self._buffers[str(user_id)] = deque(maxlen=self._max_entries)
+        buffer.append((parse_event_id(event_id), event_id, event, data))
+
+        self._appends += 1
+        if self._appends % 1000 == 0:
+            self._prune()
+        return event_id
+
+    def replay(self, user_id: Any, last_event_id: str) -> ReplayResult:
+        if not self.complete:
+            return None
+        try:
+            last = parse_event_id(last_event_id)
+        except ValueError:
+            return None
+
+        cutoff = _now_ms() - self._max_age_ms
+        if last[0] < max(cutoff, self._started_ms):
+            return None
+
+        missed = []
+        for buffer in (self._buffers.get(str(user_id)), self._broadcast):
+            if not buffer:
+                continue
+            # 개수 제한으로 밀려난 이벤트가 있을 수 있음
+            if len(buffer) == buffer.maxlen and buffer[0][0] > last:
+                return None
+            missed.extend(entry for entry in buffer if entry[0] > last and entry[0][0] >= cutoff)
+        missed.sort()
+        return [entry[1:] for entry in missed]
+
+    def _prune(self):
+        cutoff = _now_ms() - self._max_age_ms
+        for user_id in [user_id for user_id, buffer in self._buffers.items() if buffer[-1][0][0] < cutoff]:
+            del self._buffers[user_id]
+
+
+# ID 발급(<ms>-<seq>), 스트림 기록, 개수/시간 기준 정리, 전달을 한 번에 원자적으로 처리
+# KEYS: 시퀀스, 마지막 시각, 스트림[, 전달 스트림] / ARGV: 최대 개수, 최대 보관 시간(초), 본문, 발행 채널, 우선순위, 이벤트 종류[, 전달 스트림 최대 길이]
+# 발행 채널은 줄바꿈으로 구분한 목록이며, 비어 있으면 버퍼에만 기록 (접속 중이 아닌 사용자)
+_APPEND = """
+local t = redis.call('TIME')
+local ms = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local last = tonumber(redis.call('GET', KEYS[2]) or '0')
+if ms < last then
+    ms = last
+end
+redis.call('SET', KEYS[2], ms)
+local id = string.format('%d-%d', ms, redis.call('INCR', KEYS[1]))
+redis.call('XADD', KEYS[3], 'MAXLEN', ARGV[1], id, 'data', ARGV[3], 'event', ARGV[6])
+redis.call('XTRIM', KEYS[3], 'MINID', string.format('%d-0', ms - tonumber(ARGV[2]) * 1000))
+redis.call('EXPIRE', KEYS[3], ARGV[2])
+local envelope = id .. ' ' .. ARGV[5] .. ' ' .. ARGV[6] .. '\\n' .. ARGV[3]
+"""
+# PubSub 채널로 발행
+_APPEND_AND_PUBLISH = _APPEND + """
+for channel in string.gmatch(ARGV[4], '[^\\n]+') do
+    redis.call('PUBLISH', channel, envelope)
+end
+return id
+"""
+# 사용자 샤드의 전달 스트림에 기록 (redis-streams 백엔드)
+_APPEND_AND_XADD = _APPEND + """
+if ARGV[4] ~= '' then
+    redis.call('XADD', KEYS[4], 'MAXLEN', '~', ARGV[7], '*', 'channel', ARGV[4], 'data', envelope)
+end
+return id
+"""
+
+# 재연결 기준점 - ID 발급과 같은 방식으로 시각을 보정하되 시퀀스는 올리지 않음
+_CURRENT = """
+local t = redis.call('TIME')
+local ms = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local last = tonumber(redis.call('GET', KEYS[2]) or '0')
+if ms < last then
+    ms = last
+end
+redis.call('SET', KEYS[2], ms)
+return string.format('%d-%d', ms, tonumber(redis.call('GET', KEYS[1]) or '0'))
+"""
+
+
+class RedisReplayBuffer:
+    """Redis Stream 기반 사용자별 재전송 버퍼 (워커 간 공유)
+
+    이벤트 ID는 모든 스트림에서 공통으로 증가하는 `<ms>-<seq>` 형식이라서
+    사용자 스트림과 브로드캐스트 스트림의 이벤트를 하나의 Last-Event-ID로 이어받을 수 있다.
+    """
+
+    SEQ_KEY = "events:seq"
+    CLOCK_KEY = "events:clock"
+    BROADCAST_STREAM = "events:all"
+
+    def __init__(
+        self,
+        redis: Redis,
+        max_entries: int = REPLAY_MAX_ENTRIES,
+        max_age: int = REPLAY_MAX_AGE,
+        delivery_shards: Optional[StreamShards] = None,
+        delivery_maxlen: int = REDIS_STREAM_MAXLEN
+    ):
+        self._redis = redis
+        self._max_entries = max_entries
+        self._max_age = max_age
+        # 전달 샤드가 주어지면 PUBLISH 대신 사용자 샤드의 전달 스트림에 기록
+        self._delivery_shards = delivery_shards
+        self._delivery_maxlen = delivery_maxlen
+        self._script = redis.register_script(_APPEND_AND_XADD if delivery_shards else _APPEND_AND_PUBLISH)
+        self._current_script = redis.register_script(_CURRENT)
+
+    @staticmethod
+    def _stream_key(user_id: Any) -> str:
+        return f"events:user:{user_id}"
+
+    async def publish(
+        self,
+        user_id: Optional[Any],
+        data: str,
+        priority: int = 0,
+        event: str = "message",
+        client=None,
+        channels: Optional[List[str]] = None
+    ):
+        """버퍼에 기록하고 envelope 형식으로 해당 채널(또는 전달 스트림)에 발행 (user_id가 None이면 broadcast 채널)
+
+        client로 파이프라인을 넘기면 파이프라인에 명령만 추가한다. channels로 발행 채널을 직접 지정할 수 있으며,
+        빈 목록이면 버퍼에만 기록한다.
+        """
+        if user_id is None:
+            stream, channel = self.BROADCAST_STREAM, "broadcast"
+        else:
+            stream, channel = self._stream_key(user_id), f"channel:{user_id}"
+        if channels is not None:
+            channel = "\n".join(channels)
+        keys = [self.SEQ_KEY, self.CLOCK_KEY, stream]
+        args = [self._max_entries, self._max_age, data, channel, priority, event]
+        if self._delivery_shards:
+            keys.append(self._delivery_shards.key(user_id))
+            args.append(self._delivery_maxlen)
+        return await self._script(keys=keys, args=args, client=client)
+
+    async def current_id(self) -> str:
+        """재연결 기준점 - 지금까지 발급한 ID 이상이고 이후 발급하는 ID보다 작은 ID"""
+        return await self._current_script(keys=[self.SEQ_KEY, self.CLOCK_KEY])
+
+    async def replay(self, user_id: Any, last_event_id: str) -> ReplayResult:
+        try:
+            last = parse_event_id(last_event_id)
+        except ValueError:
+            return None
+
+        if last[0] < _now_ms() - self._max_age * 1000:
+            return None
+
+        streams = (self._stream_key(user_id), self.BROADCAST_STREAM)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for stream in streams:
+                pipe.xlen(stream)
+                pipe.xrange(stream, min="-", max="+", count=1)
+                pipe.xrange(stream, min=f"({last_event_id}", max="+")
+            results = await pipe.execute()
+
+        missed = []
+        for index in range(len(streams)):
+            length, first, entries = results[index * 3:index * 3 + 3]
+            # 개수 제한으로 밀려난 이벤트가 있을 수 있음
+            if length >= self._max_entries and first and parse_event_id(first[0][0]) > last:
+                return None
+            missed.extend(
+                # event 필드가 없는 항목은 이전 형식으로 기록된 이벤트
+                (parse_event_id(event_id), event_id, fields.get("event") or event_type(fields["data"]), fields["data"])
+                for event_id, fields in entries
+            )
+        missed.sort()
+        return [entry[1:] for entry in missed]
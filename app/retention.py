@@ -0,0 +1,218 @@
+# retention.py
+import asyncio
+import gzip
+import logging
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+import crud
+from database import run_db
+from envelope import dumps
+from metrics import NOTIFICATIONS_ARCHIVED, NOTIFICATIONS_EXPIRED
+from settings import (
+    RETENTION_ARCHIVE,
+    RETENTION_ARCHIVE_DIR,
+    RETENTION_ARCHIVE_READ_DAYS,
+    RETENTION_BATCH_PAUSE,
+    RETENTION_BATCH_SIZE,
+    RETENTION_CATEGORY_DAYS,
+    RETENTION_DAYS,
+    RETENTION_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+ARCHIVES = ("", "table", "ndjson")
+
+# 정리로 지운 알림의 사용자 목록과 사용자별로 함께 지운 안읽은 알림 수를 받는 함수 (캐시/카운터 갱신용)
+# 사용자 목록이 None이면 전체 브로드캐스트를 지운 것이므로 모든 사용자가 대상
+Removed = Callable[[Optional[Set[str]], Dict[str, int]], Awaitable[None]]
+
+
+def parse_category_days(spec: str) -> Dict[str, int]:
+    """카테고리별 보관 기간 문자열("build=7,marketing=30") 파싱"""
+    days = {}
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        category, sep, value = part.partition("=")
+        if not sep or not category.strip():
+            raise ValueError(f"Invalid retention rule: {part} (expected <category>=<days>)")
+        days[category.strip()] = int(value)
+    return days
+
+
+class RetentionJob:
+    """보관 기간이 지난 알림을 주기적으로 정리하는 백그라운드 작업
+
+    카테고리별 보관 기간(없으면 기본 기간)이 지난 알림은 삭제하고, 읽은 지 archive_read_days일이 지난
+    알림은 보관소(notifications_archive 테이블 또는 날짜별 gzip NDJSON 파일)로 옮긴다. 브로드캐스트도 같은
+    보관 기간으로 수신자 상태 행과 내용을 지운다 (보관소로 옮기지는 않음). 한 트랜잭션에서
+    batch_size개씩만 지우고 배치 사이에 batch_pause초 쉬므로 요청 쪽 쓰기가 오래 막히지 않는다.
+    NDJSON은 파일에 먼저 기록한 뒤 삭제하므로 중간에 실패해도 알림이 유실되지 않는다 (보관 파일에 중복될 수는 있음).
+    """
+
+    def __init__(
+        self,
+        on_removed: Optional[Removed] = None,
+        default_days: int = RETENTION_DAYS,
+        category_days: Optional[Dict[str, int]] = None,
+        archive_read_days: int = RETENTION_ARCHIVE_READ_DAYS,
+        archive: str = RETENTION_ARCHIVE,
+        archive_dir: str = RETENTION_ARCHIVE_DIR,
+        interval: float = RETENTION_INTERVAL,
+        batch_size: int = RETENTION_BATCH_SIZE,
+        batch_pause: float = RETENTION_BATCH_PAUSE
+    ):
+        if archive not in ARCHIVES:
+            raise ValueError(f"Unknown retention archive: {archive} (expected table or ndjson)")
+        if archive_read_days > 0 and not archive:
+            raise ValueError("RETENTION_ARCHIVE_READ_DAYS requires RETENTION_ARCHIVE (table or ndjson)")
+        self._on_removed = on_removed
+        self.default_days = default_days
+        self.category_days = parse_category_days(RETENTION_CATEGORY_DAYS) if category_days is None else category_days
+        self.archive_read_days = archive_read_days
+        self.archive = archive
+        self._archive_dir = archive_dir
+        self._interval = interval
+        self._batch_size = batch_size
+        self._batch_pause = batch_pause
+        # 주기 실행과 수동 실행이 겹치지 않도록 한 번에 하나만 실행
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.expired = 0
+        self.archived = 0
+        self.broadcasts_expired = 0
+        self.last_run: Optional[datetime] = None
+        self.last_result: Optional[Dict[str, int]] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.default_days > 0 or any(days > 0 for days in self.category_days.values()) or self.archive_read_days > 0
+
+    def start(self):
+        # 워커가 여러 개면 한 워커에서만 주기 실행하도록 나머지는 RETENTION_INTERVAL=0으로 둠
+        if self.enabled and self._interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("retention job failed")
+            await asyncio.sleep(self._interval)
+
+    async def run_once(self) -> Dict[str, int]:
+        """보관 기간 정리 한 번 실행 후 삭제/보관한 알림 수 반환"""
+        async with self._lock:
+            now = datetime.utcnow()
+            result = {"expired": 0, "archived": 0, "broadcasts_expired": 0}
+            condition = crud.expired_condition(now, self.default_days, self.category_days)
+            if condition is not None:
+                result["expired"] = await self._purge(condition, archive=False)
+                result["broadcasts_expired"] = await self._purge_broadcasts(
+                    crud.expired_broadcast_condition(now, self.default_days, self.category_days)
+                )
+            if self.archive_read_days > 0:
+                result["archived"] = await self._purge(crud.archivable_condition(now, self.archive_read_days), archive=True)
+
+            NOTIFICATIONS_EXPIRED.inc(result["expired"])
+            NOTIFICATIONS_ARCHIVED.inc(result["archived"])
+            self.expired += result["expired"]
+            self.archived += result["archived"]
+            self.broadcasts_expired += result["broadcasts_expired"]
+            self.last_run = now
+            self.last_result = result
+            return result
+
+    async def _purge(self, condition, archive: bool) -> int:
+        removed_total = 0
+        while True:
+            if archive and self.archive == "ndjson":
+                rows = await run_db(crud.select_notifications, condition, self._batch_size)
+                if rows:
+                    await asyncio.get_running_loop().run_in_executor(None, self._write_ndjson, rows)
+                ids = [row["id"] for row in rows]
+                removed = await run_db(crud.delete_notifications, ids)
+            else:
+                ids = await run_db(crud.select_notification_ids, condition, self._batch_size)
+                removed = await run_db(crud.delete_notifications, ids, archive)
+            # 더 지울 알림이 없거나 다른 워커가 먼저 지운 배치면 이번 실행은 종료
+            if not removed:
+                return removed_total
+
+            removed_total += len(removed)
+            if self._on_removed:
+                unread = Counter(str(user_id) for user_id, is_read in removed if not is_read)
+                await self._on_removed({str(user_id) for user_id, _ in removed}, dict(unread))
+            if len(ids) < self._batch_size:
+                return removed_total
+            await asyncio.sleep(self._batch_pause)
+
+    async def _purge_broadcasts(self, condition) -> int:
+        removed_total = 0
+        while True:
+            broadcasts = await run_db(crud.select_broadcasts, condition, self._batch_size)
+            for broadcast_id, all_users in broadcasts:
+                if all_users:
+                    # 전체 브로드캐스트는 내용부터 지워서 바로 숨기고, 읽은 사용자의 상태 행은 뒤에서 배치로 지움
+                    if not await run_db(crud.delete_broadcast, broadcast_id, True):
+                        continue
+                    removed_total += 1
+                    if self._on_removed:
+                        await self._on_removed(None, {})
+                    await self._purge_receipts(broadcast_id, notify=False)
+                    continue
+                # 지정 사용자 브로드캐스트는 수신자가 많을 수 있으므로 상태 행부터 배치 단위로 지움
+                await self._purge_receipts(broadcast_id, notify=True)
+                if await run_db(crud.delete_broadcast, broadcast_id, False):
+                    removed_total += 1
+            if len(broadcasts) < self._batch_size:
+                return removed_total
+            await asyncio.sleep(self._batch_pause)
+
+    async def _purge_receipts(self, broadcast_id: int, notify: bool):
+        # notify가 False면 이미 내용이 지워져서 보이지 않는 상태 행이므로 캐시/카운터에 반영하지 않음
+        while True:
+            removed = await run_db(crud.delete_broadcast_receipts, broadcast_id, self._batch_size)
+            if removed and notify and self._on_removed:
+                unread = Counter(user_id for user_id, is_read in removed if not is_read)
+                await self._on_removed({user_id for user_id, _ in removed}, dict(unread))
+            if len(removed) < self._batch_size:
+                return
+            await asyncio.sleep(self._batch_pause)
+
+    def _write_ndjson(self, rows: List[Dict[str, Any]]):
+        # 보관한 날짜별 파일에 이어서 기록 (gzip 멤버를 이어 붙여도 하나의 파일로 읽힘)
+        os.makedirs(self._archive_dir, exist_ok=True)
+        path = os.path.join(self._archive_dir, f"notifications-{datetime.utcnow():%Y-%m-%d}.ndjson.gz")
+        with gzip.open(path, "at", encoding="utf-8") as file:
+            file.writelines(dumps(row) + "\n" for row in rows)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "default_days": self.default_days,
+            "category_days": self.category_days,
+            "archive_read_days": self.archive_read_days,
+            "archive": self.archive or None,
+            "interval": self._interval if self._task else None,
+            "expired": self.expired,
+            "archived": self.archived,
+            "broadcasts_expired": self.broadcasts_expired,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_result": self.last_result
+        }
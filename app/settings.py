@@ -0,0 +1,126 @@
+# settings.py
+# 공용 모듈에서 쓰는 환경 변수 설정 (.env는 가장 먼저 import되는 이 모듈에서 읽음)
+import os
+import socket
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 메시지 브로커 백엔드 - redis(PubSub), redis-streams, rabbitmq, memory(단일 프로세스, 외부 서비스 없음)
+BROKER = os.getenv("BROKER", "redis")
+
+# Redis 연결
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
+# redis-streams 백엔드 - 샤드별 전달 스트림 최대 길이(근사), 한 번에 읽는 항목 수, 읽기 대기 시간(ms)
+REDIS_STREAM_MAXLEN = int(os.getenv("REDIS_STREAM_MAXLEN", "100000"))
+REDIS_STREAM_READ_COUNT = int(os.getenv("REDIS_STREAM_READ_COUNT", "500"))
+REDIS_STREAM_BLOCK_MS = int(os.getenv("REDIS_STREAM_BLOCK_MS", "1000"))
+# 사용자를 나눠 담는 전달 스트림 수 (모든 워커와 발행 쪽이 같은 값을 사용해야 함)
+REDIS_STREAM_SHARDS = int(os.getenv("REDIS_STREAM_SHARDS", "16"))
+# 이 워커가 읽는 샤드 (예: "0-7,12", 비우면 전체) - 로드 밸런서가 사용자 샤드 기준으로 라우팅할 때만 지정
+REDIS_STREAM_CONSUMER_SHARDS = os.getenv("REDIS_STREAM_CONSUMER_SHARDS", "")
+
+# 워커 식별자 - redis-streams 컨슈머 그룹 이름으로 사용 (지정하면 재시작 후 처리하지 못한 항목부터 이어서 읽음)
+WORKER_ID = os.getenv("WORKER_ID") or None
+# 접속 현황에 기록하는 워커 이름 (WORKER_ID가 없으면 프로세스별 이름)
+WORKER_NAME = WORKER_ID or f"{socket.gethostname()}-{os.getpid()}"
+
+# 접속 현황(presence) - 워커가 사용자 연결을 기록하는 유효 시간(초)과 갱신 주기(초)
+PRESENCE_TTL = int(os.getenv("PRESENCE_TTL", "45"))
+PRESENCE_REFRESH_INTERVAL = float(os.getenv("PRESENCE_REFRESH_INTERVAL", "15"))
+# 접속 중이 아닌 사용자에게는 실시간 전달을 건너뜀 (알림은 DB와 재전송 버퍼에 남으므로 히스토리로 확인)
+PRESENCE_SKIP_OFFLINE = os.getenv("PRESENCE_SKIP_OFFLINE", "true").lower() in ("1", "true", "yes")
+# rabbitmq 백엔드에서 워커 간 접속 현황을 공유할 Redis URL (비우면 접속 현황으로 발행을 거르지 않음)
+PRESENCE_REDIS_URL = os.getenv("PRESENCE_REDIS_URL", "")
+
+# RabbitMQ 연결
+RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "localhost")
+RABBITMQ_PORT = int(os.getenv("RABBITMQ_PORT", "5672"))
+RABBITMQ_USER = os.getenv("RABBITMQ_USER", "guest")
+RABBITMQ_PASS = os.getenv("RABBITMQ_PASS", "guest")
+RABBITMQ_VHOST = os.getenv("RABBITMQ_VHOST", "/")
+
+# SSE 연결 유지용 하트비트 주기(초)
+SSE_HEARTBEAT_INTERVAL = int(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+
+# 데이터베이스
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./notifications.db")
+# DB 작업 스레드 수 = 커넥션 풀 크기 (스레드가 커넥션을 기다리지 않도록 동일하게 맞춤)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+
+# 연결(탭)별 로컬 큐 크기 - 느린 소비자가 워커 메모리를 무한정 점유하지 않도록 제한
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("SUBSCRIBER_QUEUE_SIZE", "100"))
+# 로컬 큐가 가득 찼을 때의 처리 방식
+#   drop_oldest: 가장 낮은 우선순위의 오래된 메시지를 버림
+#   coalesce: 버린 메시지 수를 모아 다음 전송 때 요약 이벤트("missed") 하나로 전달
+#   disconnect: 버퍼를 비우고 연결을 끊음 (클라이언트는 재연결 후 Last-Event-ID로 이어받음)
+SUBSCRIBER_OVERFLOW_POLICY = os.getenv("SUBSCRIBER_OVERFLOW_POLICY", "drop_oldest")
+# SSE 쓰기 하나가 이 시간(초) 안에 끝나지 않으면 읽지 않는 클라이언트로 보고 연결 종료
+SSE_SEND_TIMEOUT = float(os.getenv("SSE_SEND_TIMEOUT", "30"))
+
+# 배치 요청 하나에 담을 수 있는 최대 알림 수
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10000"))
+
+# 알림 병합(coalesce) - 같은 (사용자, 카테고리) 알림을 모으는 시간 창(초)과 창이 끝나기 전에 내보낼 키별 최대 개수
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", "1"))
+COALESCE_MAX_ITEMS = int(os.getenv("COALESCE_MAX_ITEMS", "500"))
+# 워커가 모아 둘 수 있는 전체 항목 수 (넘으면 병합하지 않고 바로 저장)와, 다른 키는 저장되는데 같은 키만 계속 실패할 때 버리기 전 시도 횟수
+COALESCE_MAX_PENDING = int(os.getenv("COALESCE_MAX_PENDING", "10000"))
+COALESCE_MAX_ATTEMPTS = int(os.getenv("COALESCE_MAX_ATTEMPTS", "3"))
+# 요청에 coalesce 값이 없을 때 병합할 카테고리 (쉼표 구분, "*"이면 카테고리가 있는 모든 알림, 비우면 요청에서 지정한 경우만)
+COALESCE_CATEGORIES = {category.strip() for category in os.getenv("COALESCE_CATEGORIES", "").split(",") if category.strip()}
+
+# Redis 안읽은 알림 카운터 TTL(초) - 조회/갱신이 없는 사용자의 카운터는 만료 후 DB에서 재계산
+UNREAD_COUNTER_TTL = int(os.getenv("UNREAD_COUNTER_TTL", "86400"))
+# 프로세스 내 안읽은 알림 카운터 (rabbitmq/memory) - 다른 워커의 변경이 보이지 않으므로 짧게 보관하는 시간(초)과 최대 사용자 수
+UNREAD_LOCAL_TTL = int(os.getenv("UNREAD_LOCAL_TTL", "30"))
+UNREAD_LOCAL_MAX_USERS = int(os.getenv("UNREAD_LOCAL_MAX_USERS", "10000"))
+
+# 사용자별 최근 알림 캐시 - 보관 개수(이 범위 안의 첫 페이지 조회는 DB를 거치지 않음), 보관 시간(초), 프로세스 내 캐시의 최대 사용자 수
+RECENT_CACHE_SIZE = int(os.getenv("RECENT_CACHE_SIZE", "50"))
+RECENT_CACHE_TTL = int(os.getenv("RECENT_CACHE_TTL", "60"))
+RECENT_CACHE_MAX_USERS = int(os.getenv("RECENT_CACHE_MAX_USERS", "10000"))
+
+# SSE 재연결(Last-Event-ID) 재전송 버퍼 - 사용자별 최대 보관 개수와 보관 시간(초)
+REPLAY_MAX_ENTRIES = int(os.getenv("REPLAY_MAX_ENTRIES", "100"))
+REPLAY_MAX_AGE = int(os.getenv("REPLAY_MAX_AGE", "3600"))
+
+# 한 번에 SSE로 내보내는 최대 메시지 수 - 쌓인 메시지가 많아도 긴급 알림이 다음 쓰기에서 바로 나가도록 제한
+DELIVERY_BATCH_SIZE = int(os.getenv("DELIVERY_BATCH_SIZE", "50"))
+
+# RabbitMQ 워커 큐 - 소비자 prefetch 한도와 묶어서 보낼 ack 수 / 최대 대기 시간(초)
+RABBITMQ_PREFETCH = int(os.getenv("RABBITMQ_PREFETCH", "1000"))
+RABBITMQ_ACK_BATCH = int(os.getenv("RABBITMQ_ACK_BATCH", "100"))
+RABBITMQ_ACK_INTERVAL = float(os.getenv("RABBITMQ_ACK_INTERVAL", "0.2"))
+
+# RabbitMQ 발행 - publisher confirm 채널 수와 확인 응답을 기다리는 최대 메시지 수
+RABBITMQ_PUBLISH_CHANNELS = int(os.getenv("RABBITMQ_PUBLISH_CHANNELS", "4"))
+RABBITMQ_MAX_IN_FLIGHT = int(os.getenv("RABBITMQ_MAX_IN_FLIGHT", "1000"))
+
+# 아웃박스 릴레이 - 한 번에 전달할 이벤트 수, 새 이벤트 확인 주기(초), 점유 만료(초), 재시도 백오프(초)
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+OUTBOX_CLAIM_LEASE = int(os.getenv("OUTBOX_CLAIM_LEASE", "30"))
+OUTBOX_RETRY_BASE = float(os.getenv("OUTBOX_RETRY_BASE", "0.5"))
+OUTBOX_RETRY_MAX = float(os.getenv("OUTBOX_RETRY_MAX", "30"))
+
+# 알림 보관 기간(일) - 기본값과 카테고리별 값("build=7,marketing=30"), 0이면 삭제하지 않음
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "0"))
+RETENTION_CATEGORY_DAYS = os.getenv("RETENTION_CATEGORY_DAYS", "")
+# 읽은 지 이 기간(일)이 지난 알림을 보관소로 옮김 (0이면 옮기지 않음) - RETENTION_ARCHIVE가 table이면 notifications_archive 테이블,
+# ndjson이면 RETENTION_ARCHIVE_DIR의 날짜별 gzip NDJSON 파일
+RETENTION_ARCHIVE_READ_DAYS = int(os.getenv("RETENTION_ARCHIVE_READ_DAYS", "0"))
+RETENTION_ARCHIVE = os.getenv("RETENTION_ARCHIVE", "")
+RETENTION_ARCHIVE_DIR = os.getenv("RETENTION_ARCHIVE_DIR", "./archive")
+# 정리 작업 - 실행 주기(초), 한 트랜잭션에서 지우는 최대 행 수, 배치 사이 대기(초, 쓰기 잠금을 오래 잡지 않도록)
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "3600"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+RETENTION_BATCH_PAUSE = float(os.getenv("RETENTION_BATCH_PAUSE", "0.05"))
+
+# 스트리밍 브로드캐스트 - 한 번에 처리할 수신자 수, 동시에 처리할 청크 수, 작업 상태 보관 시간(초)
+BROADCAST_CHUNK_SIZE = int(os.getenv("BROADCAST_CHUNK_SIZE", "1000"))
+BROADCAST_CHUNK_CONCURRENCY = int(os.getenv("BROADCAST_CHUNK_CONCURRENCY", "4"))
+BROADCAST_JOB_TTL = int(os.getenv("BROADCAST_JOB_TTL", "86400"))
@@ -0,0 +1,50 @@
+# shards.py
+import zlib
+from typing import Any, List, Optional, Set
+
+from settings import REDIS_STREAM_SHARDS
+
+
+def parse_shards(spec: str, count: int) -> Optional[Set[int]]:
+    """샤드 지정 문자열("0-7,12") 파싱 - 비어 있으면 None(전체)"""
+    if not spec.strip():
+        return None
+    shards = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        first, last = int(start), int(end or start)
+        if first < 0 or last >= count or first > last:
+            raise ValueError(f"Invalid shard range: {part} (shards are 0-{count - 1})")
+        shards.update(range(first, last + 1))
+    return shards
+
+
+class StreamShards:
+    """사용자 ID -> 전달 스트림 키 매핑
+
+    사용자는 `crc32(user_id) % count`로 샤드(`{prefix}:{n}`)에 배정되고, 전체 브로드캐스트는
+    모든 워커가 읽는 별도 스트림(`{prefix}:broadcast`)에 기록한다. 프로세스마다 값이 달라지는
+    hash() 대신 crc32를 사용하므로 모든 워커와 외부 라우터가 같은 샤드를 계산한다.
+    """
+
+    def __init__(self, prefix: str = "events:delivery", count: int = REDIS_STREAM_SHARDS):
+        if count < 1:
+            raise ValueError("Shard count must be positive")
+        self.prefix = prefix
+        self.count = count
+
+    def shard(self, user_id: Any) -> int:
+        return zlib.crc32(str(user_id).encode("utf-8")) % self.count
+
+    def key(self, user_id: Optional[Any]) -> str:
+        """사용자(None이면 전체 브로드캐스트)의 전달 스트림 키"""
+        if user_id is None:
+            return f"{self.prefix}:broadcast"
+        return f"{self.prefix}:{self.shard(user_id)}"
+
+    def keys(self, shards: Optional[Set[int]] = None) -> List[str]:
+        """지정한 샤드(None이면 전체)와 브로드캐스트 스트림 키 목록"""
+        return [f"{self.prefix}:{n}" for n in range(self.count) if shards is None or n in shards] + [self.key(None)]
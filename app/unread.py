@@ -0,0 +1,253 @@
+# unread.py
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from redis.asyncio import Redis
+
+import crud
+from database import run_db
+from envelope import dumps, pack
+from settings import UNREAD_COUNTER_TTL, UNREAD_LOCAL_MAX_USERS, UNREAD_LOCAL_TTL
+
+
+class UnreadCounter:
+    """프로세스 내 사용자별 안읽은 알림 카운터 (LRU)
+
+    캐시에 없는 사용자는 조회 시 DB에서 다시 계산한다. 새 알림은 커밋 직후 무효화하고(다음 조회 때
+    재계산), 읽음 처리는 캐시에 있는 사용자에게만 증감을 반영한다 (없으면 None). DB에서 다시 계산하는
+    도중 무효화/증감된 사용자의 결과는 이미 지난 값일 수 있으므로 캐시에 넣지 않는다.
+    다른 워커에서의 읽음 처리/발행은 보이지 않으므로 ttl초가 지나면 만료된다.
+    """
+
+    def __init__(self, ttl: int = UNREAD_LOCAL_TTL, max_users: int = UNREAD_LOCAL_MAX_USERS):
+        self._ttl = ttl
+        self._max_users = max_users
+        self._counts: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        # DB에서 다시 계산 중인 사용자별 [진행 중인 조회 수, 변경 횟수]
+        self._loading: Dict[str, List[int]] = {}
+
+    def _cached(self, key: str) -> Optional[int]:
+        entry = self._counts.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._counts[key]
+            return None
+        return entry[1]
+
+    def _set(self, key: str, count: int, expires: Optional[float] = None):
+        # 증감은 만료 시각을 늘리지 않음 (다른 워커의 변경이 반영되지 않은 값이 계속 남지 않도록)
+        self._counts[key] = (time.monotonic() + self._ttl if expires is None else expires, count)
+        self._counts.move_to_end(key)
+        while len(self._counts) > self._max_users:
+            self._counts.popitem(last=False)
+
+    def _changed(self, key: str):
+        loading = self._loading.get(key)
+        if loading:
+            loading[1] += 1
+
+    async def get(self, user_id: Any) -> int:
+        return (await self.get_many([user_id]))[user_id]
+
+    async def get_many(self, user_ids: Iterable[Any]) -> Dict[Any, int]:
+        """사용자별 안읽은 알림 수 (캐시에 없는 사용자는 DB 호출 한 번으로 함께 계산)"""
+        counts = {user_id: self._cached(str(user_id)) for user_id in user_ids}
+        missing = [str(user_id) for user_id, count in counts.items() if count is None]
+        if missing:
+            loaded = await self._load(missing)
+            counts = {user_id: loaded[str(user_id)] if count is None else count for user_id, count in counts.items()}
+        return counts
+
+    async def _load(self, keys: List[str]) -> Dict[str, int]:
+        started = {}
+        for key in keys:
+            loading = self._loading.setdefault(key, [0, 0])
+            loading[0] += 1
+            started[key] = loading[1]
+        try:
+            counts = await run_db(crud.count_unread_many, keys)
+            for key, count in counts.items():
+                if self._loading[key][1] == started[key]:
+                    self._set(key, count)
+            return counts
+        finally:
+            for key in keys:
+                loading = self._loading[key]
+                loading[0] -= 1
+                if not loading[0]:
+                    del self._loading[key]
+
+    async def incr(self, user_id: Any, amount: int = 1) -> Optional[int]:
+        key = str(user_id)
+        count = self._cached(key)
+        if count is None:
+            self._changed(key)
+            return None
+        count = max(count + amount, 0)
+        self._set(key, count, self._counts[key][0])
+        return count
+
+    async def incr_many(self, amounts: Dict[Any, int]) -> Dict[Any, Optional[int]]:
+        return {user_id: await self.incr(user_id, amount) for user_id, amount in amounts.items()}
+
+    async def reset(self, user_id: Any) -> int:
+        self._changed(str(user_id))
+        self._set(str(user_id), 0)
+        return 0
+
+    async def invalidate_many(self, user_ids: Iterable[Any]):
+        for user_id in user_ids:
+            self._counts.pop(str(user_id), None)
+            self._changed(str(user_id))
+
+    async def invalidate_all(self):
+        self._counts.clear()
+        for loading in self._loading.values():
+            loading[1] += 1
+
+
+# 현재 세대의 키가 있을 때만 증감 (없는 키를 0부터 만들면 DB와 어긋나므로)
+# 키가 없으면 사용자 버전을 올려서 그 사이 DB에서 다시 계산한 값이 저장되지 않게 함
+# 세대는 스크립트 안에서 읽어야 증감 도중 invalidate_all이 끼어들어도 이전 세대 키에만 반영된다
+# KEYS: 세대, 사용자 버전 / ARGV: 증감량, TTL, 접두사, 사용자 ID
+_INCR_IF_EXISTS = """
+local key = ARGV[3] .. (redis.call('GET', KEYS[1]) or '0') .. ':' .. ARGV[4]
+if redis.call('EXISTS', key) == 0 then
+    redis.call('INCR', KEYS[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+    return nil
+end
+local count = redis.call('INCRBY', key, ARGV[1])
+if count < 0 then
+    count = 0
+    redis.call('SET', key, 0)
+end
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+redis.call('EXPIRE', key, ARGV[2])
+return count
+"""
+
+# 사용자 버전을 올리고 현재 세대의 카운터 삭제 (KEYS: 세대, 사용자 버전 / ARGV: 접두사, 사용자 ID, TTL)
+_INVALIDATE = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+redis.call('DEL', ARGV[1] .. (redis.call('GET', KEYS[1]) or '0') .. ':' .. ARGV[2])
+"""
+
+# DB에서 다시 계산한 값을 조회 시작 때와 세대/버전이 같을 때만 저장하고, 저장된 값 반환
+# (다른 워커가 먼저 채웠으면 그 값, 조회 도중 바뀌었으면 nil)
+# KEYS: 세대, 사용자 버전 / ARGV: 조회 시작 때 세대, 조회 시작 때 버전, 값, TTL, 접두사, 사용자 ID
+_FILL = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] or (redis.call('GET', KEYS[2]) or '0') ~= ARGV[2] then
+    return nil
+end
+local key = ARGV[5] .. ARGV[1] .. ':' .. ARGV[6]
+if redis.call('SET', key, ARGV[3], 'EX', ARGV[4], 'NX') then
+    return tonumber(ARGV[3])
+end
+return tonumber(redis.call('GET', key))
+"""
+
+
+class RedisUnreadCounter(UnreadCounter):
+    """Redis에 저장되는 사용자별 안읽은 알림 카운터 (워커 간 공유)
+
+    카운터 키에 공통 세대 번호를 붙여서, 전체 공지처럼 모든 사용자의 수가 바뀌면 키를 스캔하지 않고
+    세대만 올려 기존 카운터를 한 번에 버린다 (이전 세대 키는 TTL로 정리됨). 사용자별 버전은 무효화와
+    캐시에 없는 사용자의 증감 때 올라가며, DB에서 다시 계산하는 도중 세대나 버전이 바뀌면 결과를 저장하지 않는다.
+    조회로는 만료 시각을 늘리지 않으므로 어긋난 값도 ttl초 안에 다시 계산된다.
+    """
+
+    GENERATION_KEY = "unread:generation"
+    PREFIX = "unread:"
+
+    def __init__(self, redis: Redis, ttl: int = UNREAD_COUNTER_TTL):
+        self._redis = redis
+        self._ttl = ttl
+        self._incr_script = redis.register_script(_INCR_IF_EXISTS)
+        self._invalidate_script = redis.register_script(_INVALIDATE)
+        self._fill_script = redis.register_script(_FILL)
+
+    @classmethod
+    def _key(cls, generation: Any, user_id: Any) -> str:
+        return f"{cls.PREFIX}{generation}:{user_id}"
+
+    @classmethod
+    def _version_key(cls, user_id: Any) -> str:
+        return f"{cls.PREFIX}version:{user_id}"
+
+    async def _current_key(self, user_id: Any) -> str:
+        generation = await self._redis.get(self.GENERATION_KEY)
+        return self._key(generation or 0, user_id)
+
+    async def get_many(self, user_ids: Iterable[Any]) -> Dict[Any, int]:
+        user_ids = list(user_ids)
+        generation = await self._redis.get(self.GENERATION_KEY) or "0"
+        values = await self._redis.mget(
+            [self._key(generation, user_id) for user_id in user_ids] + [self._version_key(user_id) for user_id in user_ids]
+        )
+        counts, versions = values[:len(user_ids)], values[len(user_ids):]
+        result = {user_id: int(count) for user_id, count in zip(user_ids, counts) if count is not None}
+        missing = [(user_id, version) for user_id, count, version in zip(user_ids, counts, versions) if count is None]
+        if not missing:
+            return result
+
+        loaded = await run_db(crud.count_unread_many, [str(user_id) for user_id, _ in missing])
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for user_id, version in missing:
+                await self._fill_script(
+                    keys=[self.GENERATION_KEY, self._version_key(user_id)],
+                    args=[generation, version or "0", loaded[str(user_id)], self._ttl, self.PREFIX, str(user_id)],
+                    client=pipe
+                )
+            stored = await pipe.execute()
+        # 동시에 다른 워커가 먼저 채웠다면 그 값을 사용
+        for (user_id, _), count in zip(missing, stored):
+            result[user_id] = loaded[str(user_id)] if count is None else int(count)
+        return {user_id: result[user_id] for user_id in user_ids}
+
+    def _incr_args(self, user_id: Any, amount: int) -> Dict[str, Any]:
+        return {
+            "keys": [self.GENERATION_KEY, self._version_key(user_id)],
+            "args": [amount, self._ttl, self.PREFIX, str(user_id)]
+        }
+
+    async def incr(self, user_id: Any, amount: int = 1) -> Optional[int]:
+        return await self._incr_script(**self._incr_args(user_id, amount))
+
+    async def incr_many(self, amounts: Dict[Any, int]) -> Dict[Any, Optional[int]]:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for user_id, amount in amounts.items():
+                await self._incr_script(**self._incr_args(user_id, amount), client=pipe)
+            counts = await pipe.execute()
+        return dict(zip(amounts, counts))
+
+    async def reset(self, user_id: Any) -> int:
+        await self._redis.set(await self._current_key(user_id), 0, ex=self._ttl)
+        return 0
+
+    async def invalidate_many(self, user_ids: Iterable[Any]):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                await self._invalidate_script(
+                    keys=[self.GENERATION_KEY, self._version_key(user_id)],
+                    args=[self.PREFIX, str(user_id), self._ttl],
+                    client=pipe
+                )
+            await pipe.execute()
+
+    async def invalidate_all(self):
+        # 공통 세대를 올리면 모든 사용자가 다음 조회 때 DB에서 다시 계산
+        await self._redis.incr(self.GENERATION_KEY)
+
+
+def unread_message(count: int) -> str:
+    """SSE로 전달할 안읽은 알림 수 이벤트"""
+    return dumps({"event": "unread", "count": count})
+
+
+def unread_envelope(count: int) -> str:
+    """Redis 채널로 발행할 안읽은 알림 수 이벤트 (봉투 포함)"""
+    return pack(unread_message(count), event="unread")
@@ -0,0 +1,329 @@
+# sse_bench.py
+"""SSE 알림 파이프라인 부하 생성 및 지연 측정
+
+N개의 `/events/{user_id}` 스트림을 연 상태에서 `/notify`와 `/broadcast`를 지정한 속도로
+호출하고, 발행부터 수신까지의 지연 백분위수, 초당 메시지 수, 연결당 메모리, 이벤트 루프
+지연을 JSON으로 기록한다.
+
+    # 이미 떠 있는 서버 대상
+    python benchmarks/sse_bench.py --url http://127.0.0.1:8000 --connections 500
+
+    # Redis 버전을 fakeredis와 함께 직접 띄워서 측정
+    python benchmarks/sse_bench.py --spawn redis --fake-redis --output results/redis.json
+
+    # 외부 서비스 없이 프로세스 내 브로커로 측정
+    python benchmarks/sse_bench.py --spawn memory --output results/memory.json
+
+    # 일반 알림 폭주 중 긴급 알림 지연 측정
+    python benchmarks/sse_bench.py --spawn redis --fake-redis --rate 2000 --urgent-ratio 0.01
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+# --spawn 값은 BROKER 환경 변수로 넘겨서 통합 앱(main:app)을 띄움
+BACKENDS = ("redis", "redis-streams", "rabbitmq", "memory")
+TITLE_PREFIX = "bench:"
+
+
+def percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    if not samples:
+        return {"count": 0, "p50": None, "p90": None, "p99": None, "max": None, "mean": None}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(int(len(ordered) * q), len(ordered) - 1)], 3)
+
+    return {
+        "count": len(ordered),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 3),
+        "mean": round(statistics.fmean(ordered), 3)
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def read_rss_kb(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def start_fake_redis() -> int:
+    """fakeredis TCP 서버를 백그라운드 스레드로 실행하고 포트 반환"""
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        sys.exit("--fake-redis requires fakeredis[lua] (pip install 'fakeredis[lua]')")
+    port = free_port()
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return port
+
+
+class Bench:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.url = args.url.rstrip("/")
+        self.sent_at: Dict[int, float] = {}
+        self.priority: Dict[int, int] = {}
+        self.latencies: Dict[int, List[float]] = {0: [], 1: [], 2: []}
+        self.expected = 0
+        self.received = 0
+        self.connected = 0
+        self.connection_errors = 0
+        self.send_errors = 0
+        self.loop_lag: List[float] = []
+        self.probe_latency: List[float] = []
+        self.all_connected = asyncio.Event()
+        self.users = [f"bench-{index}" for index in range(args.users)]
+        # 사용자별 연결 수 (브로드캐스트/개별 발송의 예상 수신 건수 계산용)
+        self.connections_per_user = {user: 0 for user in self.users}
+        for index in range(args.connections):
+            self.connections_per_user[self.users[index % len(self.users)]] += 1
+
+    async def stream(self, client: httpx.AsyncClient, user_id: str):
+        try:
+            async with client.stream("GET", f"{self.url}/events/{user_id}") as response:
+                event, data = None, []
+                async for line in response.aiter_lines():
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:"):
+                        data.append(line[5:].strip())
+                    elif not line:
+                        if event:
+                            self.on_event(event, "\n".join(data))
+                        event, data = None, []
+        except (httpx.HTTPError, asyncio.CancelledError):
+            pass
+
+    def on_event(self, event: str, data: str):
+        now = time.perf_counter()
+        if event == "connect":
+            self.connected += 1
+            if self.connected >= self.args.connections:
+                self.all_connected.set()
+            return
+        if event != "notification":
+            return
+        title = json.loads(data).get("title", "")
+        if not title.startswith(TITLE_PREFIX):
+            return
+        seq = int(title[len(TITLE_PREFIX):])
+        sent_at = self.sent_at.get(seq)
+        if sent_at is None:
+            return
+        self.received += 1
+        self.latencies[self.priority[seq]].append((now - sent_at) * 1000)
+
+    async def send(self, client: httpx.AsyncClient, seq: int, semaphore: asyncio.Semaphore):
+        args = self.args
+        priority = 2 if random.random() < args.urgent_ratio else 0
+        payload = {"title": f"{TITLE_PREFIX}{seq}", "message": "benchmark", "priority": priority}
+        if random.random() < args.broadcast_ratio:
+            path = "/broadcast"
+            expected = args.connections
+        else:
+            user_id = random.choice(self.users)
+            path = f"/notify/{user_id}"
+            expected = self.connections_per_user[user_id]
+
+        async with semaphore:
+            self.priority[seq] = priority
+            self.sent_at[seq] = time.perf_counter()
+            try:
+                response = await client.post(f"{self.url}{path}", json=payload)
+                response.raise_for_status()
+                self.expected += expected
+            except httpx.HTTPError:
+                self.send_errors += 1
+                self.sent_at.pop(seq, None)
+
+    async def monitor_loop_lag(self, interval: float = 0.05):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.loop_lag.append((time.perf_counter() - started - interval) * 1000)
+
+    async def probe_server(self, client: httpx.AsyncClient, interval: float = 0.25):
+        """가벼운 요청의 응답 시간으로 서버 이벤트 루프 지연을 근사"""
+        while True:
+            started = time.perf_counter()
+            try:
+                await client.get(f"{self.url}/notifications/{self.users[0]}/unread-count")
+                self.probe_latency.append((time.perf_counter() - started) * 1000)
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(interval)
+
+    async def run(self, server_pid: Optional[int]) -> dict:
+        args = self.args
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        timeout = httpx.Timeout(args.timeout, read=None)
+        async with httpx.AsyncClient(limits=limits, timeout=timeout) as stream_client, \
+                httpx.AsyncClient(limits=httpx.Limits(max_connections=args.concurrency), timeout=args.timeout) as client:
+            rss_before = read_rss_kb(server_pid) if server_pid else None
+            lag_task = asyncio.create_task(self.monitor_loop_lag())
+
+            streams = [
+                asyncio.create_task(self.stream(stream_client, self.users[index % len(self.users)]))
+                for index in range(args.connections)
+            ]
+            try:
+                await asyncio.wait_for(self.all_connected.wait(), args.connect_timeout)
+            except asyncio.TimeoutError:
+                pass
+            connected = self.connected
+            await asyncio.sleep(0.5)
+            rss_connected = read_rss_kb(server_pid) if server_pid else None
+
+            probe_task = asyncio.create_task(self.probe_server(client))
+            semaphore = asyncio.Semaphore(args.concurrency)
+            sends = []
+            started = time.perf_counter()
+            total = int(args.rate * args.duration)
+            for seq in range(total):
+                # 목표 발송 시각까지 대기 (지정한 속도 유지)
+                delay = started + seq / args.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                sends.append(asyncio.create_task(self.send(client, seq, semaphore)))
+            await asyncio.gather(*sends)
+            send_elapsed = time.perf_counter() - started
+
+            # 남은 메시지 수신 대기
+            deadline = time.perf_counter() + args.drain_timeout
+            while self.received < self.expected and time.perf_counter() < deadline:
+                await asyncio.sleep(0.05)
+            elapsed = time.perf_counter() - started
+            rss_after = read_rss_kb(server_pid) if server_pid else None
+
+            for task in (lag_task, probe_task, *streams):
+                task.cancel()
+            await asyncio.gather(lag_task, probe_task, *streams, return_exceptions=True)
+
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        memory = None
+        if rss_before is not None and rss_connected is not None:
+            memory = {
+                "rss_before_kb": rss_before,
+                "rss_connected_kb": rss_connected,
+                "rss_after_kb": rss_after,
+                "per_connection_kb": round((rss_connected - rss_before) / max(connected, 1), 2)
+            }
+        return {
+            "config": vars(args),
+            "connections": {"requested": args.connections, "connected": connected},
+            "messages": {
+                "published": total - self.send_errors,
+                "publish_errors": self.send_errors,
+                "publish_per_sec": round((total - self.send_errors) / send_elapsed, 1),
+                "expected_deliveries": self.expected,
+                "delivered": self.received,
+                "delivered_per_sec": round(self.received / elapsed, 1)
+            },
+            "latency_ms": {
+                "all": percentiles(all_latencies),
+                "normal": percentiles(self.latencies[0]),
+                "urgent": percentiles(self.latencies[2])
+            },
+            "memory": memory,
+            "client_loop_lag_ms": percentiles(self.loop_lag),
+            "server_probe_latency_ms": percentiles(self.probe_latency)
+        }
+
+
+def spawn_server(args: argparse.Namespace, env: dict) -> subprocess.Popen:
+    port = free_port()
+    args.url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", "app",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"{args.url}/notifications/_/unread-count", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    sys.exit("server did not start within 30s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="benchmark target (ignored with --spawn)")
+    parser.add_argument("--spawn", choices=BACKENDS, help="start the given backend with uvicorn for the run")
+    parser.add_argument("--fake-redis", action="store_true", help="run an in-process fakeredis TCP server for --spawn redis / redis-streams")
+    parser.add_argument("--database-url", help="DATABASE_URL for the spawned server (default: temporary SQLite file)")
+    parser.add_argument("--server-pid", type=int, help="pid of an already running server, for memory sampling")
+    parser.add_argument("--connections", type=int, default=100, help="concurrent SSE streams")
+    parser.add_argument("--users", type=int, default=100, help="distinct user ids the streams are spread over")
+    parser.add_argument("--rate", type=float, default=100.0, help="publish requests per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="publish phase length in seconds")
+    parser.add_argument("--broadcast-ratio", type=float, default=0.0, help="share of publishes sent to /broadcast")
+    parser.add_argument("--urgent-ratio", type=float, default=0.0, help="share of publishes sent with priority 2")
+    parser.add_argument("--concurrency", type=int, default=64, help="max in-flight publish requests")
+    parser.add_argument("--connect-timeout", type=float, default=30.0)
+    parser.add_argument("--drain-timeout", type=float, default=10.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="write JSON results to this file (default: stdout)")
+    args = parser.parse_args()
+
+    process = None
+    if args.spawn:
+        env = dict(os.environ, BROKER=args.spawn)
+        if args.fake_redis:
+            env["REDIS_HOST"], env["REDIS_PORT"] = "127.0.0.1", str(start_fake_redis())
+        env["DATABASE_URL"] = args.database_url or f"sqlite:////tmp/sse-bench-{os.getpid()}.db"
+        process = spawn_server(args, env)
+
+    try:
+        result = asyncio.run(Bench(args).run(process.pid if process else args.server_pid))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+            if not args.database_url:
+                Path(f"/tmp/sse-bench-{os.getpid()}.db").unlink(missing_ok=True)
+
+    result["backend"] = args.spawn or args.url
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# conftest.py
+# 앱 모듈은 import 시점에 환경 변수를 읽으므로 가장 먼저 테스트용 설정을 지정한다
+import os
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ["BROKER"] = "memory"
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='notify-test-'), 'test.db')}"
+os.environ.setdefault("OUTBOX_POLL_INTERVAL", "0.05")
+os.environ.setdefault("RETENTION_INTERVAL", "0")
+# 앱은 저장소 루트 기준 경로로 템플릿과 정적 파일을 읽음
+os.chdir(ROOT)
+
+import itertools  # noqa: E402
+
+import pytest  # noqa: E402
+
+from database import SessionLocal, engine, init_db  # noqa: E402
+from models import Base  # noqa: E402
+
+_user_ids = itertools.count(1)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    init_db()
+
+
+@pytest.fixture(autouse=True)
+def clean_tables():
+    """테스트마다 모든 테이블을 비움 (전체 브로드캐스트는 모든 사용자의 히스토리에 보이므로)"""
+    yield
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+
+
+@pytest.fixture
+def db():
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def user_id() -> str:
+    """테스트마다 다른 사용자 ID (같은 DB를 쓰는 테스트끼리 섞이지 않도록)"""
+    return f"user-{next(_user_ids)}"
+
+
+@pytest.fixture(scope="session")
+def client():
+    """앱 전체를 한 번만 띄워서 공유 (종료 시 DB 스레드 풀을 닫으므로 다시 시작할 수 없음)"""
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
@@ -0,0 +1,100 @@
+# test_api.py
+# BROKER=memory로 외부 서비스 없이 앱 전체를 실행
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+import main
+
+
+def test_notify_saves_history_and_unread_count(client, user_id):
+    response = client.post(f"/notify/{user_id}", json={"title": "hello", "priority": 5})
+    assert response.status_code == 200
+    notification_id = response.json()["notification_id"]
+
+    history = client.get(f"/notifications/{user_id}").json()
+    assert [(item["id"], item["title"], item["priority"]) for item in history] == [(notification_id, "hello", 2)]
+    assert client.get(f"/notifications/{user_id}/unread-count").json()["unread"] == 1
+
+    assert client.put(f"/notifications/{notification_id}/read").status_code == 200
+    assert client.get(f"/notifications/{user_id}/unread-count").json()["unread"] == 0
+    assert client.get(f"/notifications/{user_id}").json()[0]["is_read"] is True
+
+
+def test_batch_reports_per_item_results(client, user_id):
+    response = client.post("/notify/batch", json=[
+        {"user_id": user_id, "title": "first"},
+        {"title": "missing user"},
+        "not an object",
+        {"user_id": user_id, "title": "second"},
+    ]).json()
+
+    assert (response["sent"], response["failed"]) == (2, 2)
+    assert [result["status"] for result in response["results"]] == ["success", "error", "error", "success"]
+    assert [item["title"] for item in client.get(f"/notifications/{user_id}").json()] == ["second", "first"]
+
+
+def test_keyset_cursor_header(client, user_id):
+    for index in range(3):
+        client.post(f"/notify/{user_id}", json={"title": f"n{index}", "timestamp": f"2024-01-01T00:00:0{index}"})
+
+    first = client.get(f"/notifications/{user_id}", params={"limit": 2})
+    second = client.get(f"/notifications/{user_id}", params={"limit": 2, "before": first.headers["X-Next-Cursor"]})
+
+    assert [item["title"] for item in first.json()] == ["n2", "n1"]
+    assert [item["title"] for item in second.json()] == ["n0"]
+    assert "X-Next-Cursor" not in second.headers
+    assert client.get(f"/notifications/{user_id}", params={"before": "bad"}).status_code == 400
+    assert client.get(f"/notifications/{user_id}", params={"limit": 0}).status_code == 422
+
+
+def test_broadcast_is_read_per_user(client, user_id):
+    other = f"{user_id}-other"
+    broadcast_id = client.post("/broadcast", json={"title": "everyone"}).json()["broadcast_id"]
+
+    assert client.put(f"/notifications/{broadcast_id}/read").status_code == 400
+    assert client.put(f"/notifications/{broadcast_id}/read", params={"user_id": user_id}).status_code == 200
+
+    assert client.get(f"/notifications/{user_id}").json()[0]["is_read"] is True
+    assert client.get(f"/notifications/{other}").json()[0]["is_read"] is False
+    assert client.get(f"/notifications/{other}/unread-count").json()["unread"] == 1
+
+
+def test_read_bulk_returns_new_unread_count(client, user_id):
+    for category in ("build", "build", "chat"):
+        client.post(f"/notify/{user_id}", json={"title": category, "category": category})
+
+    response = client.put(f"/notifications/{user_id}/read-bulk", json={"category": "build"}).json()
+
+    assert (response["updated"], response["unread"]) == (2, 1)
+    assert client.put(f"/notifications/{user_id}/read-bulk", json={}).status_code == 400
+
+
+def test_broker_stats_and_metrics(client):
+    assert client.get("/broker/stats").json()["broker"] == "memory"
+    assert "notifications_published_total" in client.get("/metrics").text
+
+
+@pytest.fixture
+def cache_outage(monkeypatch):
+    """캐시/카운터 저장소(Redis) 장애 - 메모리 백엔드의 캐시와 카운터가 연결 오류를 내도록 바꿈"""
+    async def fail(*args, **kwargs):
+        raise RedisConnectionError("connection refused")
+
+    monkeypatch.setattr(main.broker, "errors", (RedisConnectionError,))
+    for name in ("get_page", "invalidate_many", "invalidate_all"):
+        monkeypatch.setattr(main.recent_cache, name, fail)
+    for name in ("get", "incr", "reset"):
+        monkeypatch.setattr(main.unread_counter, name, fail)
+
+
+def test_writes_and_history_survive_cache_outage(client, user_id, cache_outage):
+    response = client.post(f"/notify/{user_id}", json={"title": "hello"})
+    assert response.status_code == 200
+    notification_id = response.json()["notification_id"]
+    assert client.post("/broadcast", json={"title": "all"}).status_code == 200
+
+    # 캐시를 읽을 수 없으면 DB에서 조회
+    assert [item["title"] for item in client.get(f"/notifications/{user_id}").json()] == ["all", "hello"]
+    assert client.put(f"/notifications/{notification_id}/read").status_code == 200
+    assert client.put(f"/notifications/{user_id}/read-bulk", json={"max_priority": 2}).json()["unread"] == 0
+    assert client.put(f"/notifications/{user_id}/read-all").status_code == 200
@@ -0,0 +1,81 @@
+# test_coalesce.py
+import pytest
+
+from coalesce import Coalescer, merge_messages
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeStore:
+    """flush 대상 - broken에 든 키나 poison에 든 제목이 포함된 저장은 실패"""
+
+    def __init__(self):
+        self.saved = []
+        self.titles = []
+        self.broken = set()
+        self.poison = set()
+
+    async def __call__(self, groups):
+        keys = [(items[0][0]["user_id"], items[0][0]["category"]) for items in groups]
+        titles = [row["title"] for items in groups for row, _ in items]
+        if self.broken & set(keys) or self.poison & set(titles):
+            raise RuntimeError("insert failed")
+        self.saved.extend(keys)
+        self.titles.extend(titles)
+
+
+def add(coalescer, user_id, category="build", title="t", priority=0):
+    row = {"user_id": user_id, "category": category, "title": title}
+    return coalescer.add(user_id, category, row, {"title": title, "priority": priority})
+
+
+def test_merge_messages_keeps_latest_content():
+    items = [({"category": "build"}, {"title": "1", "priority": 2}), ({"category": "build"}, {"title": "2", "priority": 0})]
+
+    assert merge_messages(items) == {"title": "2", "priority": 2, "category": "build", "count": 2}
+
+
+async def test_add_rejects_when_pending_is_full():
+    coalescer = Coalescer(FakeStore(), max_pending=2)
+
+    assert [add(coalescer, "u1"), add(coalescer, "u2"), add(coalescer, "u1")] == [1, 1, None]
+    assert (coalescer.pending, coalescer.rejected) == (2, 1)
+
+
+async def test_poison_group_is_saved_row_by_row_while_others_are_saved():
+    store = FakeStore()
+    store.poison.add("poison")
+    coalescer = Coalescer(store, max_attempts=2)
+
+    add(coalescer, "bad", title="ok-1")
+    add(coalescer, "bad", title="poison")
+    add(coalescer, "good-1")
+    assert await coalescer.flush_once() == 1
+    assert coalescer.pending == 2
+
+    add(coalescer, "bad", title="ok-2")
+    add(coalescer, "good-2")
+    # 같은 키만 max_attempts번 실패하면 하나씩 저장하고, 혼자서도 실패하는 항목만 버림
+    assert await coalescer.flush_once() == 3
+    assert (coalescer.pending, coalescer.dropped) == (0, 1)
+    assert store.saved == [("good-1", "build"), ("good-2", "build"), ("bad", "build"), ("bad", "build")]
+    assert store.titles == ["t", "t", "ok-1", "ok-2"]
+
+
+async def test_outage_keeps_items_until_the_store_recovers():
+    store = FakeStore()
+    store.broken.update({("u1", "build"), ("u2", "build")})
+    coalescer = Coalescer(store, max_attempts=1)
+    add(coalescer, "u1", title="first")
+    add(coalescer, "u2")
+
+    # 모든 키가 실패하면 DB 장애로 보고 버리지 않음
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            await coalescer.flush_once()
+    add(coalescer, "u1", title="second")
+    assert (coalescer.pending, coalescer.dropped) == (3, 0)
+
+    store.broken.clear()
+    assert await coalescer.flush_once() == 3
+    assert coalescer.pending == 0
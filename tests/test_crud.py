@@ -0,0 +1,139 @@
+# test_crud.py
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, text
+
+import crud
+
+BASE = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def notification_row(user_id, minute, **values):
+    return {
+        "user_id": user_id,
+        "title": f"n{minute}",
+        "message": "message",
+        "icon": None,
+        "created_at": BASE + timedelta(minutes=minute),
+        "category": values.pop("category", None),
+        "priority": values.pop("priority", 0),
+        **values
+    }
+
+
+def broadcast_row(minute, **values):
+    row = notification_row(None, minute, **values)
+    del row["user_id"]
+    return row
+
+
+def page_titles(db, user_id, limit, **kwargs):
+    return [item["title"] for item in crud.list_notifications(db, user_id, limit, 0, False, **kwargs)]
+
+
+def test_keyset_pages_merge_notifications_and_broadcasts(db, user_id):
+    crud.create_notifications(db, [notification_row(user_id, minute) for minute in (1, 3, 5)])
+    crud.create_broadcast(db, broadcast_row(2))
+    crud.create_broadcast(db, broadcast_row(4), [user_id])
+    # 다른 사용자에게만 보낸 브로드캐스트는 보이지 않음
+    crud.create_broadcast(db, broadcast_row(6), ["someone-else"])
+
+    pages, cursor = [], None
+    while True:
+        items = crud.list_notifications(db, user_id, 2, 0, False, cursor)
+        pages.append([item["title"] for item in items])
+        if len(items) < 2:
+            break
+        cursor = crud.parse_cursor(crud.make_cursor(items[-1]))
+
+    assert pages == [["n5", "n4"], ["n3", "n2"], ["n1"]]
+    # offset 페이징과 같은 순서
+    assert page_titles(db, user_id, 10) == ["n5", "n4", "n3", "n2", "n1"]
+
+
+def test_keyset_cursor_orders_ties_with_broadcast_first(db, user_id):
+    crud.create_notifications(db, [notification_row(user_id, 1), notification_row(user_id, 1)])
+    crud.create_broadcast(db, broadcast_row(1), [user_id])
+
+    first = crud.list_notifications(db, user_id, 1, 0, False)
+    rest = crud.list_notifications(db, user_id, 10, 0, False, crud.parse_cursor(crud.make_cursor(first[0])))
+
+    assert str(first[0]["id"]).startswith("b")
+    assert len(rest) == 2
+    assert rest[0]["id"] > rest[1]["id"]
+
+
+def test_parse_notification_id():
+    assert crud.parse_notification_id("12") == (False, 12)
+    assert crud.parse_notification_id("b12") == (True, 12)
+
+
+def test_count_unread_includes_broadcasts(db, user_id):
+    crud.create_notifications(db, [notification_row(user_id, minute) for minute in range(3)])
+    crud.create_broadcast(db, broadcast_row(1))
+    crud.create_broadcast(db, broadcast_row(2), [user_id])
+
+    assert crud.count_unread(db, user_id) == 5
+
+
+def test_visible_broadcasts_lists_each_broadcast_once(db, user_id):
+    everyone = crud.create_broadcast(db, broadcast_row(1))
+    crud.create_broadcast(db, broadcast_row(2), [user_id])
+    hidden = crud.create_broadcast(db, broadcast_row(3), ["someone-else"])
+    crud.mark_broadcast_read(db, everyone, user_id)
+
+    # 읽은 전체 브로드캐스트는 상태 행 쪽에서만 조회됨
+    history = crud.list_notifications(db, user_id, 10, 0, False)
+    assert [(item["title"], item["is_read"]) for item in history] == [("n2", False), ("n1", True)]
+    assert [item["title"] for item in crud.list_notifications(db, user_id, 10, 0, True)] == ["n2"]
+    assert crud.count_unread(db, user_id) == 1
+    assert crud.mark_broadcast_read(db, hidden, user_id) == (False, None)
+
+
+def test_visible_broadcasts_use_indexes(db, user_id):
+    query = select(func.count()).select_from(crud._visible_broadcasts(user_id, unread_only=True, limit=20))
+    sql = str(query.compile(db.get_bind(), compile_kwargs={"literal_binds": True}))
+    plan = [row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+    assert not [step for step in plan if step.startswith("SCAN broadcast_")]
+    assert any("ix_broadcast_receipts_user" in step for step in plan)
+    assert any("ix_broadcast_messages_all_created" in step for step in plan)
+
+
+def test_mark_read_bulk_counts_changed_rows(db, user_id):
+    ids = crud.create_notifications(db, [
+        notification_row(user_id, 1, category="build"),
+        notification_row(user_id, 2, category="build", priority=2),
+        notification_row(user_id, 3, category="chat"),
+    ])
+    everyone = crud.create_broadcast(db, broadcast_row(4, category="build"))
+    targeted = crud.create_broadcast(db, broadcast_row(5, category="chat"), [user_id])
+
+    assert crud.mark_read_bulk(db, user_id, category="build", max_priority=0) == 2
+    # 이미 읽은 알림은 다시 세지 않음
+    assert crud.mark_read_bulk(db, user_id, category="build", max_priority=0) == 0
+    assert crud.mark_read_bulk(db, user_id, ids=[(False, ids[2]), (True, targeted)]) == 2
+    assert crud.count_unread(db, user_id) == 1
+
+    assert crud.mark_all_read(db, user_id) == 1
+    assert crud.count_unread(db, user_id) == 0
+    assert crud.mark_broadcast_read(db, everyone, user_id) == (True, None)
+
+
+def test_mark_notification_read_reports_change_once(db, user_id):
+    (notification_id,) = crud.create_notifications(db, [notification_row(user_id, 1)])
+
+    assert crud.mark_notification_read(db, notification_id) == (True, user_id)
+    assert crud.mark_notification_read(db, notification_id) == (True, None)
+    assert crud.mark_notification_read(db, notification_id + 1000) == (False, None)
+
+
+def test_outbox_claim_is_exclusive_until_lease_expires(db, user_id):
+    crud.create_notification(db, notification_row(user_id, 1), {"event": "notification", "title": "n1"})
+
+    claimed = crud.claim_outbox(db, 10, 30)
+    assert [event["user_id"] for event in claimed] == [user_id]
+    assert crud.claim_outbox(db, 10, 30) == []
+
+    crud.retry_outbox(db, [claimed[0]["id"]], 0)
+    assert [event["attempts"] for event in crud.claim_outbox(db, 10, 30)] == [1]
@@ -0,0 +1,40 @@
+# test_events.py
+import json
+
+import pytest
+
+import crud
+import main
+from test_crud import notification_row
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_fallback_replay_sends_resume_marker(db, user_id):
+    crud.create_notifications(db, [notification_row(user_id, minute) for minute in (1, 2)])
+    # 워커가 시작되기 전의 ID라서 재전송 버퍼로 이어받을 수 없음
+    events = main.event_generator(user_id, "1-1")
+    try:
+        assert (await events.__anext__())["event"] == "connect"
+        assert json.loads((await events.__anext__())["data"])["count"] == 2
+        fallback = await events.__anext__()
+    finally:
+        await events.aclose()
+
+    blocks = fallback.split(b"\r\n\r\n")
+    assert [b"data: " in block for block in blocks[:2]] == [True, True]
+    # DB 대체 전송 뒤에 다음 재연결 기준점을 ID만 있는 블록으로 알림
+    marker = blocks[2].decode()
+    assert marker.startswith("id: ") and main.broker.replay_buffer.replay(user_id, marker[4:]) == []
+
+
+async def test_relay_publishes_count_committed_before_delivery(db, user_id):
+    # 커밋 직후 카운터를 무효화하고, 발행 전에 조회되어 DB에서 다시 계산된 값에 더하지 않음
+    crud.create_notification(db, notification_row(user_id, 1), {"title": "n1"})
+    await main.invalidate_users([user_id])
+    assert await main.unread_counter.get(user_id) == 1
+
+    events = [{"user_id": user_id, "payload": '{"event":"notification"}', "priority": 0, "unread": True}]
+    await main.deliver_outbox(events)
+
+    assert await main.unread_counter.get(user_id) == 1
@@ -0,0 +1,163 @@
+# test_hub.py
+import pytest
+
+from envelope import frame
+from hub import LocalHub, ResumeTracker, Subscription
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_get_batch_returns_higher_priority_first():
+    subscription = Subscription(batch_size=10)
+    subscription.put("normal-1", 0)
+    subscription.put("urgent", 2)
+    subscription.put("normal-2", 0)
+    subscription.put("important", 1)
+
+    assert await subscription.get_batch() == ["urgent", "important", "normal-1", "normal-2"]
+
+
+async def test_get_batch_is_limited_to_batch_size():
+    subscription = Subscription(batch_size=2)
+    for index in range(3):
+        subscription.put(index, 0)
+
+    assert await subscription.get_batch() == [0, 1]
+    assert await subscription.get_batch() == [2]
+    assert len(subscription) == 0
+
+
+def test_drop_oldest_drops_lowest_priority_first():
+    subscription = Subscription(maxsize=2, policy="drop_oldest")
+    subscription.put("normal", 0)
+    subscription.put("urgent", 2)
+
+    assert subscription.put("important", 1) == 1
+    assert subscription.drain() == ["urgent", "important"]
+
+
+def test_drop_oldest_drops_new_message_with_lower_priority():
+    subscription = Subscription(maxsize=1, policy="drop_oldest")
+    subscription.put("urgent", 2)
+
+    assert subscription.put("normal", 0) == 1
+    assert subscription.drain() == ["urgent"]
+
+
+def test_coalesce_counts_missed_messages():
+    subscription = Subscription(maxsize=1, policy="coalesce")
+    for index in range(4):
+        subscription.put(index, 0)
+
+    assert subscription.take_missed() == 3
+    assert subscription.take_missed() == 0
+    assert subscription.drain() == [3]
+
+
+async def test_disconnect_closes_subscription():
+    subscription = Subscription(maxsize=1, policy="disconnect")
+    subscription.put("first", 0)
+
+    assert subscription.put("second", 0) == 2
+    assert subscription.closed
+    assert await subscription.get_batch() == []
+    assert subscription.put("third", 0) == 0
+
+
+def test_hub_frames_once_and_fans_out_to_every_connection():
+    hub = LocalHub(queue_size=10)
+    first = hub.subscribe("u1")
+    second = hub.subscribe("u1")
+    other = hub.subscribe("u2")
+
+    hub.deliver("u1", "1-1", 0, "notification", '{"title":"hi"}')
+
+    (item,) = first.drain()
+    assert second.drain() == [item]
+    assert other.drain() == []
+    event_id, payload = item
+    assert event_id == "1-1"
+    assert payload == b'id: 1-1\r\nevent: notification\r\ndata: {"title":"hi"}\r\n\r\n'
+
+
+def test_hub_broadcast_reaches_all_users():
+    hub = LocalHub(queue_size=10)
+    subscriptions = [hub.subscribe("u1"), hub.subscribe("u2")]
+
+    hub.deliver(None, "1-1", 0, "notification", "{}")
+
+    assert [len(subscription) for subscription in subscriptions] == [1, 1]
+
+
+def test_hub_counts_dropped_and_disconnected():
+    hub = LocalHub(queue_size=1)
+    subscription = hub.subscribe("u1")
+    subscription._policy = "disconnect"
+
+    hub.deliver("u1", None, 0, "unread", "{}")
+    hub.deliver("u1", None, 0, "unread", "{}")
+
+    assert hub.dropped == 2
+    assert hub.disconnected == 1
+
+
+def client_view(chunks):
+    """SSE 클라이언트가 받은 이벤트 데이터와 마지막 이벤트 ID (ID만 있는 블록은 ID만 갱신)"""
+    received, last_id = [], None
+    for block in b"".join(chunks).split(b"\r\n\r\n"):
+        for line in block.split(b"\r\n"):
+            if line.startswith(b"id: "):
+                last_id = line[4:].decode()
+            elif line.startswith(b"data: "):
+                received.append(line[6:].decode())
+    return received, last_id
+
+
+def event(event_id, priority=0):
+    return (event_id, frame(event_id, "notification", event_id)), priority
+
+
+async def send(subscription, resume):
+    return b"".join(resume.frames(await subscription.get_batch(), subscription.lowest_event_id()))
+
+
+async def test_resume_id_does_not_skip_queued_lower_priority_events():
+    subscription = Subscription(batch_size=2)
+    for event_id, priority in ("1-1", 0), ("1-2", 0), ("1-3", 0), ("1-4", 1), ("1-5", 1):
+        subscription.put(*event(event_id, priority))
+    resume = ResumeTracker()
+
+    chunks = [await send(subscription, resume)]
+    # 긴급 알림은 먼저 받지만 1-1~1-3이 남아 있으므로 재연결 지점은 앞서 나가지 않음
+    assert client_view(chunks) == (["1-4", "1-5"], None)
+
+    chunks.append(await send(subscription, resume))
+    assert client_view(chunks) == (["1-4", "1-5", "1-1", "1-2"], "1-2")
+
+    chunks.append(await send(subscription, resume))
+    assert client_view(chunks) == (["1-4", "1-5", "1-1", "1-2", "1-3"], "1-5")
+
+
+async def test_resume_id_covers_reordered_batch():
+    subscription = Subscription(batch_size=10)
+    subscription.put(*event("1-1", 0))
+    subscription.put(*event("1-5", 2))
+
+    chunk = await send(subscription, ResumeTracker())
+
+    assert chunk == (
+        b"event: notification\r\ndata: 1-5\r\n\r\n"
+        b"id: 1-1\r\nevent: notification\r\ndata: 1-1\r\n\r\n"
+        b"id: 1-5\r\n\r\n"
+    )
+
+
+async def test_resume_id_never_moves_backwards():
+    subscription = Subscription(batch_size=10)
+    resume = ResumeTracker()
+    subscription.put(*event("1-3", 0))
+    assert client_view([await send(subscription, resume)]) == (["1-3"], "1-3")
+
+    # 늦게 도착한 더 낮은 ID는 ID 없이 전송
+    subscription.put(*event("1-2", 0))
+    assert await send(subscription, resume) == b"event: notification\r\ndata: 1-2\r\n\r\n"
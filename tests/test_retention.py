@@ -0,0 +1,117 @@
+# test_retention.py
+from datetime import datetime, timedelta
+
+import pytest
+
+import crud
+from retention import RetentionJob, parse_category_days
+
+pytestmark = pytest.mark.anyio
+
+
+def aged(days, **values):
+    return {
+        "title": values.pop("title", f"{days}d"),
+        "message": "message",
+        "icon": None,
+        "created_at": datetime.utcnow() - timedelta(days=days),
+        "category": values.pop("category", None),
+        "priority": 0,
+        **values
+    }
+
+
+def titles(db, user_id):
+    return sorted(item["title"] for item in crud.list_notifications(db, user_id, 100, 0, False))
+
+
+class Removed:
+    """on_removed 호출 기록"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, user_ids, unread):
+        self.calls.append((user_ids and sorted(user_ids), unread))
+
+
+def test_parse_category_days():
+    assert parse_category_days(" build=7, marketing=0 ,") == {"build": 7, "marketing": 0}
+    with pytest.raises(ValueError):
+        parse_category_days("build")
+
+
+async def test_expires_by_category_and_default_days(db, user_id):
+    crud.create_notifications(db, [
+        {"user_id": user_id, **aged(10, title="old")},
+        {"user_id": user_id, **aged(2, title="new")},
+        {"user_id": user_id, **aged(5, title="build", category="build")},
+        {"user_id": user_id, **aged(100, title="keep", category="audit")},
+    ])
+    removed = Removed()
+    job = RetentionJob(removed, default_days=7, category_days={"build": 3, "audit": 0}, batch_size=1, batch_pause=0)
+
+    assert await job.run_once() == {"expired": 2, "archived": 0, "broadcasts_expired": 0}
+    assert titles(db, user_id) == ["keep", "new"]
+    # 배치마다 지운 안읽은 알림 수를 전달
+    assert removed.calls == [([user_id], {user_id: 1}), ([user_id], {user_id: 1})]
+
+
+async def test_archives_only_old_read_notifications(db, user_id):
+    crud.create_notifications(db, [
+        {"user_id": user_id, **aged(10, title="read-old", is_read=True)},
+        {"user_id": user_id, **aged(10, title="unread-old")},
+        {"user_id": user_id, **aged(1, title="read-new", is_read=True)},
+    ])
+    job = RetentionJob(default_days=0, category_days={}, archive_read_days=7, archive="table", batch_pause=0)
+
+    assert await job.run_once() == {"expired": 0, "archived": 1, "broadcasts_expired": 0}
+    assert titles(db, user_id) == ["read-new", "unread-old"]
+    assert crud.retention_report(db)["archive_rows"] == 1
+
+
+async def test_expires_broadcasts_with_receipts(db, user_id):
+    targeted = crud.create_broadcast(db, aged(10, title="targeted"), [user_id, "other-1", "other-2"])
+    crud.mark_broadcast_read(db, targeted, "other-1")
+    everyone = crud.create_broadcast(db, aged(10, title="everyone"))
+    crud.mark_broadcast_read(db, everyone, user_id)
+    crud.create_broadcast(db, aged(1, title="recent"))
+    removed = Removed()
+    job = RetentionJob(removed, default_days=7, category_days={}, batch_size=2, batch_pause=0)
+
+    assert await job.run_once() == {"expired": 0, "archived": 0, "broadcasts_expired": 2}
+    assert titles(db, user_id) == ["recent"]
+    assert crud.count_unread(db, user_id) == 1
+    # 지정 사용자 브로드캐스트는 수신자 배치별로, 전체 브로드캐스트는 모든 사용자 대상으로 전달
+    targeted_calls, everyone_call = removed.calls[:-1], removed.calls[-1]
+    assert [len(user_ids) for user_ids, _ in targeted_calls] == [2, 1]
+    assert sorted(user for user_ids, _ in targeted_calls for user in user_ids) == sorted([user_id, "other-1", "other-2"])
+    assert {user: count for _, unread in targeted_calls for user, count in unread.items()} == {user_id: 1, "other-2": 1}
+    assert everyone_call == (None, {})
+
+    report = crud.retention_report(db)["broadcasts"]
+    assert (report["rows"], report["all_users"], report["receipts"]) == (1, 1, 0)
+
+
+async def test_everyone_broadcast_is_hidden_before_receipts_are_purged(db, user_id, monkeypatch):
+    everyone = crud.create_broadcast(db, aged(10, title="everyone"))
+    for reader in (user_id, "other-1", "other-2"):
+        crud.mark_broadcast_read(db, everyone, reader)
+    delete_broadcast_receipts = crud.delete_broadcast_receipts
+    batches = []
+
+    def record(session, broadcast_id, limit):
+        # 상태 행을 지우기 시작할 때는 이미 목록에서 사라져 있어야 함
+        assert titles(session, user_id) == []
+        removed = delete_broadcast_receipts(session, broadcast_id, limit)
+        batches.append(len(removed))
+        return removed
+
+    monkeypatch.setattr(crud, "delete_broadcast_receipts", record)
+    removed = Removed()
+    job = RetentionJob(removed, default_days=7, category_days={}, batch_size=2, batch_pause=0)
+
+    assert await job.run_once() == {"expired": 0, "archived": 0, "broadcasts_expired": 1}
+    assert batches == [2, 1]
+    assert removed.calls == [(None, {})]
+    assert crud.retention_report(db)["broadcasts"]["receipts"] == 0
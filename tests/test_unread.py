@@ -0,0 +1,107 @@
+# test_unread.py
+import asyncio
+import threading
+import time
+
+import anyio
+import fakeredis
+import pytest
+
+import crud
+from unread import RedisUnreadCounter, UnreadCounter
+from test_crud import broadcast_row, notification_row
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def counter(request, redis):
+    return UnreadCounter() if request.param == "memory" else RedisUnreadCounter(redis, ttl=60)
+
+
+async def test_counter_loads_from_db_and_applies_deltas(counter, db, user_id):
+    # 캐시에 없는 사용자는 증감하지 않음 (다음 조회 때 DB에서 계산)
+    assert await counter.incr(user_id) is None
+
+    crud.create_notifications(db, [notification_row(user_id, minute) for minute in (1, 2)])
+    assert await counter.get(user_id) == 2
+    assert await counter.incr_many({user_id: 3, "other": 1}) == {user_id: 5, "other": None}
+    assert await counter.incr(user_id, -10) == 0
+    assert await counter.reset(user_id) == 0
+    assert await counter.get(user_id) == 0
+
+
+async def test_invalidate_all_recounts_after_broadcast(counter, db, user_id):
+    crud.create_notifications(db, [notification_row(user_id, 1)])
+    assert await counter.get(user_id) == 1
+
+    crud.create_broadcast(db, broadcast_row(2))
+    await counter.invalidate_all()
+
+    assert await counter.get(user_id) == 2
+
+
+async def test_redis_counter_ignores_stale_fill_after_invalidate(redis, db, user_id):
+    counter = RedisUnreadCounter(redis, ttl=60)
+    crud.create_notifications(db, [notification_row(user_id, 1)])
+    # 무효화 전 세대 키에 늦게 저장된 값은 새 세대에서 사용되지 않음
+    stale_key = await counter._current_key(user_id)
+    await counter.invalidate_all()
+    await redis.set(stale_key, 99)
+
+    assert await counter.get(user_id) == 1
+    assert await counter.incr(user_id) == 2
+
+
+async def test_local_counter_expires_to_pick_up_other_workers(db, user_id, monkeypatch):
+    counter = UnreadCounter(ttl=30)
+    crud.create_notifications(db, [notification_row(user_id, 1)])
+    assert await counter.get(user_id) == 1
+
+    # 다른 워커에서 추가된 알림은 만료 전까지 보이지 않음
+    crud.create_notifications(db, [notification_row(user_id, 2)])
+    assert await counter.incr(user_id, 0) == 1
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 31)
+    assert await counter.incr(user_id) is None
+    assert await counter.get(user_id) == 2
+
+
+async def test_local_counter_keeps_recent_users(db):
+    counter = UnreadCounter(max_users=2)
+    for user in ("a", "b", "c"):
+        await counter.get(user)
+
+    assert await counter.incr("a") is None
+    assert await counter.incr("c") == 1
+
+
+async def test_fill_is_discarded_when_user_changes_during_load(counter, db, user_id, monkeypatch):
+    crud.create_notifications(db, [notification_row(user_id, 1)])
+    loaded, release = threading.Event(), threading.Event()
+    count_unread_many = crud.count_unread_many
+
+    def slow_count(session, user_ids):
+        counts = count_unread_many(session, user_ids)
+        loaded.set()
+        release.wait(5)
+        return counts
+
+    monkeypatch.setattr(crud, "count_unread_many", slow_count)
+    load = asyncio.create_task(counter.get(user_id))
+    await anyio.to_thread.run_sync(loaded.wait, 5)
+    # DB 조회 도중 다른 요청이 알림을 커밋하고 카운터를 무효화
+    await counter.invalidate_many([user_id])
+    release.set()
+    assert await load == 1
+
+    # 조회 도중 무효화된 결과는 저장되지 않으므로 다음 조회는 DB에서 다시 계산
+    monkeypatch.setattr(crud, "count_unread_many", count_unread_many)
+    crud.create_notifications(db, [notification_row(user_id, 2)])
+    assert await counter.get(user_id) == 2